@@ -30,7 +30,8 @@ from biosignalml.model.mapping import PropertyMap
 
 from biosignalml.rdf import XSD
 
-__all__ = [ 'DataError', 'Clock', 'DataSegment', 'TimeSeries', 'UniformClock', 'UniformTimeSeries' ]
+__all__ = [ 'DataError', 'Clock', 'DataSegment', 'TimeSeries', 'UniformClock', 'UniformTimeSeries',
+            'UniformTimes' ]
 
 #===============================================================================
 
@@ -40,6 +41,75 @@ class DataError(Exception):
 
 #===============================================================================
 
+class _AppendBuffer(object):
+#===========================
+  """
+  A growable array of values, held at the start of a larger backing store.
+
+  The store's capacity is doubled whenever an append would overflow it, so
+  that appending a block has an amortised cost proportional to the size
+  of the block and not to that of the entire array.
+
+  :param values: The buffer's initial values. Optional.
+  """
+  def __init__(self, values=None):
+  #-------------------------------
+    self._store = np.asarray(values) if values is not None else np.empty(0)
+    self._length = len(self._store)
+
+  def __len__(self):
+  #-----------------
+    return self._length
+
+  @property
+  def array(self):
+  #---------------
+    """The buffer's values, as a view of the filled part of its store."""
+    return self._store[:self._length]
+
+  @property
+  def capacity(self):
+  #------------------
+    """The number of values the buffer can hold without reallocation."""
+    return len(self._store)
+
+  def reserve(self, n, dtype=None):
+  #--------------------------------
+    """
+    Ensure the buffer can hold ``n`` values without reallocation.
+
+    :param int n: The number of values to allow for.
+    :param dtype: The datatype to store values as. Optional, defaults
+      to that of the existing values.
+    """
+    if dtype is None: dtype = self._store.dtype
+    if n > len(self._store) or dtype != self._store.dtype:
+      store = np.empty((max(n, self._length),) + self._store.shape[1:], dtype=dtype)
+      store[:self._length] = self._store[:self._length]
+      self._store = store
+
+  def append(self, values):
+  #------------------------
+    """
+    Append values to the buffer.
+
+    :param values: The values to add.
+    :type values: :class:`numpy.ndarray` or an iterable.
+    """
+    values = np.asarray(values)
+    if (self._length == 0 and values.ndim > 1
+     and values.shape[1:] != self._store.shape[1:]):
+      # Keep any reserved capacity, now for values of the given shape
+      self._store = np.empty((len(self._store),) + values.shape[1:], dtype=self._store.dtype)
+    values = values.reshape((-1,) + self._store.shape[1:])
+    end = self._length + len(values)
+    self.reserve(max(end, 2*len(self._store)) if end > len(self._store) else end,
+                 np.result_type(self._store.dtype, values.dtype))
+    self._store[self._length:end] = values
+    self._length = end
+
+#===============================================================================
+
 class Clock(AbstractObject):
 #===========================
   """
@@ -67,6 +137,36 @@ class Clock(AbstractObject):
     AbstractObject.__init__(self, uri, resolution=resolution, rate=rate, **kwds)
     self.times = np.asarray(times) if times is not None else np.empty(0)
 
+  @property
+  def times(self):
+  #---------------
+    """The clock's sample times, in ``resolution`` seconds."""
+    return self._times.array
+
+  @times.setter
+  def times(self, times):
+  #----------------------
+    self._times = _AppendBuffer(times)
+    self._seconds = None
+
+  def _to_seconds(self, times):
+  #----------------------------
+    if   self.resolution: return times*self.resolution
+    elif self.rate:       return times/self.rate
+    else:                 return times
+
+  def _scaled_times(self):
+  #-----------------------
+    """
+    The clock's sample times in seconds, computed once and then cached
+    until the clock's times or scaling change.
+    """
+    scaling = (self.resolution, self.rate)
+    if self._seconds is None or self._scaling != scaling:
+      self._seconds = _AppendBuffer(self._to_seconds(self.times))
+      self._scaling = scaling
+    return self._seconds.array
+
   def __getitem__(self, key):
   #--------------------------
     """Return the time in seconds at index ``key``."""
@@ -86,20 +186,16 @@ class Clock(AbstractObject):
   def index(self, time):
   #---------------------
     """
-    Find the index of a time in the clock.
+    Find the index of a time, or the indices of an array of times, in the clock.
 
-    :param float time: The time to lookup, in seconds.
+    :param time: The time(s) to lookup, in seconds.
+    :type time: float or np.array
     :return: The greatest index such that ``self.time(index) <= t``.
       -1 is returned if ``t`` is before ``self.time(0)``.
-    :rtype: int
+    :rtype: int, or a np.array of int if ``time`` is an array.
     """
-    i = 0
-    j = len(self)
-    while i < j:
-      m = (i + j)//2
-      if self[m] <= time: i = m + 1
-      else:               j = m
-    return i - 1
+    indices = np.searchsorted(self._scaled_times(), time, side='right') - 1
+    return int(indices) if np.ndim(indices) == 0 else indices
 
   def extend(self, times):
   #-----------------------
@@ -108,11 +204,25 @@ class Clock(AbstractObject):
 
     :param np.array times: Array of sample times, in seconds.
     """
-    if self[-1] >= times[0]:
+    times = np.asarray(times)
+    if len(self) and self[-1] >= times[0]:
       raise DataError('Times must be increasing')
-    if   self.resolution: self.times = np.append(self.times, times/self.resolution)
-    elif self.rate:       self.times = np.append(self.times, times*self.rate)
-    else:                 self.times = np.append(self.times, times)
+    if   self.resolution: times = times/self.resolution
+    elif self.rate:       times = times*self.rate
+    self._times.append(times)
+    if self._seconds is not None and self._scaling == (self.resolution, self.rate):
+      self._seconds.append(self._to_seconds(times))
+
+  def reserve(self, n):
+  #--------------------
+    """
+    Pre-allocate storage for a clock that will grow to ``n`` times.
+
+    :param int n: The expected total number of times.
+    """
+    self._times.reserve(n)
+    self._scaled_times()
+    self._seconds.reserve(n)
 
 #===============================================================================
 
@@ -149,9 +259,20 @@ class UniformClock(Clock):
 
   def index(self, t):
   #------------------
-    i = 0
-    if t < 0.0: return -1
-    else: return int(math.floor(t*self.rate))
+    """
+    Find the index of a time, or the indices of an array of times.
+
+    :param t: The time(s) to lookup, in seconds.
+    :type t: float or np.array
+    :return: The index of the sample at or immediately before ``t``, with
+      -1 returned if ``t`` is negative.
+    :rtype: int, or a np.array of int if ``t`` is an array.
+    """
+    if np.ndim(t) == 0:
+      if t < 0.0: return -1
+      else: return int(math.floor(t*self.rate))
+    t = np.asarray(t)
+    return np.where(t < 0.0, -1, np.floor(t*self.rate)).astype(int)
 
   def extend(self, times):
   #-----------------------
@@ -160,6 +281,81 @@ class UniformClock(Clock):
     """
     raise DataError('Can not extend a UniformClock')
 
+  def reserve(self, n):
+  #--------------------
+    """
+    A UniformClock has no times to store.
+    """
+    pass
+
+#===============================================================================
+
+class UniformTimes(object):
+#==========================
+  """
+  The sample times of a uniformly sampled series, computed on demand.
+
+  Individual times are calculated when indexed; an array of times is only
+  created when the object is sliced or used as a :class:`numpy.ndarray`.
+
+  :param float start: The time of the first sample, in seconds.
+  :param float rate: The sample rate, in Hertz.
+  :param int length: The number of samples.
+  """
+  ndim = 1
+
+  def __init__(self, start, rate, length):
+  #---------------------------------------
+    self.start = start
+    self.rate = rate
+    self._length = length
+
+  def __len__(self):
+  #-----------------
+    return self._length
+
+  def __repr__(self):
+  #------------------
+    return '<Uniform Times: start=%s, rate=%s, len=%d>' % (self.start, self.rate, self._length)
+
+  @property
+  def shape(self):
+  #---------------
+    return (self._length,)
+
+  def __getitem__(self, key):
+  #--------------------------
+    '''
+    The time of a single sample, or the array of times of a slice.
+    '''
+    if isinstance(key, slice):
+      return self.start + np.arange(*key.indices(self._length))/self.rate
+    elif np.ndim(key) == 0:
+      if key < 0: key += self._length
+      if not (0 <= key < self._length): raise IndexError('Time index out of range')
+      return self.start + key/self.rate
+    else:
+      return np.asarray(self)[key]
+
+  def __iter__(self):
+  #------------------
+    for n in range(self._length): yield self.start + n/self.rate
+
+  def __array__(self, dtype=None, copy=None):
+  #------------------------------------------
+    times = self[:]
+    return times if dtype is None else times.astype(dtype)
+
+  def __add__(self, offset):
+  #-------------------------
+    return UniformTimes(self.start + offset, self.rate, self._length)
+
+  __radd__ = __add__
+
+  def __sub__(self, offset):
+  #-------------------------
+    return UniformTimes(self.start - offset, self.rate, self._length)
+
 #===============================================================================
 
 class TimeSeries(object):
@@ -177,7 +373,7 @@ class TimeSeries(object):
   #-------------------------------
     if len(times) != len(data):
       raise DataError('Number of sample times and data points are different')
-    self.data = np.asarray(data)
+    self.data = data
     if isinstance(times, Clock): self.time = times
     else:                        self.time = Clock(None, times)
     self.rate = None
@@ -199,6 +395,20 @@ class TimeSeries(object):
     elif isinstance(key, int): return (self.time[key], self.data[key])
     else:                      raise TypeError
 
+  @property
+  def data(self):
+  #--------------
+    '''
+    The array of data values.
+    '''
+    return self._data.array
+
+  @data.setter
+  def data(self, data):
+  #--------------------
+    self._data = _AppendBuffer(data)
+    self._points = None
+
   @property
   def times(self):
   #---------------
@@ -212,8 +422,14 @@ class TimeSeries(object):
   #----------------
     '''
     All the (time, data) points as a 2D array.
+
+    The array is read-only, as it is cached until the time series is extended
+    or its data values are replaced.
     '''
-    return np.column_stack((self.times, self.data))
+    if self._points is None:
+      self._points = np.column_stack((self.times, self.data))
+      self._points.flags.writeable = False
+    return self._points
 
   def extend(self, times, data):
   #-----------------------------
@@ -236,7 +452,18 @@ class TimeSeries(object):
       if len(times) != len(data):
         raise DataError('Number of sample times and data points are different')
       self.time.extend(times)
-    self.data = np.append(self.data, data)
+    self._data.append(data)
+    self._points = None
+
+  def reserve(self, n):
+  #--------------------
+    """
+    Pre-allocate storage for a time series that will grow to ``n`` points.
+
+    :param int n: The expected total number of data points.
+    """
+    self._data.reserve(n)
+    self.time.reserve(n)
 
   def __add__(self, series):
   #-------------------------
@@ -271,14 +498,36 @@ class UniformTimeSeries(TimeSeries):
       raise DataError('No sampling rate nor period specified')
     elif rate is not None and period is not None:
       raise DataError('Only one of rate or period can be specified')
-    self.data = np.asarray(data)
+    self.data = data
     self.rate = rate if rate else 1.0/period
     self.time = UniformClock(None, self.rate)
+    self._times = None
 
   def __str__(self):
   #-----------------
     return '<Time Series, len=%d, rate=%s:\n%s>' % (len(self), self.rate, self.data)
 
+  @property
+  def times(self):
+  #---------------
+    '''
+    The array of sample times.
+
+    The array is read-only, as it is cached until the time series is extended
+    or its rate is changed, with only the times of new data points then being
+    calculated.
+    '''
+    length = len(self)
+    if self._times is None or self._times[0] != self.rate or len(self._times[2]) > length:
+      self._times = (self.rate, _AppendBuffer(np.empty(0)), np.empty(0))
+    (rate, buffer, times) = self._times
+    if len(times) != length:
+      buffer.append(UniformTimes(0.0, rate, length)[len(buffer):])
+      times = buffer.array
+      times.flags.writeable = False
+      self._times = (rate, buffer, times)
+    return times
+
   def extend(self, data):
   #----------------------
     """
@@ -286,7 +535,8 @@ class UniformTimeSeries(TimeSeries):
 
     :param np.array data: Array of data values.
     """
-    self.data = np.append(self.data, data)
+    self._data.append(data)
+    self._points = None
 
   def __add__(self, series):
   #-------------------------
@@ -316,6 +566,8 @@ class DataSegment(object):
   #-----------------------------------------
     self._starttime = starttime
     self._timeseries = timeseries
+    self._times = (None, None)
+    self._points = (None, None)
 
   def __str__(self):
   #-----------------
@@ -358,15 +610,36 @@ class DataSegment(object):
   @property
   def times(self):
   #---------------
-    return self._timeseries.times + self._starttime
+    """
+    The segment's sample times as a read-only array, with the start time only
+    added when the time series' times change.
+    """
+    times = self._timeseries.times
+    if self._starttime:
+      if self._times[0] is not times:
+        shifted = times + self._starttime
+        shifted.flags.writeable = False
+        self._times = (times, shifted)
+      return self._times[1]
+    else:
+      return times
 
   @property
   def points(self):
   #----------------
+    """
+    All the (time, data) points as a read-only 2D array, cached until
+    the segment's time series is extended or its data values are changed.
+    """
+    points = self._timeseries.points
     if self.starttime:
-      return self._timeseries.points + (self._starttime, 0)
+      if self._points[0] is not points:
+        shifted = points + (self._starttime, 0)
+        shifted.flags.writeable = False
+        self._points = (points, shifted)
+      return self._points[1]
     else:
-      return self._timeseries.points
+      return points
 
 #===============================================================================
 
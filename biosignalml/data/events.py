@@ -0,0 +1,165 @@
+'''
+Columnar tables of timed events, indexed by time.
+'''
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+import numpy as np
+
+__all__ = [ 'EventTable', 'IntervalTree' ]
+
+#===============================================================================
+
+class IntervalTree(object):
+#==========================
+  """
+  A static index of intervals, for finding those that overlap a period of time.
+
+  Intervals are sorted by their start times and level ``n`` of the tree holds the
+  latest end time of each block of ``factor**(n+1)`` consecutive intervals. A
+  query descends from the top level, only keeping blocks that can contain an
+  overlapping interval, so its cost depends on the number of intervals found
+  and not on the number indexed.
+
+  Intervals are semi-open, with an interval of zero length being an instant.
+
+  :param starts: The start times of the intervals.
+  :param ends: The end times of the intervals.
+  :param int factor: The number of blocks of a level in a block of the next.
+  """
+
+  FACTOR = 16   #: The default number of blocks of one level in a block of the next
+
+  def __init__(self, starts, ends, factor=FACTOR):
+  #-----------------------------------------------
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    self.factor = factor
+    self._order = np.argsort(starts, kind='stable')
+    self._starts = starts[self._order]
+    self._ends = ends[self._order]
+    self._levels = [ ]
+    level = self._ends
+    while len(level) > 1:
+      level = np.maximum.reduceat(level, np.arange(0, len(level), factor))
+      self._levels.append(level)
+
+  def __len__(self):
+  #-----------------
+    return len(self._starts)
+
+  def overlapping(self, start, end):
+  #---------------------------------
+    """
+    Find the intervals that overlap a period of time.
+
+    :param float start: The start of the period.
+    :param float end: The end of the period, which is an instant if
+      ``end`` equals ``start``.
+    :return: The indices of the overlapping intervals, in order of start time.
+    :rtype: :class:`numpy.ndarray`
+    """
+    last = np.searchsorted(self._starts, end, side=('left' if end > start else 'right'))
+    if last == 0:
+      return np.empty(0, dtype=np.intp)
+    blocks = np.arange(len(self._levels[-1]) if self._levels else len(self._ends))
+    for n in range(len(self._levels) - 1, -1, -1):
+      size = self.factor**(n + 1)
+      blocks = blocks[(blocks*size < last) & (self._levels[n][blocks] >= start)]
+      blocks = (blocks[:, np.newaxis]*self.factor + np.arange(self.factor)).reshape(-1)
+      blocks = blocks[blocks < (len(self._levels[n-1]) if n > 0 else len(self._ends))]
+    blocks = blocks[blocks < last]
+    ends = self._ends[blocks]
+    return self._order[blocks[(ends > start) | (self._starts[blocks] >= start)]]
+
+#===============================================================================
+
+class EventTable(object):
+#========================
+  """
+  A columnar table of events, each with an onset, a duration, and text.
+
+  An event's text is held as an index into a list of distinct texts, and the
+  table is indexed by an :class:`IntervalTree`, created when first needed.
+
+  :param onsets: The onset times of events, in seconds.
+  :param durations: The durations of events, in seconds.
+  :param textids: Each event's index into ``texts``.
+  :param list texts: The distinct texts of events.
+  :param keys: A row of integers identifying each event, for instance by its
+    position in a file. Optional.
+  """
+
+  def __init__(self, onsets, durations, textids, texts, keys=None):
+  #----------------------------------------------------------------
+    self.onsets = np.asarray(onsets, dtype=float)
+    self.durations = np.asarray(durations, dtype=float)
+    self.textids = np.asarray(textids, dtype=np.int32)
+    self.texts = list(texts)
+    self.keys = (np.asarray(keys, dtype=np.int64).reshape((len(self.onsets), -1))
+                   if keys is not None else None)
+    self._tree = None
+
+  def __len__(self):
+  #-----------------
+    return len(self.onsets)
+
+  def __getitem__(self, n):
+  #------------------------
+    """
+    Get an event as an (onset, duration, text) tuple.
+    """
+    return (float(self.onsets[n]), float(self.durations[n]), self.texts[self.textids[n]])
+
+  @classmethod
+  def from_events(cls, events):
+  #----------------------------
+    """
+    Create a table from (onset, duration, text) tuples.
+    """
+    onsets = [ ]
+    durations = [ ]
+    textids = [ ]
+    texts = { }
+    for (onset, duration, text) in events:
+      onsets.append(onset)
+      durations.append(duration if duration else 0.0)
+      textids.append(texts.setdefault(text, len(texts)))
+    return cls(onsets, durations, textids, sorted(texts, key=texts.get))
+
+  @property
+  def tree(self):
+  #--------------
+    """The table's :class:`IntervalTree`."""
+    if self._tree is None:
+      self._tree = IntervalTree(self.onsets, self.onsets + self.durations)
+    return self._tree
+
+  def overlapping(self, start, end):
+  #---------------------------------
+    """
+    Find the events that overlap a period of time.
+
+    :return: The indices of the events, in order of onset.
+    :rtype: :class:`numpy.ndarray`
+    """
+    return self.tree.overlapping(start, end)
+
+#===============================================================================
@@ -0,0 +1,170 @@
+'''
+Multi-resolution min/max/mean summaries of signal data.
+'''
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+import math
+import numpy as np
+
+__all__ = [ 'Pyramid', 'envelope' ]
+
+#===============================================================================
+
+def _summarise(mins, maxs, sums, counts, factor):
+#================================================
+  """
+  Combine consecutive groups of ``factor`` rows into (min, max, sum, count) rows.
+  """
+  blocks = np.arange(0, len(mins), factor)
+  return (np.minimum.reduceat(mins, blocks),
+          np.maximum.reduceat(maxs, blocks),
+          np.add.reduceat(sums, blocks),
+          np.add.reduceat(counts, blocks))
+
+def envelope(data):
+#==================
+  """
+  Get (min, max, mean) rows for data points, as used for the blocks of a pyramid.
+
+  A data point that is not a scalar is summarised by the minimum, maximum and
+  mean of its components; otherwise a row's values are all the same.
+
+  :param data: An array of data points.
+  :rtype: A 2D :class:`numpy.ndarray`.
+  """
+  data = np.asarray(data, dtype=float)
+  if data.ndim > 1:
+    data = data.reshape(len(data), -1)
+    return np.column_stack((data.min(axis=1), data.max(axis=1), data.mean(axis=1)))
+  else:
+    return np.column_stack((data, data, data))
+
+#===============================================================================
+
+class Pyramid(object):
+#=====================
+  """
+  A multi-resolution summary of a signal's data.
+
+  Level ``n`` of a pyramid summarises consecutive blocks of ``factor**(n+1)``
+  data points, with each block represented by a row holding the minimum, maximum,
+  and mean of the block's values. The last block of a level may be partial.
+
+  :param int length: The number of data points summarised.
+  :param list levels: A list of 2D arrays, one for each level, with a
+    (min, max, mean) row for every block in the level.
+  :param int factor: The number of blocks of a level that are combined into a
+    single block of the next level.
+  """
+
+  FACTOR = 16   #: The default number of blocks of one level in a block of the next
+
+  def __init__(self, length, levels, factor=FACTOR):
+  #-------------------------------------------------
+    self.length = length
+    self.levels = levels
+    self.factor = factor
+
+  def __len__(self):
+  #-----------------
+    return len(self.levels)
+
+  @classmethod
+  def create(cls, segments, factor=FACTOR):
+  #----------------------------------------
+    """
+    Create a pyramid from a signal's data.
+
+    :param segments: An iterable of successive arrays of the signal's data points.
+      A data point that is not a scalar is summarised by the minimum, maximum and
+      mean of its components.
+    :param int factor: The number of blocks in a level that are combined into a
+      block of the next level.
+    :rtype: :class:`Pyramid`
+    """
+    parts = [ ]
+    pending = (np.empty(0), np.empty(0), np.empty(0))
+    length = 0
+    for data in segments:
+      if len(data) == 0: continue
+      values = envelope(data).T
+      pending = tuple(np.concatenate((p, v)) for p, v in zip(pending, values))
+      n = len(pending[0]) - len(pending[0]) % factor
+      if n:
+        parts.append(_summarise(pending[0][:n], pending[1][:n], pending[2][:n],
+                                np.ones(n), factor))
+        pending = tuple(p[n:] for p in pending)
+      length += len(data)
+    if len(pending[0]):
+      parts.append(_summarise(pending[0], pending[1], pending[2],
+                              np.ones(len(pending[0])), factor))
+    if not parts:
+      return cls(0, [ ], factor)
+    level = tuple(np.concatenate(column) for column in zip(*parts))
+    levels = [ np.column_stack((level[0], level[1], level[2]/level[3])) ]
+    while len(level[0]) > 1:
+      level = _summarise(*level, factor=factor)
+      levels.append(np.column_stack((level[0], level[1], level[2]/level[3])))
+    return cls(length, levels, factor)
+
+  def blocksize(self, level):
+  #--------------------------
+    """
+    The number of data points summarised by a block of a level.
+
+    Level -1 refers to the data points themselves.
+    """
+    return self.factor**(level + 1)
+
+  def level_for(self, npoints, nsamples=None):
+  #-------------------------------------------
+    """
+    Find the coarsest level with at least ``npoints`` blocks spanning
+    ``nsamples`` data points.
+
+    :param int npoints: The minimum number of blocks wanted.
+    :param int nsamples: The number of data points to be spanned. Optional,
+      defaults to the length of the summarised data.
+    :return: A level number, or -1 if the data points themselves should be used.
+    """
+    if nsamples is None: nsamples = self.length
+    level = -1
+    while (level + 1) < len(self.levels) and nsamples/self.blocksize(level + 1) >= npoints:
+      level += 1
+    return level
+
+  def blocks(self, level, start, end):
+  #-----------------------------------
+    """
+    Get the blocks of a level that span a range of data points.
+
+    :param int level: The pyramid level, which must not be -1.
+    :param int start: The index of the first data point in the range.
+    :param int end: The index of the data point immediately after the range.
+    :return: A 2-tuple giving the index of the first data point of the first
+      block and a 2D array with (min, max, mean) rows for the blocks.
+    """
+    size = self.blocksize(level)
+    first = max(0, start//size)
+    last = int(math.ceil(min(end, self.length)/float(size)))
+    return (first*size, self.levels[level][first:last])
+
+#===============================================================================
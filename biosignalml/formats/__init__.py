@@ -24,8 +24,15 @@ Read and write physical Recordings and Signals.
 
 #===============================================================================
 
+import math
+import numpy as np
+
+#===============================================================================
+
 import biosignalml
 from biosignalml import BSML
+from biosignalml.data import DataSegment, TimeSeries, UniformTimeSeries
+from biosignalml.data.pyramid import Pyramid, envelope
 from biosignalml.utils import file_uri
 import biosignalml.model.mapping as mapping
 
@@ -53,6 +60,7 @@ class BSMLSignal(biosignalml.Signal):
   """
 
   MAXPOINTS = 50000     #: Maximum number of sample points returned by a single :meth:`read`.
+  OVERVIEWPOINTS = 1000 #: Default number of summary points returned by :meth:`read_overview`.
 
   def __init__(self, uri, units, **kwds):
   #--------------------------------------
@@ -83,6 +91,64 @@ class BSMLSignal(biosignalml.Signal):
     """
     _not_implemented(self, 'read')
 
+  def pyramid(self):
+  #-----------------
+    """
+    Get a multi-resolution summary of the Signal's data.
+
+    The summary is created by reading all of the signal's data when first
+    needed and is then cached until the signal's length changes.
+
+    :rtype: :class:`~biosignalml.data.pyramid.Pyramid`
+    """
+    pyramid = getattr(self, '_pyramid', None)
+    if pyramid is None or pyramid.length != len(self):
+      pyramid = Pyramid.create(d.data for d in self.read())
+      self._pyramid = pyramid
+    return pyramid
+
+  def read_overview(self, interval=None, npoints=OVERVIEWPOINTS):
+  #--------------------------------------------------------------
+    """
+    Read a summary of a Signal's data, suitable for drawing an overview.
+
+    :param interval: The portion of the signal to summarise. Optional, defaults
+      to the entire signal.
+    :type interval: :class:`~biosignaml.time.Interval`
+    :param int npoints: The minimum number of summary points wanted.
+    :return: A :class:`~biosignalml.data.DataSegment` whose data values are
+      (min, max, mean) rows, each summarising a block of consecutive data points
+      and timed at the start of its block.
+
+    Summary points come from the coarsest level of the signal's :meth:`pyramid`
+    with at least ``npoints`` blocks in the interval, so only O(``npoints``) values
+    are read. If the interval is too short for this then the signal's data points
+    are returned, as rows of identical values.
+    """
+    length = len(self)
+    if interval is None:
+      start, end = 0, length
+    elif self.rate:
+      start = max(0, int(math.floor(interval.start*self.rate)))
+      end = min(length, int(math.ceil(interval.end*self.rate)))
+    else:
+      start = max(0, self.clock.index(interval.start))
+      end = min(length, self.clock.index(interval.end) + 1)
+    end = max(start, end)
+    pyramid = self.pyramid()
+    level = pyramid.level_for(npoints, end - start)
+    if level < 0:
+      data = [ d.data for d in self.read(segment=(start, end)) ] if end > start else [ ]
+      rows = envelope(np.concatenate(data)[:end-start]) if data else np.empty((0, 3))
+      first, size = start, 1
+    else:
+      first, rows = pyramid.blocks(level, start, end)
+      size = pyramid.blocksize(level)
+    if self.rate:
+      return DataSegment(first/self.rate, UniformTimeSeries(rows, self.rate/size))
+    else:
+      return DataSegment(0, TimeSeries(rows, self.clock[np.arange(first, first + size*len(rows), size)]))
+
   def append(self, timeseries):
   #----------------------------
     """
@@ -0,0 +1,317 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+"""
+Convert directories of recordings into BioSignalML HDF5 files.
+
+Recordings found under a source directory, for instance a mirror of PhysioNet
+databases, are converted in parallel by a pool of processes, with each
+recording's signals streamed in chunks into a HDF5 file at the same relative
+path under a target directory.
+
+The outcome of each conversion is appended, as a line of JSON, to a manifest
+in the target directory. Recordings that the manifest shows as having been
+converted, and that haven't changed since, are skipped when a conversion is
+run again, so an interrupted or partially failed conversion can be resumed.
+"""
+
+import os
+import sys
+import json
+import itertools
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+#===============================================================================
+
+from biosignalml.formats import BSMLSignal, CLASSES, MIMETYPES
+from biosignalml.formats.hdf5 import HDF5Recording
+from biosignalml.utils import file_uri
+
+__all__ = [ 'find_recordings', 'convert_recording', 'convert', 'main' ]
+
+#===============================================================================
+
+MANIFEST = 'manifest.jsonl'   #: The default name of a conversion's manifest
+CHUNKSIZE = BSMLSignal.MAXPOINTS  #: The default number of data points in a chunk
+FORMATS = [ MIMETYPES.EDF, MIMETYPES.WFDB ]  #: The formats of recordings that are converted
+
+#===============================================================================
+
+def _format_classes():
+#=====================
+  """
+  Map file extensions to the recording classes that read them.
+  """
+  classes = { }
+  for mimetype in FORMATS:
+    cls = CLASSES.get(mimetype)
+    if cls is None: continue
+    for ext in getattr(cls, 'EXTENSIONS', [ ]):
+      classes['.' + ext.lower()] = cls
+  return classes
+
+def find_recordings(source):
+#===========================
+  """
+  Find the recordings in a directory tree that can be converted.
+
+  Only recordings in one of :data:`FORMATS` are found, so the data files of
+  a WFDB record aren't taken to be recordings in their own right.
+
+  :param str source: The directory to search.
+  :return: A sorted list of paths, relative to ``source``, of files
+    holding recordings.
+  """
+  extensions = _format_classes()
+  found = [ ]
+  for (path, dirs, files) in os.walk(source):
+    dirs.sort()
+    for f in files:
+      if os.path.splitext(f)[1].lower() in extensions:
+        found.append(os.path.relpath(os.path.join(path, f), source))
+  return sorted(found)
+
+def _target_path(target, recording):
+#===================================
+  return os.path.join(target, os.path.splitext(recording)[0] + '.h5')
+
+def _shared_targets(recordings):
+#===============================
+  """
+  Find the recordings that would be converted to the same HDF5 file as another.
+  """
+  targets = { }
+  for r in recordings:
+    targets.setdefault(_target_path('', r), [ ]).append(r)
+  return { r: others for others in targets.values() if len(others) > 1 for r in others }
+
+def _file_state(path):
+#=====================
+  info = os.stat(path)
+  return { 'size': info.st_size, 'mtime': info.st_mtime }
+
+#===============================================================================
+
+def convert_recording(source, target, uri, chunksize=CHUNKSIZE):
+#===============================================================
+  """
+  Convert a recording into a BioSignalML HDF5 file.
+
+  Signal data is read, and then appended to the new HDF5 recording, in
+  :class:`~biosignalml.data.DataSegment`\\ s of at most ``chunksize`` points,
+  with the signals of a recording that supports ``read_signals()`` all being
+  read in a single pass. The HDF5 file is written under a temporary name and
+  only renamed to ``target`` once it is complete.
+
+  :param str source: The path of the file holding the recording.
+  :param str target: The path of the HDF5 file to create.
+  :param uri: The URI to give the converted recording.
+  :param int chunksize: The maximum number of data points in a chunk.
+  :return: The number of data points converted.
+  """
+  cls = _format_classes()[os.path.splitext(source)[1].lower()]
+  recording = cls.open(source, uri=uri)
+  partial = target + '.part'
+  try:
+    h5 = HDF5Recording.create(uri, partial, replace=True,
+                              starttime=recording.starttime,
+                              duration=recording.duration,
+                              description=recording.description,
+                              investigation=recording.investigation)
+    try:
+      signals = recording.signals()
+      output = { }
+      for n, s in enumerate(signals):
+        output[str(s.uri)] = h5.new_signal(str(uri) + '/signal/%d' % n, s.units,
+                                           rate=s.rate, label=s.label)
+      points = 0
+      if hasattr(recording, 'read_signals') and signals:
+        maxduration = chunksize/float(max(s.rate for s in signals))
+        for batch in recording.read_signals(signals, maxduration=maxduration):
+          for (s, segment) in zip(signals, batch):
+            output[str(s.uri)].extend(segment.data)
+            points += len(segment)
+      else:
+        for s in signals:
+          for segment in s.read(maxpoints=chunksize):
+            output[str(s.uri)].extend(segment.data)
+            points += len(segment)
+    finally:
+      h5.close()
+    os.replace(partial, target)
+  except Exception:
+    if os.path.exists(partial): os.remove(partial)
+    raise
+  finally:
+    recording.close()
+  return points
+
+def _convert(source, target, recording, uri, chunksize):
+#=======================================================
+  """
+  Convert a recording in a worker process, returning a manifest entry.
+  """
+  entry = { 'recording': recording, 'uri': uri }
+  start = time.time()
+  try:
+    entry.update(_file_state(os.path.join(source, recording)))
+    output = _target_path(target, recording)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    entry['points'] = convert_recording(os.path.join(source, recording), output, uri, chunksize)
+    entry['bytes'] = os.path.getsize(output)
+    entry['status'] = 'done'
+  except Exception as msg:
+    entry['status'] = 'failed'
+    entry['error'] = '{}: {}'.format(msg.__class__.__name__, msg)
+  entry['seconds'] = time.time() - start
+  return entry
+
+def _read_manifest(manifest):
+#============================
+  """
+  Get the latest manifest entry for each recording.
+  """
+  entries = { }
+  if os.path.exists(manifest):
+    with open(manifest) as f:
+      for line in f:
+        try:
+          entry = json.loads(line)
+        except ValueError:
+          continue        # A line left incomplete by an interrupted run
+        entries[entry['recording']] = entry
+  return entries
+
+def _is_converted(entry, source, target, recording):
+#===================================================
+  if entry is None or entry.get('status') != 'done': return False
+  if not os.path.exists(_target_path(target, recording)): return False
+  state = _file_state(os.path.join(source, recording))
+  return entry.get('size') == state['size'] and entry.get('mtime') == state['mtime']
+
+def convert(source, target, baseuri=None, jobs=None, chunksize=CHUNKSIZE,
+            manifest=None, force=False, report=None):
+#============================================================================
+  """
+  Convert all of the recordings in a directory tree into BioSignalML HDF5.
+
+  :param str source: The directory holding the recordings.
+  :param str target: The directory in which to create HDF5 files.
+  :param str baseuri: The URI of a recording is ``baseuri`` followed by its
+    path relative to ``source``, without an extension. Optional, defaults
+    to the ``file:`` URI of ``source``.
+  :param int jobs: The number of worker processes. Optional, defaults to the
+    number of CPUs.
+  :param int chunksize: The maximum number of data points in a chunk.
+  :param str manifest: The path of the manifest. Optional, defaults to
+    :data:`MANIFEST` in ``target``.
+  :param bool force: Convert recordings even if the manifest shows that they
+    have been converted (default = False).
+  :param report: A function called with each manifest entry as conversions complete.
+    Optional.
+
+  Recordings that would be converted to the same HDF5 file, for instance
+  ``a.edf`` and ``a.hea``, are refused and recorded as having failed.
+  :return: A dictionary of totals, with the number of recordings converted,
+    failed, and skipped, the data points and bytes written, and the elapsed time.
+  """
+  if baseuri is None: baseuri = file_uri(source)
+  if not baseuri.endswith(('/', '#')): baseuri += '/'
+  if manifest is None: manifest = os.path.join(target, MANIFEST)
+  os.makedirs(target, exist_ok=True)
+  entries = { } if force else _read_manifest(manifest)
+  found = find_recordings(source)
+  shared = _shared_targets(found)
+  recordings = [ r for r in found
+                   if r not in shared and not _is_converted(entries.get(r), source, target, r) ]
+  refused = [ { 'recording': r, 'status': 'failed',
+                'error': 'ValueError: Has the same target as {}'.format(
+                  ', '.join(o for o in shared[r] if o != r)) } for r in sorted(shared) ]
+  totals = { 'done': 0, 'failed': 0, 'skipped': len(found) - len(recordings) - len(refused),
+             'points': 0, 'bytes': 0 }
+  start = time.time()
+  if recordings or refused:
+    with ProcessPoolExecutor(max_workers=jobs) as pool, open(manifest, 'a') as log:
+      futures = [ pool.submit(_convert, source, target, r,
+                              baseuri + os.path.splitext(r)[0].replace(os.sep, '/'), chunksize)
+                    for r in recordings ]
+      for entry in itertools.chain(refused, (f.result() for f in as_completed(futures))):
+        log.write(json.dumps(entry) + '\n')
+        log.flush()
+        totals[entry['status']] += 1
+        totals['points'] += entry.get('points', 0)
+        totals['bytes'] += entry.get('bytes', 0)
+        if report is not None: report(entry)
+  totals['seconds'] = time.time() - start
+  return totals
+
+#===============================================================================
+
+def _report(entry):
+#==================
+  if entry['status'] == 'done':
+    rate = entry['points']/entry['seconds'] if entry['seconds'] else 0.0
+    print('Converted %s: %d points in %.1fs (%.0f points/s)'
+          % (entry['recording'], entry['points'], entry['seconds'], rate))
+  else:
+    print('FAILED %s: %s' % (entry['recording'], entry['error']))
+  sys.stdout.flush()
+
+def main(argv=None):
+#===================
+  """
+  Convert a directory tree of recordings into BioSignalML HDF5 files.
+  """
+  parser = argparse.ArgumentParser(description='Convert a directory tree of recordings'
+                                             + ' into BioSignalML HDF5 files.')
+  parser.add_argument('source', help='the directory holding recordings')
+  parser.add_argument('target', help='the directory in which to create HDF5 files')
+  parser.add_argument('-u', '--base-uri', dest='baseuri',
+                      help='the URI prefix for converted recordings')
+  parser.add_argument('-j', '--jobs', type=int, help='the number of worker processes')
+  parser.add_argument('-c', '--chunk', dest='chunksize', type=int, default=CHUNKSIZE,
+                      help='the maximum number of data points read at once (default %(default)s)')
+  parser.add_argument('-m', '--manifest', help='the manifest of converted recordings')
+  parser.add_argument('-f', '--force', action='store_true',
+                      help='convert all recordings, ignoring the manifest')
+  args = parser.parse_args(argv)
+  if not os.path.isdir(args.source):
+    parser.error("Missing directory '%s'" % args.source)
+  totals = convert(args.source, args.target, baseuri=args.baseuri, jobs=args.jobs,
+                   chunksize=args.chunksize, manifest=args.manifest, force=args.force,
+                   report=_report)
+  seconds = totals['seconds']
+  print('%d converted, %d failed, %d skipped in %.1fs: %.0f points/s, %.2f MB/s'
+        % (totals['done'], totals['failed'], totals['skipped'], seconds,
+           totals['points']/seconds if seconds else 0.0,
+           totals['bytes']/seconds/1e6 if seconds else 0.0))
+  return 1 if totals['failed'] else 0
+
+#===============================================================================
+
+if __name__ == '__main__':
+#=========================
+
+  sys.exit(main())
+
+#===============================================================================
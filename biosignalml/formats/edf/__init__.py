@@ -21,6 +21,7 @@
 import os
 import logging
 import math
+import numpy as np
 
 #===============================================================================
 
@@ -130,6 +131,37 @@ class EDFSignal(BSMLSignal):
     if maxpoints is None or not (0 < maxpoints <= BSMLSignal.MAXPOINTS):
       maxpoints = BSMLSignal.MAXPOINTS
 
+    (startpos, length) = self._sample_range(interval, segment)
+    while length > 0:
+      if maxpoints > length: maxpoints = length
+      sigdata = self.recording._edffile.physical_signal(self.index, startpos, maxpoints)
+      #logging.debug('READ %d at %d, got %d', points, startpos, sigdata.length)
+      if sigdata.length <= 0: break
+      yield DataSegment(float(sigdata.startpos)/self.rate, UniformTimeSeries(sigdata.data, self.rate))
+      startpos += sigdata.length
+      length -= sigdata.length
+
+  def append(self, timeseries):
+  #----------------------------
+    """
+    Append data to a signal of a recording that is being created.
+
+    Data points are converted to the signal's digital values and written
+    to the EDF file once there are complete data records.
+
+    :param timeseries: The data points to append.
+    :type timeseries: :class:`~biosignalml.data.TimeSeries`
+    """
+    self.recording._edffile.append_signal(self.index, timeseries.data)
+
+  def _sample_range(self, interval=None, segment=None):
+  #----------------------------------------------------
+    """
+    Find the data points of the signal that are in an interval or segment.
+
+    :return: A 2-tuple giving the index of the first data point and the
+      number of data points.
+    """
     # We need to be consistent as to what an interval is....
     # Use model.Interval ??
     if interval is not None:
@@ -150,20 +182,25 @@ class EDFSignal(BSMLSignal):
       startpos = max(0, int(math.floor(segment[0])))
       length = min(len(self), int(math.ceil(segment[1]))+1) - startpos
     #logging.debug('Startpos: %d, len: %d', startpos, length)
-
-    while length > 0:
-      if maxpoints > length: maxpoints = length
-      sigdata = self.recording._edffile.physical_signal(self.index, startpos, maxpoints)
-      #logging.debug('READ %d at %d, got %d', points, startpos, sigdata.length)
-      if sigdata.length <= 0: break
-      yield DataSegment(float(sigdata.startpos)/self.rate, UniformTimeSeries(sigdata.data, self.rate))
-      startpos += sigdata.length
-      length -= sigdata.length
+    return (startpos, length)
 
 #===============================================================================
 
 class EDFRecording(BSMLRecording):
 #=================================
+  """
+  An EDF or EDF+ recording.
+
+  A new recording is written as an EDF+ file, with signals added by
+  :meth:`new_signal` and their data appended in any order and amounts.
+
+  :param uri: The URI of the recording.
+  :param dataset: The file path or URI of the EDF file.
+  :param bool create: Create a new recording (default = False).
+  :param float recordduration: When creating a recording, the duration, in seconds,
+    of an EDF data record (default = 1.0).
+  :param kwds: :class:`~biosignalml.Recording` attributes to set.
+  """
 
   MIMETYPE = MIMETYPES.EDF
   EXTENSIONS = [ 'edf' ]
@@ -171,11 +208,14 @@ class EDFRecording(BSMLRecording):
 
   def __init__(self, uri, dataset=None, **kwds):
   #---------------------------------------------
+    newfile = kwds.pop('create', False) or kwds.get('mode') == 'w'
+    drduration = kwds.pop('recordduration', 1.0)
     BSMLRecording.__init__(self, uri=uri, dataset=dataset, **kwds)
     self._edffile = None
-    newfile = kwds.pop('create', False)
+    self._annotations = None
     if dataset:
-      if newfile: pass  ## Future...
+      if newfile:
+        self._edffile = EDFFile.create(str(self.dataset), drduration, self.starttime)
       else:
         self.initialise()
         self._set_attributes()
@@ -184,18 +224,154 @@ class EDFRecording(BSMLRecording):
   #---------------
     if self._edffile:
       self._edffile.close()
+      self._edffile = None
+
+  def new_signal(self, uri, units, id=None, **kwds):
+  #-------------------------------------------------
+    """
+    Create a new signal and add it to a recording that is being created.
+
+    :param uri: The URI for the signal.
+    :param units: The units signal data values are in.
+    :param float rate: The signal's sample rate, which must give a whole number
+      of samples in a data record.
+    :param float minValue: The signal's minimum physical value.
+    :param float maxValue: The signal's maximum physical value.
+    :param str dimension: The signal's units, as written to the EDF header.
+      Optional, defaults to the last part of the ``units`` URI.
+    :param kwds: Other :class:`~biosignalml.Signal` attributes to set.
+    :rtype: :class:`EDFSignal`
+    """
+    edffile = self._edffile
+    if edffile is None or not edffile._newfile:
+      raise TypeError("Signals can only be added to a new EDF recording")
+    dimension = kwds.pop('dimension', None)
+    if dimension is None:
+      dimension = str(units).replace('#', '/').rsplit('/', 1)[-1] if units else ''
+    rate = kwds.get('rate')
+    if not rate or kwds.get('minValue') is None or kwds.get('maxValue') is None:
+      raise ValueError("An EDF signal needs 'rate', 'minValue' and 'maxValue'")
+    nsamples = int(round(rate*edffile._drduration))
+    if nsamples <= 0 or abs(nsamples - rate*edffile._drduration) > 1e-6:
+      raise ValueError("Rate of %s doesn't give a whole number of samples in a data record" % rate)
+    signal = BSMLRecording.new_signal(self, uri, units, id=id, **kwds)
+    signal.index = edffile.add_signal(signal.label if signal.label else '', nsamples,
+                                      signal.minValue, signal.maxValue, dimension,
+                                      transducer=signal.transducer if signal.transducer else '',
+                                      prefilter=signal.filter if signal.filter else '')
+    signal._rec_count = nsamples
+    return signal
 
   def initialise(self, **kwds):
   #----------------------------
     if self.dataset is not None and kwds.pop('open_dataset', True):
       fname = str(self.dataset)
-      edffile = EDFFile.open(fname)
-      if edffile is None:
-        raise IOError("Cannot open '%s'", fname)
-      self._edffile = edffile
+      self._edffile = EDFFile.open(fname)
       for s in self.signals():
         EDFSignal.initialise_class(s)
 
+  def read_signals(self, signals=None, interval=None, maxduration=None):
+  #---------------------------------------------------------------------
+    """
+    Read data from several signals in a single pass through the recording.
+
+    :param signals: The signals to read, as :class:`EDFSignal`\ s or signal
+      URIs. Optional, defaults to all of the recording's signals.
+    :param interval: The portion of the recording to read.
+    :type interval: :class:`~biosignaml.time.Interval`
+    :param maxduration: The maximum duration, in seconds, of a single batch.
+    :return: An `iterator` returning lists of :class:`~biosignalml.data.DataSegment`
+      segments, with a segment for each signal, in the order of ``signals``.
+
+    Each batch of segments comes from the same consecutive data records of the
+    EDF file, so segments in a batch cover the same period of time even though
+    signals may have different sampling rates. A segment is empty if its signal
+    has no data points in the batch's period.
+    """
+    edffile = self._edffile
+    if signals is None:
+      signals = self.signals()
+    else:
+      signals = [ s if isinstance(s, EDFSignal) else self.get_signal(s) for s in signals ]
+    if not signals: return
+
+    ranges = [ ]
+    firstrec = edffile._datarecs
+    lastrec = -1
+    for s in signals:
+      (startpos, length) = s._sample_range(interval)
+      ranges.append((startpos, startpos + max(0, length)))
+      if length > 0:
+        firstrec = min(firstrec, startpos//s._rec_count)
+        lastrec = max(lastrec, (startpos + length - 1)//s._rec_count)
+
+    # Limit a batch to whole data records, with at most MAXPOINTS points for any signal
+    nrecs = max(1, BSMLSignal.MAXPOINTS//max(s._rec_count for s in signals))
+    if maxduration and edffile._drduration > 0:
+      nrecs = max(1, min(nrecs, int(maxduration/edffile._drduration)))
+
+    recno = firstrec
+    while recno <= lastrec:
+      records = edffile._read_records(recno, min(nrecs, lastrec + 1 - recno))
+      if len(records) == 0: break
+      batch = [ ]
+      for s, (start, end) in zip(signals, ranges):
+        first = recno*s._rec_count
+        samples = records[str(s.index)].reshape(-1)
+        lo = max(start, first)
+        hi = max(lo, min(end, first + len(samples)))
+        scaling = edffile.scaling[s.index]
+        data = scaling.scale*samples[lo-first: hi-first] + scaling.offset
+        batch.append(DataSegment(float(lo)/s.rate, UniformTimeSeries(data, s.rate)))
+      yield batch
+      recno += len(records)
+
+  def annotation_table(self):
+  #--------------------------
+    """
+    The recording's EDF+ annotations, decoded when first needed.
+
+    :rtype: :class:`~biosignalml.data.events.EventTable`
+    """
+    if self._annotations is None:
+      self._annotations = self._edffile.annotation_table()
+    return self._annotations
+
+  def annotations_in(self, interval=None):
+  #---------------------------------------
+    """
+    Get the recording's EDF+ annotations that overlap an interval.
+
+    An :class:`~biosignalml.Annotation` about a :class:`~biosignalml.Segment` of
+    the recording is created the first time an annotation is retrieved.
+
+    :param interval: The portion of the recording. Optional, defaults to
+      the entire recording.
+    :type interval: :class:`~biosignaml.time.Interval`
+    :return: A list of :class:`~biosignalml.Annotation`\ s, in order of onset.
+    """
+    table = self.annotation_table()
+    if interval is None:
+      rows = np.argsort(table.onsets, kind='stable')
+    else:
+      rows = table.overlapping(interval.start, interval.end)
+    annotations = [ ]
+    for n in rows:
+      (tal, m) = table.keys[n]
+      uri = self.uri + '/annotation/tal_%d_%d' % (tal, m)
+      annotation = self.get_resource(uri)
+      if annotation is None:
+        (onset, duration, text) = table[n]
+        segment = self.get_resource(self.uri + '/time/tal_%d' % tal)
+        if segment is None:
+          segment = self.add_resource(
+                      biosignalml.Segment(self.uri + '/time/tal_%d' % tal,
+                                          source=self,
+                                          time=self.interval(onset, duration)))
+        annotation = self.add_resource(biosignalml.Annotation(uri, about=segment, comment=text))
+      annotations.append(annotation)
+    return annotations
+
   def _set_attributes(self):
   #-------------------------
     if self._edffile is None: return
@@ -211,18 +387,6 @@ class EDFRecording(BSMLRecording):
       for k in RECORDINGFIELDS: self.metadata[k] = getattr(self._edffile, k, None)
     for n in self._edffile.data_signals:      # Add EDFSignal objects
       self.add_signal(EDFSignal.from_recording(self, n))
-    for n, a in enumerate(self._edffile.annotations()):
-      segment = None
-      for m, text in enumerate(a.annotations):
-        if text:
-          if segment is None:
-            segment = self.add_resource(
-                        biosignalml.Segment(self.uri + '/time/tal_%d' % n,
-                                            source=self,
-                                            time=self.interval(a.onset, a.duration)))
-          self.add_resource(
-            biosignalml.Annotation(self.uri + '/annotation/tal_%d_%d' % (n, m),
-                                   about=segment, comment=text))
     # Now found common errors...
     self.comment = '\n'.join(self._edffile.errors)
 
@@ -18,12 +18,15 @@
 #
 ######################################################
 
+import os
 import math
 import copy
+import numpy as np
 
 #===============================================================================
 
 from biosignalml.formats.edf import EDF, EDFFile
+from biosignalml.formats.edf.edffile import SIGNALHDR, _timekeeping_TAL
 
 __all__ = [ 'Annotation', 'annotate' ]
 
@@ -65,82 +68,179 @@ class Annotation(object):
 _months = { 1: 'JAN', 2: 'FEB', 3: 'MAR',  4: 'APR',  5: 'MAY',  6: 'JUN',
             7: 'JUL', 8: 'AUG', 9: 'SEP', 10: 'OCT', 11: 'NOV', 12: 'DEC' }
 
-def annotate(source, outfile, annotations):
-#==========================================
+COPYBLOCK  = 1 << 22    #: The number of bytes of data records copied at once
+RECORDCOPY = 1 << 16    #: Records at least this size are copied by the kernel, one at a time
+
+def _copy_range(src, dst, srcpos, dstpos, count):
+#================================================
+  """
+  Copy bytes between two files, in the kernel if possible.
+  """
+  while count > 0:
+    n = 0
+    if hasattr(os, 'copy_file_range'):
+      try: n = os.copy_file_range(src, dst, count, srcpos, dstpos)
+      except OSError: n = 0
+    if n <= 0 and hasattr(os, 'sendfile'):
+      try:
+        os.lseek(dst, dstpos, os.SEEK_SET)
+        n = os.sendfile(dst, src, srcpos, count)
+      except OSError: n = 0
+    if n <= 0:
+      data = os.pread(src, min(count, COPYBLOCK), srcpos)
+      if not data: raise IOError("Unexpected end of EDF file")
+      n = os.pwrite(dst, data, dstpos)
+    count -= n
+    srcpos += n
+    dstpos += n
+
+def _copy_records(input, output, payload):
+#=========================================
+  """
+  Copy the data records of an EDF file, appending a payload of bytes to each.
+
+  :param input: The source :class:`EDFFile`.
+  :param output: The :class:`EDFFile` being written, with its header written.
+  :param payload: A 2D :class:`numpy.ndarray` of bytes, with a row for each record.
+  """
+  src = input._file.fileno()
+  dst = output._file.fileno()
+  recsize = input._recsize
+  annsize = payload.shape[1]
+  if annsize == 0:             # The records can be copied as a single block
+    _copy_range(src, dst, input._hdrsize, output._hdrsize, input._datarecs*recsize)
+  elif recsize >= RECORDCOPY:
+    for n in range(input._datarecs):
+      dstpos = output._hdrsize + n*(recsize + annsize)
+      _copy_range(src, dst, input._hdrsize + n*recsize, dstpos, recsize)
+      os.pwrite(dst, payload[n].tobytes(), dstpos + recsize)
+  else:
+    count = max(1, COPYBLOCK//recsize)
+    for recno in range(0, input._datarecs, count):
+      n = min(count, input._datarecs - recno)
+      data = os.pread(src, n*recsize, input._hdrsize + recno*recsize)
+      if len(data) < n*recsize: raise IOError("Unexpected end of EDF file")
+      block = np.empty((n, recsize + annsize), dtype=np.uint8)
+      block[:, :recsize] = np.frombuffer(data, dtype=np.uint8).reshape(n, recsize)
+      block[:, recsize:] = payload[recno: recno + n]
+      os.pwrite(dst, block.tobytes(), output._hdrsize + recno*(recsize + annsize))
+
+def _group_TALs(tals, count):
+#============================
+  """
+  Split TALs into at most ``count`` groups of consecutive TALs.
+  """
+  size = int(math.ceil(float(len(tals))/count)) if count else 0
+  groups = [ b''.join(tals[n: n+size]) for n in range(0, len(tals), size) ] if size else [ ]
+  return groups + (count - len(groups))*[ b'' ]
+
+def _annotate_inplace(edffile, tals):
+#====================================
+  """
+  Add TALs to the unused space of an EDF+ file's annotation signal.
+
+  TALs are placed, in order, in the earliest data record with enough
+  free space at or after the record holding the previous TAL.
+  """
+  if edffile.edf_type == EDF.EDF or not edffile.annotation_signals:
+    raise ValueError("In-place annotation needs an EDF+ file with an annotation signal")
+  signum = edffile.annotation_signals[0]
+  size = 2*edffile.nsamples[signum]
+  records = edffile._read_records(0, edffile._datarecs)
+  field = np.ascontiguousarray(records[str(signum)]).view(np.uint8).reshape(len(records), size)
+  # Space is used up to and including the NUL after the last TAL
+  filled = field != 0
+  used = np.where(filled.any(axis=1), size - np.argmax(filled[:, ::-1], axis=1) + 1, 0)
+  free = size - np.minimum(used, size)
+  additions = { }
+  recno = 0
+  for tal in tals:
+    while recno < len(free) and free[recno] < len(tal): recno += 1
+    if recno == len(free):
+      raise ValueError("Not enough free space in the annotation signal for all annotations")
+    additions.setdefault(recno, [ ]).append(tal)
+    free[recno] -= len(tal)
+  fd = os.open(edffile._file.name, os.O_WRONLY)
+  try:
+    for (recno, added) in additions.items():
+      os.pwrite(fd, b''.join(added), edffile._hdrsize + recno*edffile._recsize
+                                     + edffile._offsets[signum] + int(used[recno]))
+  finally:
+    os.close(fd)
+
+def annotate(source, outfile, annotations, inplace=False):
+#=========================================================
   """
   Add annotations to an EDF(+) file, creating a new file.
-  
+
   The existing file is copied as EDF+ before an `EDF Annotations` signal
-  is added to it.
+  is added to it. The annotation signal's content for every data record is
+  prepared before copying, with records then copied in large blocks, or by
+  the kernel when records are large or no annotation signal is added.
 
   :param str source: The name of an EDF file.
   :param str outfile: The name of the EDF+ file to create.
   :param list annotations: A list of :class:`Annotation`.
+  :param bool inplace: Instead of creating a new file, add annotations to the
+    free space in the existing annotation signal of an EDF+ file (default = False).
+    ``outfile`` is then ignored and a ValueError is raised if there is not
+    enough space.
 
   """
 
   input = EDFFile.open(source)
-  if input.errors: input.fixheader()
-
-  output = copy.deepcopy(input)
-  output._file = open(outfile, 'wb+')
-
-  if input.edf_type == EDF.EDF:
-    output.edf_type = EDF.EDFplusC
-    output.patient_code = input.patient
-    output.recording_date = '%02d-%s-%04d' % (input.start_datetime.day,
-                                           _months[input.start_datetime.month],
-                                           input.start_datetime.year)
-    output.recording_code = input.recording
-
-    # We insist digmax > digmin in header checks, otherwise we could...
-    # check digmax > digmin and if < then swap physmax/min
-
-    ##  Minimum EDF Annotation has block start times
-    # Find longest length of record start timestamp
-    tlen = len(str(int(input.duration))) + len(str(input._drduration - int(input._drduration)))
-    tlen += 3        # Allow for marker bytes
-  else:
-    tlen = 0         # EDF+ will already have record timstamps
-
-  # First sort into time order...
-  annotations.sort(key = lambda a: a._start)
-
-  # Then group so len(groups) <= input._datarecs
-  groupcount = int(math.ceil(float(len(annotations))/input._datarecs))
-
-  maxlen = 0
-  groups = [ ]
-  group = [ ]
-  n = 0
-  for ann in annotations:
-    if n == groupcount:
-      groups.append(''.join(group))
-      grouplen = len(groups[-1])  # Length of group just added
-      if grouplen > maxlen: maxlen = grouplen
-      grouplen = 0
-      group = [ ]
-      n = 0
-    group.append(ann.make_TAL())
-    n += 1
-  groups.append(''.join(group))
-  grouplen = len(groups[-1])
-  if grouplen > maxlen: maxlen = grouplen
-
-  annsize = maxlen + tlen
-  if annsize:
-    annsig = output._add_annotation_signal(annsize)
-    annsize = 2*output.nsamples[annsig]
-
-  output.writeheader()
-  for n in range(0, input._datarecs):
-    output._file.write(input._file.read(input._recsize))
+  try:
+    if input.errors: input.fixheader()
+    # First sort into time order...
+    tals = [ a.make_TAL().encode('utf-8')
+               for a in sorted(annotations, key=lambda a: a._start) ]
+    if inplace:
+      _annotate_inplace(input, tals)
+      return
+
+    output = copy.copy(input)
+    for (f, l, t) in SIGNALHDR: setattr(output, f, list(getattr(input, f)))
+    output.annotation_signals = list(input.annotation_signals)
+    output.records = None
+    output._file = open(outfile, 'wb+')
+
+    if input.edf_type == EDF.EDF:
+      output.edf_type = EDF.EDFplusC
+      output.patient_code = input.patient
+      output.recording_date = '%02d-%s-%04d' % (input.start_datetime.day,
+                                             _months[input.start_datetime.month],
+                                             input.start_datetime.year)
+      output.recording_code = input.recording
+
+      # We insist digmax > digmin in header checks, otherwise we could...
+      # check digmax > digmin and if < then swap physmax/min
+
+      ##  Minimum EDF Annotation has block start times
+      timekeeping = [ _timekeeping_TAL(n*input._drduration).encode('ascii')
+                        for n in range(input._datarecs) ]
+    else:
+      timekeeping = input._datarecs*[ b'' ]  # EDF+ will already have record timstamps
+
+    # Then group so len(groups) <= input._datarecs
+    payloads = [ t + g for (t, g) in zip(timekeeping, _group_TALs(tals, input._datarecs)) ]
+    annsize = max(len(p) for p in payloads) if payloads else 0
     if annsize:
-      timekeep = ('+%s\x14\x14\00' % str(n * input._drduration)) if tlen else ''
-      tals = groups[n] if n < len(groups) else ''
-      output._file.write((timekeep + tals).ljust(annsize, '\x00'))
-  output.close()
-  input.close()
+      annsig = output._add_annotation_signal(annsize)
+      annsize = 2*output.nsamples[annsig]
+      payload = np.array(payloads, dtype='S%d' % annsize).view(np.uint8).reshape(-1, annsize)
+    else:
+      payload = np.empty((input._datarecs, 0), dtype=np.uint8)
+
+    try:
+      output.writeheader()
+      output._file.flush()
+      _copy_records(input, output, payload)
+      output._file.truncate(output._hdrsize + input._datarecs*(input._recsize + annsize))
+    finally:
+      output._file.close()
+      output._file = None
+  finally:
+    input.close()
 
 #===============================================================================
 
@@ -158,15 +258,18 @@ if __name__ == '__main__':
                                      + ' and optionally adding annotations.')
     parser.add_option("-a", "--annotate", dest="annfile",
                       help="a file containing annotations", metavar="FILE")
+    parser.add_option("-i", "--inplace", dest="inplace", action="store_true", default=False,
+                      help="add annotations to the input file's annotation signal")
     (options, args) = parser.parse_args()
-    if len(args) < 2: parser.error('missing input and output file names')
+    if len(args) < (1 if options.inplace else 2):
+      parser.error('missing input and output file names')
     return args
 
 
   args = getarguments()
 
   infile = args[0]
-  outfile = args[1]
+  outfile = args[1] if len(args) > 1 else None
   if not os.path.exists(infile):
     print("Missing file '%s'" % infile)
     sys.exit()
@@ -179,6 +282,6 @@ if __name__ == '__main__':
                   Annotation('Test 0.1', 0.1, 0.1),
                   Annotation('Test 4.5 instant', 4.5),
                 ]
-  annotate(infile, outfile, annotations)
+  annotate(infile, outfile, annotations, inplace=options.inplace)
 
 #===============================================================================
@@ -29,6 +29,10 @@ from collections import namedtuple
 
 #===============================================================================
 
+from biosignalml.data.events import EventTable
+
+#===============================================================================
+
 __all__ = [ 'EDFFile', 'FormatError', 'InvalidSignalId' ]
 
 
@@ -42,8 +46,15 @@ class InvalidSignalId(Exception):
 
 nonprinting = re.compile(r'[^ -~]')
 
+# A TAL is <onset>[0x15<duration>]0x14[<annotation>0x14...]0x00
+TAL_PATTERN = re.compile(rb'([+-][0-9.]+)(?:\x15([0-9.]*))?\x14([^\x00]*)\x00')
+
 options = { }
 
+READBLOCKSIZE   = 1 << 22   #: The number of bytes of data records to read at once
+WRITEBLOCKSIZE  = 1 << 22   #: The number of bytes of data records to write at once
+ANNOTATIONSIZE  = 32        #: The number of bytes in a record for its timekeeping annotation
+
 FILEHDR   = [ ('version',      8, str),
               ('patient',     80, str),
               ('recording',   80, str),
@@ -82,6 +93,36 @@ RECORDINGFIELDS = [ 'recording_date',
 
 #===============================================================================
 
+def _file_name(fname):
+#=====================
+  """
+  Get the path of a file given as a path or a ``file:`` URL.
+  """
+  if fname.startswith('file:'):
+    return urllib.request.url2pathname(urllib.parse.urlparse(fname).path)
+  return fname
+
+def _format_number(value, width):
+#================================
+  """
+  Format a number for a header field, using at most ``width`` characters.
+  """
+  if isinstance(value, int) or float(value).is_integer():
+    return '%d' % value
+  for precision in range(width, 0, -1):
+    text = '%.*g' % (precision, value)
+    if len(text) <= width: return text
+  raise FormatError("Cannot format %s in %d characters" % (value, width))
+
+def _timekeeping_TAL(onset):
+#===========================
+  """
+  The TAL giving the start time of a data record.
+  """
+  return ('%+.6f' % onset).rstrip('0').rstrip('.') + '\x14\x14\x00'
+
+#===============================================================================
+
 RecordData = namedtuple('RecordData', 'channel, starttime, rate, data')
 '''A tuple containg data from an EDF record.'''
 
@@ -115,7 +156,7 @@ class TimeStampedAnnotation(object):
     #  <annotationlist> ::= <annotation><annotationlist>
     #  <annotation> := <unicode text>0x14
 ###    print "TAL: %s", str(['%02x' % ord(d) for d in TALdata])
-    if TALdata[-1] != '\x14': raise FormatError("Unterminated TAL record")
+    if not TALdata or TALdata[-1] != '\x14': raise FormatError("Unterminated TAL record")
     fields = TALdata.rstrip('\x14').split('\x14')
     times = fields[0].split('\x15')
     if len(times) > 2: raise FormatError("Invalid TAL time header")
@@ -137,6 +178,7 @@ class EDFFile(object):
   #------------------
     self._file = None
     self._newfile = False
+    self.records = None
     self.errors = [ ]
     for (f, l , t) in FILEHDR:
       setattr(self, f, '' if t == str else 0.0 if t == float else 0)
@@ -152,12 +194,20 @@ class EDFFile(object):
   @classmethod
   def open(cls, fname):
   #--------------------
+    """
+    Open an existing EDF file.
+
+    :param fname: The file's path or ``file:`` URL.
+    :raises IOError: If the file can't be opened or its header can't be read,
+      with the message giving the underlying error.
+    """
+    self = cls()
     try:
-      self = cls()
-      self._open(urllib.request.urlopen(fname).fp)
-      return self
-    except Exception:
-      return None
+      self._open(open(_file_name(fname), 'rb'))
+    except Exception as msg:
+      if self._file is not None: self._file.close()
+      raise IOError("Cannot open EDF file '{}' ({}: {})".format(fname, type(msg).__name__, msg))
+    return self
 
   @classmethod
   def fp_open(cls, fp):
@@ -167,33 +217,61 @@ class EDFFile(object):
     return self
 
   @classmethod
-  def create(cls, fname):
-  #----------------------
+  def create(cls, fname, drduration=1.0, start_datetime=None, edf_type=EDF.EDFplusC):
+  #----------------------------------------------------------------------------------
+    """
+    Create a new EDF file, with signals then added by :meth:`add_signal` and
+    their data by :meth:`append_signal`.
+
+    :param fname: The file's path or ``file:`` URL.
+    :param float drduration: The duration, in seconds, of a data record.
+    :param start_datetime: When the recording started. Optional, defaults to now.
+    :type start_datetime: :class:`~datetime.datetime`
+    :param edf_type: The type of file (default = EDF.EDFplusC).
+    """
     self = cls()
-    self._create(open(fname, 'wb'))
+    self._create(open(_file_name(fname), 'wb'), drduration, start_datetime, edf_type)
     return self
 
   def close(self):
   #---------------
+    """
+    Close the file. When a new file is being written, the last data records are
+    written, with a record that is only partially filled padded with zeros, and
+    the header updated with the number of data records.
+    """
+    self.records = None
     if self._file != None:
       if self._newfile:
-        if self._recbuffers.in_use(): raise Exception("Last EDF record is incomplete")
-        self._datarecs = self._recbuffers._recordno 
+        if self._pending is None: self._start_writing()
+        self._write_records(True)
         self.duration = self._datarecs*self._drduration
         self.writeheader()       ## Update datarecs field
       self._file.close()
       self._file = None
 
-  def _create(self, filep):
-  #-----------------------
+  def _create(self, filep, drduration=1.0, start_datetime=None, edf_type=EDF.EDFplusC):
+  #------------------------------------------------------------------------------------
     self._file = filep
     self._newfile = True
-       
+    self.version = '0'
+    self._drduration = drduration
+    self.start_datetime = (start_datetime if start_datetime is not None
+                      else datetime.now().replace(microsecond=0))
+    self.edf_type = edf_type
+    self.annotation_signals = [ ]
+    self.data_signals = [ ]
+    self.rate = [ ]
+    self.scaling = [ ]
+    self._pending = None     # Per-signal lists of digital samples waiting to be written
+
+
   def _open(self, filep):
   #---------------------
     self._file = filep
-    self._getfields('file header', self._file.read(256), FILEHDR)
-    self._getfields('signal headers', self._file.read(256*self._nsignals), SIGNALHDR, self._nsignals)
+    self._getfields('file header', self._file.read(256).decode('latin-1'), FILEHDR)
+    self._getfields('signal headers', self._file.read(256*self._nsignals).decode('latin-1'),
+                    SIGNALHDR, self._nsignals)
     if self._hdrsize != 256*(self._nsignals + 1):
       self._error('Header size mismatch -- expected %d, have %d bytes'
                   % (self._hdrsize, 256*(self._nsignals + 1)))
@@ -212,23 +290,26 @@ class EDFFile(object):
     #: The duration of the EDF file, in seconds.
     self.duration = self._datarecs*self._drduration
 
-    #: The sample rate of each data signal, as samples/second.
-    self.rate = [ n/float(self._drduration) for n in self.nsamples ]
+    #: The sample rate of each data signal, as samples/second. EDF+ files that
+    #: only have annotations may have data records with a duration of zero,
+    #: and then rates are zero.
+    self.rate = [ n/float(self._drduration) if self._drduration else 0.0
+                    for n in self.nsamples ]
 
     #: Scale and offset to convert from data block to physical values.
     self.scaling = [ ]
     for n in self.data_signals:
       try:
-        scale = float(self._physmax[n] - self._physmin[n]) / float(self._digmax[n] - self._digmin[n])
-        self.scaling.append( Scaling(scale, float(self._physmin[n]) - scale * float(self._digmin[n])) )
+        self.scaling.append(self._scaling(n))
       except ZeroDivisionError:
         self._error('Physical max equal to minimum for signal %d: %s' % (n, self.label[n]))
         self.scaling.append( Scaling(1.0, 0.0) )
 
-    self._offsets = [0]
-    for i in range(1, self._nsignals):
-      self._offsets.append(self._offsets[i-1] + 2*self.nsamples[i-1])
-    self._recsize = self._offsets[self._nsignals-1] + 2*self.nsamples[self._nsignals-1]
+    self._set_layout()
+
+    #: A read-only :class:`numpy.memmap` of the file's data records, with the structured
+    #: dtype of a record, or None if the file can't be memory mapped.
+    self.records = self._map_records()
 
     if self.filesize() != os.fstat(self._file.fileno()).st_size:
       self._error('File size mismatch -- expected %d, have %d bytes'
@@ -244,6 +325,89 @@ class EDFFile(object):
     self._checkheader()
 
 
+  def _scaling(self, n):
+  #---------------------
+    scale = float(self._physmax[n] - self._physmin[n]) / float(self._digmax[n] - self._digmin[n])
+    return Scaling(scale, float(self._physmin[n]) - scale * float(self._digmin[n]))
+
+  def _set_layout(self):
+  #---------------------
+    """
+    Set the offsets of signals in a data record, the record's size, and its dtype.
+    """
+    self._offsets = [0]
+    for i in range(1, self._nsignals):
+      self._offsets.append(self._offsets[i-1] + 2*self.nsamples[i-1])
+    self._recsize = self._offsets[self._nsignals-1] + 2*self.nsamples[self._nsignals-1]
+    self._set_record_dtype()
+
+  def _set_record_dtype(self):
+  #---------------------------
+    """
+    Set the structured dtype of a data record, with a field of little-endian
+    2-byte integers for each signal, named by the signal's index.
+    """
+    self._recdtype = np.dtype({ 'names':   [ str(n) for n in range(self._nsignals) ],
+                                'formats': [ ('<i2', (self.nsamples[n],)) for n in range(self._nsignals) ],
+                                'offsets': self._offsets,
+                                'itemsize': self._recsize })
+
+  def _map_records(self):
+  #----------------------
+    """
+    Memory map the data records of a local file.
+
+    :return: A :class:`numpy.memmap` of the records that are present in the file,
+             or None if the file isn't a local file.
+    """
+    fname = getattr(self._file, 'name', None)
+    if not isinstance(fname, str) or self._datarecs <= 0 or self._recsize <= 0:
+      return None
+    try:
+      present = (os.fstat(self._file.fileno()).st_size - self._hdrsize)//self._recsize
+      if present <= 0: return None
+      return np.memmap(fname, dtype=self._recdtype, mode='r', offset=self._hdrsize,
+                       shape=(min(self._datarecs, present),))
+    except (AttributeError, IOError, OSError, ValueError):
+      return None
+
+  def _read_records(self, recno, count):
+  #-------------------------------------
+    """
+    Read consecutive data records.
+
+    :param int recno: The number of the first record to read.
+    :param int count: The number of records to read.
+    :return: An array of the records that could be read, with the
+             structured dtype of a data record.
+
+    When the file is memory mapped the result is a view of :attr:`records`.
+    """
+    if self.records is not None:
+      return self.records[max(0, recno): max(0, recno + count)]
+    count = max(0, min(count, self._datarecs - recno))
+    records = np.zeros(count, dtype=self._recdtype)
+    if count:
+      self._file.seek(self._hdrsize + recno*self._recsize)
+      nbytes = self._file.readinto(records.view(np.uint8))
+      records = records[:(nbytes or 0)//self._recsize]
+    return records
+
+  def _record_blocks(self, recno, lastrec):
+  #----------------------------------------
+    """
+    Read data records in blocks of several records.
+
+    :return: An iterator giving the number of the first record in each
+             block and an array of the block's records.
+    """
+    step = max(1, READBLOCKSIZE//max(1, self._recsize))
+    while recno <= lastrec:
+      records = self._read_records(recno, min(step, lastrec - recno + 1))
+      if len(records) == 0: break
+      yield (recno, records)
+      recno += len(records)
+
   def filesize(self):
   #------------------
     return self._hdrsize + self._datarecs * self._recsize
@@ -303,14 +467,20 @@ class EDFFile(object):
           n += l
         setattr(self, f, fields)
 
+  @staticmethod
+  def _putfield(fld, l, t):
+  #------------------------
+    if t != str and fld != '': fld = _format_number(fld, l)
+    return str(fld).lstrip().ljust(l)[:l]
+
   def _putfields(self, template, count=0):
   #---------------------------------------
     data = [ ]
     for (f, l, t) in template:
       fld = getattr(self, f)
-      if count == 0: data.append(str(fld).lstrip().ljust(l))
+      if count == 0: data.append(self._putfield(fld, l, t))
       else:
-        for i in range(0, count): data.append(str(fld[i]).lstrip().ljust(l))
+        for i in range(0, count): data.append(self._putfield(fld[i], l, t))
     data = ''.join(data)
     ##data = nonprinting.sub(' ', data)
     if nonprinting.search(data): raise FormatError("Non printing characters in output")
@@ -337,9 +507,9 @@ class EDFFile(object):
       self._set_edfplus_fields(RECORDINGFIELDS, fields[1:])
     ## self.recording = ' '.join(fields[5:])  ????
 
-  def _get_edfplus_fields(self, names):
-  #------------------------------------
-    data = [ 'Startdate' ]
+  def _get_edfplus_fields(self, names, prefix=None):
+  #-------------------------------------------------
+    data = [ prefix ] if prefix else [ ]
     for f in names:
       d = getattr(self, f, '').strip()
       data.append(d.replace(' ', '_') if d else 'X')
@@ -351,7 +521,7 @@ class EDFFile(object):
 
   def _encode_recording(self):
   #---------------------------
-    self.recording = self._get_edfplus_fields(RECORDINGFIELDS)
+    self.recording = self._get_edfplus_fields(RECORDINGFIELDS, 'Startdate')
 
   def _checkheader(self):
   #----------------------
@@ -370,14 +540,130 @@ class EDFFile(object):
   def _writeheader(self, output):
   #------------------------------
     output.seek(0)
-    output.write(self._putfields(FILEHDR))
-    output.write(self._putfields(SIGNALHDR, self._nsignals))
+    output.write(self._putfields(FILEHDR).encode('latin-1'))
+    output.write(self._putfields(SIGNALHDR, self._nsignals).encode('latin-1'))
+
+
+  def add_signal(self, label, nsamples, physmin, physmax, units='',
+                 transducer='', prefilter='', digmin=-32768, digmax=32767):
+  #=======================================================================
+    """
+    Add a signal to a new file, before any data has been written.
+
+    :param str label: The signal's label.
+    :param int nsamples: The number of samples of the signal in a data record.
+    :param float physmin: The minimum physical value of the signal.
+    :param float physmax: The maximum physical value of the signal.
+    :param str units: The signal's physical dimension.
+    :return: The index of the signal.
+    """
+    if not self._newfile or self._pending is not None:
+      raise FormatError("Signals can only be added to a new EDF file before writing data")
+    if nsamples <= 0 or digmin >= digmax:
+      raise ValueError("Invalid number of samples or digital range for signal '%s'" % label)
+    physmin = float(_format_number(physmin, 8))   # As they will be read back
+    physmax = float(_format_number(physmax, 8))
+    if physmin == physmax:
+      raise ValueError("Physical minimum and maximum of signal '%s' are equal" % label)
+    signo = self._nsignals
+    for (f, l, t) in SIGNALHDR: getattr(self, f).append('')
+    self.label[signo] = label
+    self.transducer[signo] = transducer
+    self.units[signo] = units
+    self._physmin[signo] = physmin
+    self._physmax[signo] = physmax
+    self._digmin[signo] = digmin
+    self._digmax[signo] = digmax
+    self.prefilter[signo] = prefilter
+    self.nsamples[signo] = nsamples
+    self._nsignals += 1
+    self.data_signals.append(signo)
+    self.rate.append(nsamples/float(self._drduration) if self._drduration else 0.0)
+    self.scaling.append(self._scaling(signo))
+    return signo
 
+  def _start_writing(self):
+  #------------------------
+    if self.edf_type != EDF.EDF:
+      self._add_annotation_signal(ANNOTATIONSIZE)
+    if not self.recording_date:
+      self.recording_date = self.start_datetime.strftime('%d-%b-%Y').upper()
+    self.startdate = self.start_datetime.strftime('%d.%m.%y')
+    self.starttime = self.start_datetime.strftime('%H.%M.%S')
+    if self._nsignals: self._set_layout()
+    self._pending = { n: [ ] for n in self.data_signals }
+    self._datarecs = -1          # Unknown until the file is closed
+    self.writeheader()
+    self._datarecs = 0
+
+  def append_signal(self, signum, data):
+  #=====================================
+    """
+    Append physical values to a signal of a new file.
+
+    Values are converted to digital values, with values outside of the signal's
+    physical range clipped and NaNs set to its digital minimum, and buffered
+    until there are enough to write a batch of complete data records.
+
+    :param int signum: The index of the signal.
+    :param data: The values to append.
+    """
+    if self._pending is None:
+      if not self._newfile: raise FormatError("EDF file is not being written")
+      self._start_writing()
+    if signum not in self.data_signals: raise InvalidSignalId()
+    (scale, offset) = self.scaling[signum]
+    digital = np.rint((np.asarray(data, dtype=float).reshape(-1) - offset)/scale)
+    digital[np.isnan(digital)] = self._digmin[signum]
+    np.clip(digital, self._digmin[signum], self._digmax[signum], out=digital)
+    self._pending[signum].append(digital.astype('<i2'))
+    self._write_records()
+
+  def _write_records(self, complete=False):
+  #----------------------------------------
+    """
+    Write buffered samples as data records.
+
+    :param bool complete: Write all buffered samples, padding the last record
+      with zeros, rather than only a large enough batch of whole records.
+    """
+    if not self.data_signals: return
+    buffered = { n: sum(len(d) for d in self._pending[n]) for n in self.data_signals }
+    if complete:
+      nrecs = max(-(-buffered[n]//self.nsamples[n]) for n in self.data_signals)
+    else:
+      nrecs = min(buffered[n]//self.nsamples[n] for n in self.data_signals)
+      if nrecs*self._recsize < WRITEBLOCKSIZE: return
+    if nrecs <= 0: return
+    records = np.zeros(nrecs, dtype=self._recdtype)
+    for n in self.data_signals:
+      data = np.concatenate(self._pending[n]) if self._pending[n] else np.empty(0, '<i2')
+      count = min(len(data), nrecs*self.nsamples[n])
+      samples = np.zeros(nrecs*self.nsamples[n], dtype='<i2')
+      samples[:count] = data[:count]
+      records[str(n)] = samples.reshape(nrecs, self.nsamples[n])
+      self._pending[n] = [ data[count:] ] if count < len(data) else [ ]
+    for n in self.annotation_signals:
+      size = 2*self.nsamples[n]
+      tals = [ _timekeeping_TAL((self._datarecs + r)*self._drduration) for r in range(nrecs) ]
+      records[str(n)] = np.array([ t.encode('ascii') for t in tals ],
+                                 dtype='S%d' % size).view('<i2').reshape(nrecs, -1)
+    self.write_record(records)
 
   def write_record(self, record):
   #------------------------------
-    assert(record.dtype == np.short)
-    self._file.write(str(record.data))
+    """
+    Write data records to a new file.
+
+    :param record: One or more data records, either with the record's
+      structured dtype or as 2-byte integers in record order.
+    """
+    data = np.ascontiguousarray(record)
+    if data.nbytes % self._recsize:
+      raise FormatError("Data is not a whole number of EDF records")
+    self._file.seek(self._hdrsize + self._datarecs*self._recsize)
+    self._file.write(data.astype(self._recdtype if data.dtype.names else '<i2').tobytes())
+    self._datarecs += data.nbytes//self._recsize
 
 
   def _get_range(self, interval=None):         ## Interval = (start, end) in seconds
@@ -396,17 +682,61 @@ class EDFFile(object):
   #-----------------------------------
     (recno, lastrec), (startratio, endratio) = self._get_range(interval)
     if endratio == 0.0: lastrec -= 1
-    while recno <= lastrec:
-      for n in self.annotation_signals:
-        # An 'EDF Annotations' signal may contain multiple TALs.
-        self._file.seek(self._hdrsize + recno*self._recsize + self._offsets[n])
-        data = self._file.read(2*self.nsamples[n]) # Annotation is Unicode string
-        if data[-1] != '\x00': self._error("TAL doesn't end with NUL")
-        else:
-          for TAL in data.rstrip('\x00').split('\x00'):
-            try: yield TimeStampedAnnotation(TAL)
-            except FormatError as msg: self._error(msg)
-      recno += 1
+    if not self.annotation_signals: return
+    for (_, records) in self._record_blocks(recno, lastrec):
+      for record in records:
+        for n in self.annotation_signals:
+          # An 'EDF Annotations' signal may contain multiple TALs.
+          data = record[str(n)].tobytes().decode('utf-8', 'replace') # Annotation is Unicode string
+          if data[-1] != '\x00': self._error("TAL doesn't end with NUL")
+          else:
+            # A record with no TALs, such as padding, is all NULs
+            for TAL in data.rstrip('\x00').split('\x00'):
+              if not TAL: continue
+              try: yield TimeStampedAnnotation(TAL)
+              except FormatError as msg: self._error(msg)
+
+  def annotation_table(self):
+  #--------------------------
+    """
+    Decode all of the file's annotations in bulk.
+
+    The annotation signals of all data records are scanned as a single block
+    of bytes, in the order of records and then of annotation signals, with the
+    timekeeping TALs that only give the start of a record not included. Each
+    annotation is keyed by the number of its TAL, counting all TALs, and its
+    position in the TAL's list of annotations.
+
+    :rtype: :class:`~biosignalml.data.events.EventTable`
+    """
+    if not self.annotation_signals:
+      return EventTable([], [], [], [])
+    blocks = [ self.records ] if self.records is not None else (
+               records for (_, records) in self._record_blocks(0, self._datarecs - 1) )
+    data = [ ]
+    for records in blocks:
+      data.append(np.hstack([ np.ascontiguousarray(records[str(n)]).reshape((len(records), -1)).view(np.uint8)
+                                for n in self.annotation_signals ]).tobytes())
+    tals = TAL_PATTERN.findall(b''.join(data))
+    counts = [ ]
+    texts = [ ]
+    keys = [ ]
+    for (n, (_, _, annotations)) in enumerate(tals):
+      # Annotations are UTF-8 and each is terminated by 0x14
+      found = [ (m, a.strip()) for (m, a)
+                  in enumerate(annotations.decode('utf-8', 'replace').split('\x14')[:-1]) ]
+      found = [ (m, a) for (m, a) in found if a ]
+      counts.append(len(found))
+      texts.extend(a for (_, a) in found)
+      keys.extend((n, m) for (m, _) in found)
+    if not texts:
+      return EventTable([], [], [], [])
+    counts = np.array(counts)
+    onsets = np.array([ t[0] for t in tals ], dtype='S').astype(float)
+    durations = np.array([ t[1] if t[1] else b'0' for t in tals ], dtype='S').astype(float)
+    (distinct, textids) = np.unique(np.array(texts, dtype=object), return_inverse=True)
+    return EventTable(np.repeat(onsets, counts), np.repeat(durations, counts),
+                      textids.reshape(-1), distinct, keys)
 
 #### Record start must match annotations[0].onset
 #### And annotations[0].annotations[0] must be empty...
@@ -425,10 +755,8 @@ class EDFFile(object):
     self._physmax[signo] = 1
     self._digmin[signo] = -32768
     self._digmax[signo] =  32767
-    self.nsamples[signo] = (maxsize + 1)/2
+    self.nsamples[signo] = (maxsize + 1)//2
     self._nsignals += 1
-    self._offsets.append(self._offsets[signo-1] + 2*self.nsamples[signo-1])
-    self._recsize += 2*self.nsamples[signo]
     return signo
 
 
@@ -438,33 +766,31 @@ class EDFFile(object):
     else:
       for n in signals:
         if n not in self.data_signals: raise InvalidSignalId()
-    (recno, lastrec), (startratio, endratio) = self._get_range(interval)
+    (firstrec, lastrec), (startratio, endratio) = self._get_range(interval)
     dtype = 'short' if scaling == None else 'float32'
-    while recno <= lastrec:
-      if recno == lastrec:
-        if endratio == startratio: return
-        proportion = endratio - startratio
-      else:
-        proportion = 1.0 - startratio
-      for chan, signo in enumerate(signals):
-        self._file.seek(self._hdrsize + recno*self._recsize
-                      + self._offsets[signo] + 2*int(self.nsamples[signo]*startratio))
+    for (blockstart, records) in self._record_blocks(firstrec, lastrec):
+      for (recno, record) in enumerate(records, blockstart):
+        if recno == lastrec:
+          if endratio == startratio: return
+          proportion = endratio - startratio
+        else:
+          proportion = 1.0 - startratio
+        for chan, signo in enumerate(signals):
+          first = int(self.nsamples[signo]*startratio)
 ## _drduration*recno v's TAL onset
 ## No "ordinary signals"  <==>  len(self.data_signals) == 0
-        sigstart = self._drduration*(recno + int(self.nsamples[signo]*startratio)/float(self.nsamples[signo]))
-## What about on big-end system? PPC??
-        raw = np.fromstring(self._file.read(2*int(self.nsamples[signo]*proportion)), np.short)
-        if self.units[signo] == '' or scaling == None: data = raw
-        else:
-          if scaling:
-            scale = float((scaling[1] - scaling[0]))/float(self._digmax[signo] - self._digmin[signo])
-            offset = float(scaling[0]) - scale * float(self._digmin[signo])
+          sigstart = self._drduration*(recno + first/float(self.nsamples[signo]))
+          raw = record[str(signo)][first: first + int(self.nsamples[signo]*proportion)]
+          if self.units[signo] == '' or scaling == None: data = raw.astype(np.short)
           else:
-            (scale, offset) = self.scaling[signo]
-          data = scale * raw.astype(dtype) + offset
-        yield RecordData(signo, sigstart, self.rate[signo], data)
-      recno += 1
-      startratio = 0.0
+            if scaling:
+              scale = float((scaling[1] - scaling[0]))/float(self._digmax[signo] - self._digmin[signo])
+              offset = float(scaling[0]) - scale * float(self._digmin[signo])
+            else:
+              (scale, offset) = self.scaling[signo]
+            data = scale * raw.astype(dtype) + offset
+          yield RecordData(signo, sigstart, self.rate[signo], data)
+        startratio = 0.0
 
 
   def raw_records(self, signals=None, interval=None):
@@ -486,19 +812,21 @@ class EDFFile(object):
     startpos = int(max(0, min(posn, self._datarecs*self.nsamples[signum] - 1)))
     count    = int(max(0, min(min(length, length + posn), rsamples*self._datarecs - startpos)))
     #print rsamples, startpos, count
-    recno = startpos / rsamples
+    recno = startpos // rsamples
     offset = startpos % rsamples
+    if self.records is not None:
+      lastrec = (startpos + count - 1)//rsamples
+      data = self.records[str(signum)][recno: lastrec + 1].reshape(-1)[offset: offset + count]
+      return SignalData(startpos, len(data), data)
+    data = np.empty(count, dtype='short')
     pos = 0
-    data = np.arange(0, dtype='short')
-    while pos < count:
-      n = min(count - pos, rsamples - offset)
-      #print recno, offset
-      self._file.seek(self._hdrsize + recno*self._recsize + self._offsets[signum] + 2*offset)
-      data = np.append(data, np.fromstring(self._file.read(2*n), np.short))
-      pos += n
-      recno += 1
+    for (_, records) in self._record_blocks(recno, (startpos + count - 1)//rsamples):
+      # The signal's samples are a strided view of the records
+      samples = records[str(signum)].reshape(-1)[offset: offset + count - pos]
+      data[pos: pos + len(samples)] = samples
+      pos += len(samples)
       offset = 0
-    return SignalData(startpos, count, data)
+    return SignalData(startpos, pos, data[:pos])
 
   def normalised_signal(self, signum, posn, length, smin=-1.0, smax=1.0):
   #=====================================================================
@@ -20,17 +20,44 @@
 
 import math
 import logging
+from collections import OrderedDict
+
+import numpy as np
 
 #===============================================================================
 
 from ... import rdf
 from .. import BSMLRecording, BSMLSignal, MIMETYPES
 from ...data import DataSegment, UniformTimeSeries, TimeSeries, Clock, UniformClock
+from ...data.pyramid import Pyramid
+from ...model import Recording
 from ...repository import RecordingGraph
 
-from .h5recording import H5Recording
+from .h5recording import H5Recording, StoragePolicy, APPEND_HEAVY, READ_HEAVY
+from .h5writer import H5Writer
 
-__all__ = [ 'HDF5Signal', 'HDF5Recording' ]
+__all__ = [ 'HDF5Signal', 'HDF5Recording', 'H5Writer', 'StoragePolicy', 'APPEND_HEAVY', 'READ_HEAVY' ]
+
+#===============================================================================
+
+def _blocks(chunk, startpos, length, maxpoints):
+#===============================================
+  """
+  Plan the reading of a range of data points from a dataset.
+
+  When the dataset is chunked, blocks end on a chunk boundary and contain as
+  many whole chunks as fit in ``maxpoints``, with at least one chunk, so that
+  each chunk is only read (and decompressed) once.
+
+  :param chunk: The number of data points in a chunk, or None if the dataset isn't chunked.
+  :return: An iterator returning a (start index, number of points) 2-tuple for each block.
+  """
+  while length > 0:
+    if chunk: blocklen = min(length, (startpos//chunk + max(1, maxpoints//chunk))*chunk - startpos)
+    else:     blocklen = min(length, maxpoints)
+    yield (startpos, blocklen)
+    startpos += blocklen
+    length -= blocklen
 
 #===============================================================================
 
@@ -51,9 +78,10 @@ class HDF5Signal(BSMLSignal):
   def __len__(self):
   #-----------------
     """
-    Get the number of data points in a signal.
+    Get the number of data points in a signal, including any buffered for appending.
     """
-    return len(self._h5) if self._h5 is not None else 0
+    if self._h5 is None: return 0
+    return len(self._h5) + self.recording._h5.buffered(self.uri)
 
   def _set_h5_signal(self, h5):
   #----------------------------
@@ -89,7 +117,35 @@ class HDF5Signal(BSMLSignal):
       of the signal data.
 
     If both ``maxduration`` and ``maxpoints`` are given their minimum value is used.
+
+    Data is read in blocks aligned to the chunks of the signal's dataset, so that
+    each chunk is only read (and decompressed) once, with a block being split into
+    several segments if it has more than ``maxpoints`` data points.
+    """
+    startpos, length, maxpoints = self._read_range(interval, segment, maxduration, maxpoints)
+
+## Conversion requires a graph with UOM expressions...
+#    if units is not None:
+#      try:
+#        ...(self.units, units)
+
+    for blockstart, blocklen in _blocks(self._h5.chunk_length, startpos, length, maxpoints):
+      block = self._h5[blockstart: blockstart+blocklen]
+      if len(block) == 0: break
+      for pos in range(0, len(block), maxpoints):
+        yield self._segment(blockstart + pos, block[pos: pos+maxpoints])
+
+  def _read_range(self, interval, segment, maxduration, maxpoints):
+  #----------------------------------------------------------------
     """
+    Find the data points to read from the arguments to :meth:`read`.
+
+    :return: A 3-tuple of the index of the first data point, the number of
+      data points, and the maximum number of points in a segment.
+
+    Any data points buffered for appending to the signal are first written.
+    """
+    self.recording._h5.flush(self.uri)
     if   interval is not None and segment is not None:
       raise ValueError("'interval' and 'segment' cannot both be specified")
     if maxduration:
@@ -117,22 +173,109 @@ class HDF5Signal(BSMLSignal):
       ##startpos = max(0, int(math.floor(seg[0])))
       startpos = max(0, seg[0])
       length = min(len(self), seg[1]+1) - startpos
+    return (startpos, length, maxpoints)
 
-## Conversion requires a graph with UOM expressions...
-#    if units is not None:
-#      try:
-#        ...(self.units, units)
+  def _segment(self, startpos, data):
+  #----------------------------------
+    """
+    Make a :class:`~biosignalml.data.DataSegment` of data starting at a given index.
+    """
+    ## Times are in self.clock.units...
+    if isinstance(self.clock, UniformClock):
+      return DataSegment(self.clock[startpos], UniformTimeSeries(data, self.clock.rate))
+    else:
+      return DataSegment(0, TimeSeries(data, self.clock[startpos: startpos+len(data)]))
+
+  def stats(self, interval=None, segment=None):
+  #--------------------------------------------
+    """
+    Get statistics of a signal's data.
+
+    :param interval: The portion of the signal to summarise.
+    :type interval: :class:`~biosignaml.time.Interval`
+    :param segment: A 2-tuple with start and finishing data indices.
+    :return: A dictionary with the number of values (``count``), the number of
+      NaN values (``nans``), and the ``min``, ``max``, ``mean``, and sum of squares
+      (``sumsq``) of the non-NaN values.
+
+    Chunks of the signal's dataset that are wholly within the range are summarised
+    from the dataset's per-chunk statistics, with only partial chunks at the ends
+    of the range being read.
+    """
+    startpos, length, _ = self._read_range(interval, segment, None, None)
+    (count, nans, lo, hi, total, squares) = self._h5.scale_statistics(
+      self.recording._h5.statistics(self.uri, startpos, startpos + max(0, length)))
+    return { 'count': int(count), 'nans': int(nans), 'min': lo, 'max': hi,
+             'mean': total/count if count else np.nan, 'sumsq': squares }
+
+  def find_where(self, predicate, interval=None, segment=None):
+  #------------------------------------------------------------
+    """
+    Find where a signal's data satisfies a condition.
 
-    while length > 0:
-      if maxpoints > length: maxpoints = length
-      data = self._h5[startpos: startpos+maxpoints]
-      ## Times are in self.clock.units...
-      if isinstance(self.clock, UniformClock):
-        yield DataSegment(self.clock[startpos], UniformTimeSeries(data, self.clock.rate))
+    :param predicate: A function of two arrays, of minimum and maximum values,
+      returning a boolean array that is True where values between the minimum
+      and maximum could satisfy the condition. For example, ``lambda lo, hi: lo < 90``
+      finds data values below 90.
+    :param interval: The portion of the signal to search.
+    :type interval: :class:`~biosignaml.time.Interval`
+    :param segment: A 2-tuple with start and finishing data indices.
+    :return: An `iterator` returning a (start, end) 2-tuple of data indices for
+      each run of data points that satisfy the condition, with the end index
+      being that of the data point immediately after the run.
+
+    The predicate is first given the range of values in each chunk of the signal's
+    dataset, from per-chunk statistics, and only chunks that could contain a match
+    are read. It is then given the values of the data points in these chunks, with
+    the range of a data point that isn't a scalar being that of its components.
+    """
+    startpos, length, _ = self._read_range(interval, segment, None, None)
+    end = startpos + max(0, length)
+    (block, chunkstats) = self.recording._h5.get_statistics(self.uri)
+    chunkstats = self._h5.scale_statistics(chunkstats)
+    first = startpos//block
+    candidates = np.asarray(predicate(chunkstats[first:, 2], chunkstats[first:, 3]), dtype=bool)
+    run = None
+    for chunk in np.flatnonzero(candidates) + first:
+      start = max(startpos, chunk*block)
+      finish = min(end, (chunk + 1)*block)
+      if start >= finish: break
+      values = self._h5.read(slice(start, finish))
+      if values.ndim > 1:
+        values = values.reshape((len(values), -1))
+        matches = predicate(np.fmin.reduce(values, axis=1), np.fmax.reduce(values, axis=1))
       else:
-        yield DataSegment(0, TimeSeries(data, self.clock[startpos: startpos+maxpoints]))
-      startpos += len(data)
-      length -= len(data)
+        matches = predicate(values, values)
+      edges = np.diff(np.concatenate(([0], np.asarray(matches, dtype=np.int8), [0])))
+      for (a, b) in zip(np.flatnonzero(edges == 1) + start, np.flatnonzero(edges == -1) + start):
+        if run is not None and run[1] == a:
+          run = (run[0], int(b))
+        else:
+          if run is not None: yield run
+          run = (int(a), int(b))
+    if run is not None: yield run
+
+  def pyramid(self):
+  #-----------------
+    """
+    Get a multi-resolution summary of the signal's data.
+
+    The summary is kept in the signal's HDF5 file, where it is created, by reading
+    all of the signal's data, if it doesn't exist or no longer matches the signal.
+
+    :rtype: :class:`~biosignalml.data.pyramid.Pyramid`
+    """
+    pyramid = getattr(self, '_pyramid', None)
+    if pyramid is None or pyramid.length != len(self):
+      h5 = self.recording._h5
+      stored = h5.get_pyramid(self.uri)
+      if stored is not None and stored[0] == len(self):
+        pyramid = Pyramid(*stored)
+      else:
+        pyramid = Pyramid.create(d.data for d in self.read())
+        h5.store_pyramid(self.uri, pyramid.length, pyramid.levels, pyramid.factor)
+      self._pyramid = pyramid
+    return pyramid
 
   def initialise(self, **kwds):
   #----------------------------
@@ -164,6 +307,16 @@ class HDF5Signal(BSMLSignal):
       self.recording._h5.extend_clock(self.clock.uri, timeseries.time.times)
     self.recording._h5.extend_signal(self.uri, timeseries.data)
 
+  def flush(self, sync=False):
+  #---------------------------
+    """
+    Write any data points buffered for appending to the signal.
+
+    :param bool sync: If True then also flush the HDF5 file's data to the
+      operating system (default = False).
+    """
+    self.recording._h5.flush(self.uri, sync)
+
   def extend(self, points):
   #------------------------
     '''
@@ -183,6 +336,7 @@ class HDF5Signal(BSMLSignal):
     :type n: non-negative integer
     :return: The value of the n\ :sup:`th` data point.
     """
+    self.recording._h5.flush(self.uri)
     return self._h5[n]
 
   def time(self, n):
@@ -194,6 +348,7 @@ class HDF5Signal(BSMLSignal):
     :type n: non-negative integer
     :return: The time of the n\ :sup:`th` data point.
     """
+    self.recording._h5.flush(self.uri)
     return self._h5.time(n)
 
 #===============================================================================
@@ -205,6 +360,20 @@ class HDF5Recording(BSMLRecording):
 
   :param uri: The recording's URI.
   :param dataset: The file path or URI of the BioSignalML HDF5 file for the recording.
+  :param storage: How signal datasets are chunked and compressed. Optional.
+  :type storage: :class:`StoragePolicy`
+  :param int buffersize: The number of data points to buffer for a signal before
+    appending them to its dataset (default = 0, no buffering).
+  :param float flushtime: The maximum time, in seconds, that data points are buffered.
+    Optional.
+  :param bool writer: When creating a recording, have a separate process, an
+    :class:`H5Writer`, write the file (default = False). Signals can then be
+    created and appended to, but not read, with the recording's :attr:`writer`
+    able to be passed to other processes for them to append data.
+  :param bool lazy: When opening a recording, defer parsing its RDF metadata until
+    :attr:`graph` is first used, or :meth:`load_metadata` is called, and only create
+    a signal when it is first accessed (default = False). Until then the recording's
+    duration is that of its longest signal, as found from the signal datasets.
   :param kwds: :class:`~biosignalml.Recording` attributes to set.
   """
 
@@ -216,32 +385,47 @@ class HDF5Recording(BSMLRecording):
   #---------------------------------------------
     self._h5 = None
     self._readonly = True
+    self._lazy = False
+    self._metadata_pending = False
+    self._duration_from_data = False
     newfile = kwds.pop('create', False)
+    lazy = kwds.pop('lazy', False)
+    storage = kwds.pop('storage', None)
+    buffering = { 'buffersize': kwds.pop('buffersize', 0),
+                  'flushtime':  kwds.pop('flushtime', None) }
+    writer = kwds.pop('writer', False)
+    if writer and not newfile:
+      raise ValueError("A writer process can only be used when creating a recording")
     if uri is None and (newfile or dataset is None):
       raise TypeError("No URI given for HDF5 recording")
     if uri is not None:
       BSMLRecording.__init__(self, uri, dataset, **kwds)
     if dataset:
       if newfile:
-        self._h5 = H5Recording.create(uri, str(dataset), **kwds)
+        if writer:
+          self._h5 = H5Writer(uri, str(dataset), create=True, storage=storage,
+                              replace=kwds.get('replace', False), **buffering)
+        else:
+          self._h5 = H5Recording.create(uri, str(dataset), storage=storage, **buffering, **kwds)
         self.graph = RecordingGraph(uri, rec_class=HDF5Recording)
         self._readonly = False
       else:
         try:
-          self._h5 = H5Recording.open(dataset, **kwds)
+          self._h5 = H5Recording.open(dataset, storage=storage, **buffering, **kwds)
           if uri is None:
             BSMLRecording.__init__(self, self._h5.uri, dataset, **kwds)
           elif uri != self._h5.uri:
             raise TypeError("Wrong URI in HDF5 recording")
-          self._load_metadata()
-          for n, s in enumerate(self._h5.signals()):
-            signal = HDF5Signal.create_from_H5Signal(n, s)
-            signal.add_metadata(self.graph)
-            signal.clock.add_metadata(self.graph)  ## We need to cache clocks in recording...
-            self.add_signal(signal)
-
-          # if self.duration is None:
-          #   set duration to that of longest signal/clock
+          if lazy:
+            self._lazy = True
+            self._metadata_pending = True
+          else:
+            self._load_metadata()
+            for s in self._h5.signals():
+              self._add_h5_signal(s)
+          if self.duration is None:
+            self.duration = self._data_duration()
+            self._duration_from_data = self._metadata_pending
 
           if 'readonly' not in kwds:
             self._readonly = False    # File has been sucessfully opened
@@ -249,6 +433,102 @@ class HDF5Recording(BSMLRecording):
           self.close()
           raise
 
+  @property
+  def graph(self):
+  #---------------
+    """The recording's RDF metadata, parsed when first used if loading is deferred."""
+    if self._metadata_pending:
+      self._metadata_pending = False
+      self._load_metadata()
+    return self._graph
+
+  @graph.setter
+  def graph(self, graph):
+  #----------------------
+    self._graph = graph
+
+  def load_metadata(self):
+  #-----------------------
+    """
+    Set the attributes of the recording, and of any signals already accessed,
+    from its RDF metadata, if this was deferred when the recording was opened.
+    """
+    self.graph
+
+  def _add_h5_signal(self, h5signal):
+  #----------------------------------
+    """
+    Create a signal for a signal dataset and add it to the recording, setting
+    its attributes from metadata unless parsing the metadata is deferred.
+    """
+    signal = HDF5Signal.create_from_H5Signal(None, h5signal)
+    if not self._metadata_pending:
+      signal.add_metadata(self.graph)
+      signal.clock.add_metadata(self.graph)  ## We need to cache clocks in recording...
+    self._check_recording(signal)
+    return self.add_resource(signal)
+
+  def _check_recording(self, signal):
+  #----------------------------------
+    """
+    Check that a signal's metadata doesn't place it in another recording, as
+    :meth:`add_signal` does, and make it one of this recording's signals.
+    """
+    if signal.recording is not None and signal.recording is not self:
+      if isinstance(signal.recording, Recording): rec_uri = signal.recording.uri
+      else:                                       rec_uri = signal.recording
+      if str(rec_uri) != str(self.uri):
+        raise Exception("Adding to '%s', but signal '%s' is in '%s'"
+                        % (self.uri, signal.uri, rec_uri))
+    signal.recording = self
+
+  def _data_duration(self):
+  #------------------------
+    """
+    The duration of the recording's longest signal, found from its datasets
+    without using metadata.
+    """
+    duration = None
+    for s in self._h5.signals():
+      if s.rate:                                end = len(s)/float(s.rate)
+      elif s.clock is not None and len(s) > 0:  end = float(s.clock[len(s) - 1])
+      else:                                     continue
+      duration = end if duration is None else max(duration, end)
+    return duration
+
+  def get_signal(self, uri):
+  #-------------------------
+    """
+    Retrieve a :class:`HDF5Signal` from the recording.
+
+    :param uri: The URI of the signal.
+    :rtype: :class:`HDF5Signal`
+
+    When the recording was opened lazily, the signal is created from its
+    dataset the first time it is retrieved.
+    """
+    try:
+      return BSMLRecording.get_signal(self, uri)
+    except KeyError:
+      if not self._lazy or self._h5 is None: raise
+      h5signal = self._h5.get_signal(uri)
+      if h5signal is None: raise
+      return self._add_h5_signal(h5signal)
+
+  def signals(self):
+  #-----------------
+    """
+    The recording's signals as a list.
+
+    When the recording was opened lazily, signals not already retrieved are
+    created from their datasets.
+    """
+    if self._lazy and self._h5 is not None:
+      for s in self._h5.signals():
+        if self.get_resource(s.uri) is None: self._add_h5_signal(s)
+      self._lazy = False
+    return BSMLRecording.signals(self)
+
   @classmethod
   def open(cls, dataset, **kwds):
   #------------------------------
@@ -283,6 +563,23 @@ class HDF5Recording(BSMLRecording):
       self._h5.close()
       self._h5 = None
 
+  @property
+  def writer(self):
+  #----------------
+    """The :class:`H5Writer` writing the recording's file, or None."""
+    return self._h5 if isinstance(self._h5, H5Writer) else None
+
+  def flush(self, sync=False):
+  #---------------------------
+    """
+    Write all data points buffered for appending to the recording's signals.
+
+    :param bool sync: If True then also flush the HDF5 file's data to the
+      operating system (default = False).
+    """
+    if self._h5:
+      self._h5.flush(sync=sync)
+
   def new_signal(self, uri, units, id=None, **kwds) -> HDF5Signal:
   #-------------------------------------------------
     """
@@ -290,19 +587,88 @@ class HDF5Recording(BSMLRecording):
 
     :param uri: The URI for the signal.
     :param units: The physical units of the signal's data.
+    :param storage: How the signal's dataset is chunked and compressed. Optional,
+                    defaults to the recording's storage policy.
+    :type storage: :class:`StoragePolicy`
     :rtype: :class:`HDF5Signal`
     :param kwds: Other :class:`~biosignalml.Signal` attributes to set.
     """
+    storage = kwds.pop('storage', None)
     sig: HDF5Signal = BSMLRecording.new_signal(self, uri, units, id=id, **kwds)
     ## Above uses SignalClass to create a HDF5Signal
     if self._h5:
       if sig.clock:
-        self._h5.create_clock(sig.clock.uri, sig.clock.units, times=sig.clock.times)
+        self._h5.create_clock(sig.clock.uri, sig.clock.units, times=sig.clock.times,
+                              storage=storage)
         kwds['clock'] = sig.clock.uri
-      sig._h5 = self._h5.create_signal(sig.uri, units, **kwds)
+      h5 = self._h5.create_signal(sig.uri, units, storage=storage, **kwds)
+      if h5 is not None: sig._set_h5_signal(h5)
     return sig
 
 
+  def read_signals(self, uris, interval=None, segment=None, maxduration=None, maxpoints=None):
+  #------------------------------------------------------------------------------------------
+    """
+    Read data from several signals at once.
+
+    Signals in the same (compound) dataset are read together, and each dataset
+    is read in blocks aligned to its own chunks, so that every chunk of every
+    dataset is read, and decompressed, only once.
+
+    :param uris: The URIs of the signals to read. All signals must have the
+      same timing, that is, have the same sampling rate or clock.
+    :param interval: The portion of the signals to read.
+    :type interval: :class:`~biosignaml.time.Interval`
+    :param segment: A 2-tuple with start and finishing data indices, with the end
+      point not included in the returned range.
+    :param maxduration: The maximum duration, in seconds, of a single returned segment.
+    :param maxpoints: The maximum length, in samples, of a single returned segment.
+    :return: An `iterator` returning, for each portion of the signals read, a list
+      with a :class:`~biosignalml.data.DataSegment` for each signal, in the same order
+      as ``uris``.
+    """
+    signals = [ self.get_signal(uri) for uri in uris ]
+    if not signals: return
+    first = signals[0]
+    timing = lambda s: (s.rate if isinstance(s.clock, UniformClock) else str(s.clock.uri))
+    for sig in signals[1:]:
+      if timing(sig) != timing(first):
+        raise ValueError("Signals being read together must have the same timing")
+    for sig in signals:
+      self._h5.flush(sig.uri)
+    startpos, length, maxpoints = first._read_range(interval, segment, maxduration, maxpoints)
+    length = min(length, min(len(sig) for sig in signals) - startpos)
+
+    datasets = OrderedDict()   # Group signals by dataset
+    for n, sig in enumerate(signals):
+      datasets.setdefault(sig._h5.name, [ ]).append((n, sig))
+
+    # Each dataset is read in blocks aligned to its own chunks, with rows kept
+    # until all of their data points have been returned
+    readers = { }
+    for name, members in datasets.items():
+      h5 = members[0][1]._h5
+      readers[name] = [ _blocks(h5.chunk_length, startpos, length, maxpoints),
+                        startpos, h5.rows(slice(startpos, startpos)) ]
+
+    for segstart, seglen in _blocks(None, startpos, length, maxpoints):
+      columns = [ None ]*len(signals)
+      for name, members in datasets.items():
+        reader = readers[name]
+        (blocks, rowstart, rows) = reader
+        while rowstart + len(rows) < segstart + seglen:
+          block = next(blocks, None)
+          if block is None: break
+          rows = np.concatenate((rows[segstart - rowstart:],
+                                 members[0][1]._h5.rows(slice(block[0], block[0] + block[1]))))
+          rowstart = segstart
+        segment = rows[segstart - rowstart: segstart - rowstart + seglen]
+        reader[1:] = [ rowstart, rows ]
+        for n, sig in members:
+          columns[n] = sig._h5.scale(segment if sig._h5.index is None else segment[:, sig._h5.index])
+      if len(columns[0]) == 0: break
+      yield [ sig._segment(segstart, columns[n]) for n, sig in enumerate(signals) ]
+
   def _save_metadata(self, format=rdf.Format.TURTLE, prefixes=None):
   #-----------------------------------------------------------------
     """
@@ -311,25 +677,44 @@ class HDF5Recording(BSMLRecording):
 
     :param format: The :class:`~biosignalml.rdf.Format` in which to serialise RDF.
     :param prefixes: An optional dictionary of namespace abbreviations and URIs.
+
+    A binary encoding of the metadata's statements is also saved, to be used
+    in preference to the serialised RDF when the recording is next opened.
     """
     self.save_metadata_to_graph(self.graph)
+    (terms, triples) = self.graph.encode()
     self._h5.store_metadata(
       self.graph.serialise(format=format, prefixes=prefixes, base=self.uri),
-      rdf.Format.mimetype(format))
+      rdf.Format.mimetype(format), terms, triples)
 
   def _load_metadata(self):
   #------------------------
     """
     Set metadata attributes of the recording from its associated
     BioSignalML HDF5 file.
+
+    The file's binary encoding of the metadata is used if it is current,
+    otherwise the serialised RDF is parsed.
     """
-    string, format = self._h5.get_metadata()
-    if string:
+    cache = self._h5.get_metadata_cache()
+    if cache is not None:
+      self.graph = RecordingGraph.create_from_encoding(self.uri, *cache, rec_class=HDF5Recording)
+    else:
+      string, format = self._h5.get_metadata()
+      if not string:
+        raise TypeError("No metadata in BioSignalML file")
       self.graph = RecordingGraph.create_from_string(self.uri, string,
                                                      format=format, rec_class=HDF5Recording)
-      self.add_metadata(self.graph)
-    else:
-      raise TypeError("No metadata in BioSignalML file")
+    if self._duration_from_data:   # Metadata takes precedence
+      (duration, self.duration) = (self.duration, None)
+    self.add_metadata(self.graph)
+    if self._duration_from_data:
+      if self.duration is None: self.duration = duration
+      self._duration_from_data = False
+    for signal in self.resources(HDF5Signal):
+      signal.add_metadata(self.graph)
+      signal.clock.add_metadata(self.graph)
+      self._check_recording(signal)
 
   def initialise(self, **kwds):
   #----------------------------
@@ -42,6 +42,11 @@ Files are structured as follows::
     ./clock    Group
       /0       Dataset   uri, units, rate/period
        .
+    ./pyramid  Group
+      ./0      Group     uri, length, factor
+        ./0    Dataset
+         .
+       .
 
 
 Objects and Attributes
@@ -66,6 +71,18 @@ the recording and its signals, stored as a UTF-8 string. The ``mimetype`` attrib
 the serialisation format, using standard mimetypes for RDF.
 
 
+/metadata_cache (group)
+-----------------------
+
+An optional binary encoding of the RDF statements in '/metadata', which is quicker
+to load than parsing the serialisation. The ``terms`` dataset is an array of strings,
+each being a distinct RDF term, and the ``triples`` dataset has a row of
+(subject, predicate, object) indices into ``terms`` for each statement. The ``digest``
+attribute is the SHA-1 digest of the '/metadata' dataset's value; the cache is
+ignored if this doesn't match, say because '/metadata' has been updated without
+updating the cache.
+
+
 /uris (group)
 -------------
 
@@ -120,6 +137,43 @@ default units of seconds. A clock can optionally have either a ``rate'' or ``per
 obtain a value in the specified units.
 
 
+/recording/pyramid (group)
+--------------------------
+
+Optional min/max/mean summaries of signal data, used to quickly obtain overviews
+of long signals, are contained within a 'pyramid' group in '/recording'.
+
+/recording/pyramid/N (group)
+----------------------------
+
+A pyramid group is named after its signal's dataset, with the signal's index appended
+(as '.I') when the dataset is compound. Attributes are the signal's ``uri``, the
+number of data points summarised (``length``), and the number of blocks of one level
+that are combined to form a block of the next (``factor``). Each level is stored as
+a numbered dataset, starting from '0', with a (min, max, mean) row for every block of
+``factor**(level+1)`` data points.
+
+
+/recording/statistics (group)
+-----------------------------
+
+Summaries of the data in each chunk of a signal dataset, used to find statistics
+of, and to search, long signals without reading every chunk, are contained within
+a 'statistics' group in '/recording'.
+
+/recording/statistics/N (dataset)
+---------------------------------
+
+A statistics dataset has the same name as its signal dataset and a row for each
+chunk (or block of ``block`` data points) of the signal dataset. Each row has an
+element for each signal in the dataset, being the count of values, the count of NaN
+values, and the minimum, maximum, sum, and sum of squares of the non-NaN values, all
+of data as stored (i.e. before any offset or gain is applied). The values of a
+data point that isn't a scalar are all included in its chunk's statistics. The
+``length`` attribute is the number of data points summarised; the statistics
+are out-of-date if this isn't the length of the signal dataset.
+
+
 Signals and Timing
 ==================
 
@@ -135,6 +189,10 @@ matrix 'time' values,
 
 #===============================================================================
 
+import time
+import hashlib
+import logging
+import threading
 from functools import reduce
 import urllib.request, urllib.parse, urllib.error
 
@@ -145,7 +203,8 @@ import numpy as np
 
 #===============================================================================
 
-__all__ = [ 'H5Clock', 'H5Signal', 'H5Recording', 'IDENTIFIER' ]
+__all__ = [ 'H5Clock', 'H5Signal', 'H5Recording', 'IDENTIFIER', 'StoragePolicy',
+            'APPEND_HEAVY', 'READ_HEAVY', 'STATISTICS' ]
 
 
 MAJOR      = '1'
@@ -159,6 +218,124 @@ COMPRESSION = 'gzip'                          #: Szip gives best performance
 
 DTYPE_STRING = h5py.special_dtype(vlen=str)   #: Store strings as variable length.
 
+STATISTICS = ('count', 'nans', 'min', 'max', 'sum', 'sumsq')  #: The statistics kept for each chunk
+STATISTICS_BLOCK = 4096   #: Data points summarised together when a dataset isn't chunked
+STATISTICS_READ = 1 << 20 #: Data points read at a time when recreating statistics
+
+#===============================================================================
+
+def _chunk_statistics(rows, start, chunk, compound=False):
+#=========================================================
+  """
+  Find the statistics of data points for each chunk they are in.
+
+  :param rows: Data points, as stored in a signal dataset.
+  :param int start: The index in the dataset of the first data point.
+  :param int chunk: The number of data points in a chunk.
+  :param bool compound: True if ``rows`` are from a compound dataset.
+  :return: An array with a row for each chunk, starting with the chunk that
+           contains ``start``, of :data:`STATISTICS` for each signal.
+  """
+  values = np.asarray(rows, dtype=float)
+  values = values.reshape((len(values), values.shape[1] if compound else 1, -1))
+  bounds = np.concatenate(([0], np.arange(chunk - start%chunk, len(values), chunk)))
+  nans = np.isnan(values)
+  zeroed = np.where(nans, 0.0, values)
+  return np.stack((np.add.reduceat((~nans).sum(axis=2), bounds),
+                   np.add.reduceat(nans.sum(axis=2), bounds),
+                   np.fmin.reduceat(np.fmin.reduce(values, axis=2), bounds),
+                   np.fmax.reduceat(np.fmax.reduce(values, axis=2), bounds),
+                   np.add.reduceat(zeroed.sum(axis=2), bounds),
+                   np.add.reduceat((zeroed*zeroed).sum(axis=2), bounds)), axis=-1)
+
+def _merge_statistics(stats):
+#============================
+  """
+  Combine statistics.
+
+  :param stats: An array whose first axis indexes the statistics to be combined.
+  :return: An array of :data:`STATISTICS`.
+  """
+  stats = np.asarray(stats, dtype=float)
+  merged = stats.sum(axis=0)
+  merged[..., 2] = np.fmin.reduce(stats[..., 2], axis=0) if len(stats) else np.nan
+  merged[..., 3] = np.fmax.reduce(stats[..., 3], axis=0) if len(stats) else np.nan
+  return merged
+
+#===============================================================================
+
+class StoragePolicy(object):
+#===========================
+  """
+  How signal and clock datasets are chunked and compressed.
+
+  :param int chunk_samples: The number of data points in a chunk. Optional, the
+                            default is to let HDF5 choose a chunk size.
+  :param float chunk_duration: The duration, in time units, of a chunk. This is
+                               used instead of ``chunk_samples`` for datasets
+                               with a known sampling rate. Optional.
+  :param str compression: One of 'gzip', 'lzf', 'szip', or None for no compression.
+  :param int level: The compression level to use with 'gzip'. Optional.
+  :param bool shuffle: If True apply the byte shuffle filter before compressing
+                       (default = False).
+  """
+
+  def __init__(self, chunk_samples=None, chunk_duration=None,
+                     compression=COMPRESSION, level=None, shuffle=False):
+  #---------------------------------------------------------------------
+    if compression not in [None, 'gzip', 'lzf', 'szip']:
+      raise ValueError("Unknown compression '{}'".format(compression))
+    if level is not None and compression != 'gzip':
+      raise ValueError("A compression level can only be given for 'gzip'")
+    self.chunk_samples = chunk_samples
+    self.chunk_duration = chunk_duration
+    self.compression = compression
+    self.level = level
+    self.shuffle = shuffle
+
+  def chunk_length(self, rate=None):
+  #---------------------------------
+    """
+    The number of data points in a chunk.
+
+    :param float rate: The dataset's sampling rate, in samples/time-unit. Optional.
+    :return: The chunk length, or None if HDF5 is to choose chunking.
+    """
+    if self.chunk_duration and rate:
+      return max(1, int(round(self.chunk_duration*float(rate))))
+    return self.chunk_samples
+
+  def dataset_options(self, pointshape=(), rate=None, compression=None):
+  #---------------------------------------------------------------------
+    """
+    Get chunking and filter options for creating a dataset.
+
+    :param tuple pointshape: The shape of a single data point in the dataset.
+    :param float rate: The dataset's sampling rate, in samples/time-unit. Optional.
+    :param str compression: Use this compression instead of the policy's. Optional.
+    :return: Keyword arguments for :meth:`h5py.Group.create_dataset`.
+    :rtype: dict
+    """
+    length = self.chunk_length(rate)
+    options = { 'chunks': ((length,) + tuple(pointshape)) if length else True }
+    if compression is None:
+      compression = self.compression
+      if self.level is not None: options['compression_opts'] = self.level
+    if compression:
+      options['compression'] = compression
+    if self.shuffle:
+      options['shuffle'] = True
+    return options
+
+
+DEFAULT_STORAGE = StoragePolicy()   #: Let HDF5 choose chunks and compress using :data:`COMPRESSION`.
+
+APPEND_HEAVY = StoragePolicy(chunk_samples=8192, compression='lzf')
+"""Small chunks with fast compression, favouring write throughput."""
+
+READ_HEAVY = StoragePolicy(chunk_samples=65536, compression='gzip', level=6, shuffle=True)
+"""Large, well compressed, chunks, favouring file size and sequential reads."""
+
 #===============================================================================
 
 class H5Clock(object):
@@ -167,17 +344,39 @@ class H5Clock(object):
   A clock in a HDF5 recording.
 
   :param dataset: A :class:`h5py.Dataset` containing the clock's data and attributes.
+
+  The clock's attributes and length are read from the dataset when the clock
+  is created and cached; :meth:`invalidate` must be called if the dataset is
+  changed other than by the clock's :class:`H5Recording`.
   """
 
   def __init__(self, dataset):
   #---------------------------
     self.dataset = dataset
     self._times = np.empty(0)
+    self.invalidate()
 
     ## duration ???
     # resolution is defined as measured in seconds
     ## duration(secs) = times[length-1]*resolution
 
+  def invalidate(self):
+  #--------------------
+    """Refresh cached attributes and length from the clock's dataset."""
+    attrs = self.dataset.attrs
+    self._uri = attrs['uri']
+    self._units = attrs.get('units')
+    self._period = attrs.get('period')
+    self._rate = attrs.get('rate')
+    self._length = self.dataset.len()
+    self._times = np.empty(0)
+
+  def _scale(self, t):
+  #-------------------
+    if   self._period: return t*float(self._period)
+    elif self._rate:   return t/float(self._rate)
+    else:              return t   ### * resolution
+
   @property
   def name(self):
   #--------------
@@ -188,31 +387,25 @@ class H5Clock(object):
   def uri(self):
   #-------------
     """The URI of the clock."""
-    return self.dataset.attrs['uri']
+    return self._uri
 
   @property
   def times(self):
   #---------------
     """The time points of the clock."""
-    if self.dataset.len() != len(self._times):
-      attrs = self.dataset.attrs
-      if   attrs.get('period'):
-        self._times = np.asarray(self.dataset)*float(attrs['period'])
-      elif attrs.get('rate'):
-        self._times = np.asarray(self.dataset)/float(attrs['rate'])
-      else:
-        self._times = np.asarray(self.dataset)
+    if self._length != len(self._times):
+      self._times = self._scale(np.asarray(self.dataset))
     return self._times
 
   @property
   def units(self):
   #---------------
     """The physical units of the clock."""
-    return self.dataset.attrs.get('units')
+    return self._units
 
   def __len__(self):
   #-----------------
-    return self.dataset.len()
+    return self._length
 
   def __getitem__(self, pos):
   #--------------------------
@@ -222,11 +415,9 @@ class H5Clock(object):
     :param pos: A time point index or slice specifying a range.
     :type pos: A Python slice.
     """
-    t = self.dataset[pos]
-    attrs = self.dataset.attrs
-    if   attrs.get('period'): return t*float(attrs['period'])
-    elif attrs.get('rate'):   return t/float(attrs['rate'])
-    else:                     return t   ### * resolution
+    if self._length == len(self._times):
+      return self._times[pos]
+    return self._scale(self.dataset[pos])
 
   def time(self, pos):
   #-------------------
@@ -241,14 +432,47 @@ class H5Signal(object):
 
   :param dataset: A :class:`h5py.Dataset` containing the signal's data and attributes.
   :param index: The index of the signal if the dataset is compound, otherwise None.
+  :param mmap: A :class:`numpy.memmap` of the dataset's data, used in place of
+               the dataset when reading. Optional.
+  :param clock: The :class:`H5Clock` of the signal. Optional, it is otherwise found
+                from the dataset's ``clock`` attribute.
+
+  The signal's attributes and length are read from the dataset when the signal
+  is created and cached; :meth:`invalidate` must be called if the dataset is
+  changed other than by the signal's :class:`H5Recording`.
   """
 
-  def __init__(self, dataset, index=None):
-  #---------------------------------------
+  def __init__(self, dataset, index=None, mmap=None, clock=None):
+  #--------------------------------------------------------------
     self.dataset = dataset
     self.index = index
-    self.gain = self.dataset.attrs.get('gain', 1.0)
-    self.offset = self.dataset.attrs.get('offset', 0)
+    self._mmap = mmap
+    self._clock = clock
+    self.invalidate()
+
+  def invalidate(self):
+  #--------------------
+    """Refresh cached attributes and length from the signal's dataset."""
+    attrs = self.dataset.attrs
+    self.gain = attrs.get('gain', 1.0)
+    self.offset = attrs.get('offset', 0)
+    uri = attrs['uri']
+    self._uri = uri if self.index is None else uri[self.index]
+    units = attrs.get('units')
+    self._units = units if self.index is None or units is None else units[self.index]
+    rate = attrs.get('rate')
+    period = attrs.get('period')
+    if   rate:   self._rate, self._period = rate, 1.0/rate
+    elif period: self._rate, self._period = 1.0/period, period
+    else:        self._rate, self._period = None, None
+    clockref = attrs.get('clock')
+    if not clockref:
+      self._clock = None
+    elif self._clock is None:
+      self._clock = H5Clock(self.dataset.file[clockref])
+    self._timeunits = self._clock.units if self._clock is not None else attrs.get('timeunits')
+    self._length = self.dataset.len()
+    self._statistics = None   # (block, length, statistics) when recreated but not saved
 
   @property
   def name(self):
@@ -260,52 +484,47 @@ class H5Signal(object):
   def uri(self):
   #-------------
     """The URI of the signal."""
-    uri = self.dataset.attrs['uri']
-    return uri if self.index is None else uri[self.index]
+    return self._uri
 
   @property
   def units(self):
   #---------------
     """The physical units of the signal's data."""
-    units = self.dataset.attrs['units']
-    return units if self.index is None else units[self.index]
+    return self._units
 
   @property
   def rate(self):
   #--------------
     """The sampling rate of the signal, or None if sampling is non-uniform."""
-    attrs = self.dataset.attrs
-    if   attrs.get('rate'):   return attrs['rate']
-    elif attrs.get('period'): return 1.0/attrs['period']
+    return self._rate
 
   @property
   def period(self):
   #----------------
     """The sampling period of the signal, or None if sampling is non-uniform."""
-    attrs = self.dataset.attrs
-    if   attrs.get('period'): return attrs['period']
-    elif attrs.get('rate'):   return 1.0/attrs['rate']
+    return self._period
 
   @property
   def timeunits(self):
   #-------------------
     """The units signal timing is measured in."""
-    attrs = self.dataset.attrs
-    if attrs.get('clock'):
-      return self.dataset.file[attrs['clock']].attrs.get('units')
-    else:
-      return attrs.get('timeunits')
+    return self._timeunits
 
   @property
   def clock(self):
   #---------------
     """The signal's clock dataset, or None if sampling is regular"""
-    attrs = self.dataset.attrs
-    if attrs.get('clock'): return H5Clock(self.dataset.file[attrs['clock']])
+    return self._clock
+
+  @property
+  def chunk_length(self):
+  #----------------------
+    """The number of data points in a chunk of the dataset, or None if it isn't chunked."""
+    return self.dataset.chunks[0] if self.dataset.chunks else None
 
   def __len__(self):
   #-----------------
-    return self.dataset.len()
+    return self._length
 
   def __getitem__(self, pos):
   #--------------------------
@@ -315,10 +534,89 @@ class H5Signal(object):
     :param pos: A data point index or slice specifying a range.
     :type pos: A Python slice.
     """
-    data = self.dataset[pos] if self.index is None else self.dataset[pos, self.index]
-    if self.offset != 0: data -= self.offset
-    if self.gain != 1.0: data = data/float(self.gain)
-    return data
+    return self.read(pos)
+
+  def raw(self, pos):
+  #------------------
+    """
+    Get signal data as stored, without any offset or gain applied.
+
+    :param pos: A data point index or slice specifying a range.
+    :type pos: A Python slice.
+    :return: A read-only view of the file's data when the dataset is memory mapped,
+             otherwise a new array.
+    """
+    source = self._mmap if self._mmap is not None else self.dataset
+    return source[pos] if self.index is None else source[pos, self.index]
+
+  def rows(self, pos):
+  #-------------------
+    """
+    Get data as stored for all signals in the signal's dataset.
+
+    :param pos: A data point index or slice specifying a range.
+    :type pos: A Python slice.
+
+    For a compound dataset each row has a value for every constituent
+    signal, otherwise this is the same as :meth:`raw`.
+    """
+    source = self._mmap if self._mmap is not None else self.dataset
+    return source[pos]
+
+  def scale(self, data, out=None):
+  #-------------------------------
+    """
+    Apply the signal's offset and gain to data as stored.
+
+    :param data: Data values as stored in the signal's dataset.
+    :param out: An array, of the correct shape, in which to place the result. Optional.
+    :type out: :class:`numpy.ndarray`
+    :return: ``data`` itself if there is no offset, gain, or ``out`` array.
+    """
+    if self.offset == 0 and self.gain == 1.0:
+      if out is None: return data
+      out[...] = data
+      return out
+    if out is None:
+      out = np.empty(np.shape(data), np.result_type(data, float))
+    np.subtract(data, self.offset, out=out)
+    if self.gain != 1.0: np.divide(out, float(self.gain), out=out)
+    return out
+
+  def scale_statistics(self, stats):
+  #---------------------------------
+    """
+    Apply the signal's offset and gain to statistics of data as stored.
+
+    :param stats: An array whose last axis has :data:`STATISTICS`.
+    :rtype: :class:`numpy.ndarray`
+    """
+    stats = np.array(stats, dtype=float)
+    if self.offset == 0 and self.gain == 1.0:
+      return stats
+    (count, _, lo, hi, total, squares) = np.moveaxis(stats, -1, 0).copy()
+    (gain, offset) = (float(self.gain), float(self.offset))
+    stats[..., 2] = (lo - offset)/gain
+    stats[..., 3] = (hi - offset)/gain
+    if gain < 0: stats[..., 2:4] = stats[..., 3:1:-1]
+    stats[..., 4] = (total - offset*count)/gain
+    stats[..., 5] = (squares - 2*offset*total + offset*offset*count)/(gain*gain)
+    return stats
+
+  def read(self, pos, out=None):
+  #-----------------------------
+    """
+    Get signal data, with any offset and gain applied.
+
+    :param pos: A data point index or slice specifying a range.
+    :type pos: A Python slice.
+    :param out: An array, of the correct shape, in which to place the result. Optional.
+    :type out: :class:`numpy.ndarray`
+
+    When the dataset is memory mapped and neither ``out``, an offset, nor a gain is
+    given then a read-only view of the file's data is returned.
+    """
+    return self.scale(self.raw(pos), out)
 
   def time(self, i):
   #-----------------
@@ -327,11 +625,82 @@ class H5Signal(object):
 
     :param int i: The data point's index.
     """
-    attrs = self.dataset.attrs
-    if attrs.get('clock'):
-      return self.dataset.file[attrs['clock']][i]
+    if self._clock is not None:
+      return self._clock[i]
     else:
-      return i * self.period
+      return i * self._period
+
+  def times(self, indices):
+  #------------------------
+    """
+    Get the 'times' of several data points.
+
+    :param indices: The data points' indices.
+    :type indices: :class:`numpy.ndarray` or an iterable of int.
+    :rtype: :class:`numpy.ndarray`
+    """
+    indices = np.asarray(indices)
+    if self._clock is not None:
+      return self._clock.times[indices]
+    else:
+      return indices * self._period
+
+#===============================================================================
+
+class _WriteBuffer(object):
+#==========================
+  """
+  Data points waiting to be appended to a signal dataset.
+
+  :param dataset: The :class:`h5py.Dataset` the data points are for.
+  """
+
+  def __init__(self, dataset):
+  #---------------------------
+    self.dataset = dataset
+    self._blocks = [ ]
+    self._count = 0
+    self._since = None
+
+  def __len__(self):
+  #-----------------
+    return self._count
+
+  def age(self):
+  #-------------
+    """How long, in seconds, the oldest data point has been waiting."""
+    return time.monotonic() - self._since if self._since is not None else 0.0
+
+  def add(self, data):
+  #-------------------
+    """Buffer data points, shaped to match the dataset."""
+    if not self._blocks: self._since = time.monotonic()
+    self._blocks.append(data)
+    self._count += len(data)
+
+  def write(self, complete=True):
+  #------------------------------
+    """
+    Write buffered data points to the dataset.
+
+    :param bool complete: If False, only write data points that fill whole
+                          chunks of the dataset, keeping any remainder buffered.
+    :return: A 2-tuple of the index of the first data point written and the data
+             points written, or None if nothing was written.
+    """
+    dset = self.dataset
+    dpoints = dset.shape[0]
+    npoints = self._count
+    if not complete and dset.chunks:
+      npoints = ((dpoints + npoints)//dset.chunks[0])*dset.chunks[0] - dpoints
+    if npoints <= 0: return None
+    data = np.concatenate(self._blocks) if len(self._blocks) > 1 else self._blocks[0]
+    dset.resize(dpoints + npoints, 0)
+    dset[dpoints:] = data[:npoints]
+    self._blocks = [ data[npoints:] ] if npoints < len(data) else [ ]
+    self._count = len(data) - npoints
+    if not self._blocks: self._since = None
+    return (dpoints, data[:npoints])
 
 #===============================================================================
 
@@ -342,25 +711,59 @@ class H5Recording(object):
 
   The :meth:`create` and :meth:`open` methods are intended to be used to
   create instances instead of directly using the constructor.
+
+  Signal datasets that are stored contiguously and uncompressed are read
+  via :class:`numpy.memmap` views of the file unless ``memmap`` is False.
+
+  New datasets are chunked and compressed according to a :class:`StoragePolicy`,
+  which defaults to :data:`DEFAULT_STORAGE`.
+
+  When ``buffersize`` is set, data points appended by :meth:`extend_signal`
+  are held in memory and written, in whole chunks, once a dataset has at least
+  ``buffersize`` points waiting, when points have been waiting for longer than
+  ``flushtime`` seconds, or when :meth:`flush` or :meth:`close` is called.
+  Data points that have waited for ``flushtime`` seconds are written by a
+  timer thread. Buffered data points are not counted in the length of a
+  :class:`H5Signal` until written, see :meth:`buffered`.
   """
-  def __init__(self, uri, h5=None):
-  #--------------------------------
+  def __init__(self, uri, h5=None, memmap=True, storage=None, buffersize=0, flushtime=None):
+  #----------------------------------------------------------------------------------------
     self.uri = uri
     self._h5 = h5
+    self.storage = storage if storage is not None else DEFAULT_STORAGE
+    self.buffersize = buffersize
+    self.flushtime = flushtime
+    self._buffers = { }          # dataset name --> _WriteBuffer
+    self._lock = threading.RLock()
+    self._timer = None
     self._clocks = { }
+    self._memmap = memmap
+    self._memmaps = { }
+    self._signals = { }          # uri --> H5Signal
+    self._dataset_signals = { }  # dataset name --> [ H5Signal ]
+    self._statistics = { }       # dataset name --> data points with saved statistics
 
   def __del__(self):
   #-----------------
     self.close()
 
   @classmethod
-  def open(cls, fname, readonly=False, **kwds):
-  #--------------------------------------------
+  def open(cls, fname, readonly=False, memmap=True, storage=None,
+                                       buffersize=0, flushtime=None, **kwds):
+  #-----------------------------------------------------------------------
     """
     Open an existing HDF5 Recording file.
 
     :param str fname: The name of the file to open.
     :param bool readonly: If True don't allow updates (default = False).
+    :param bool memmap: If True read contiguous, uncompressed, signal datasets
+                        via memory mapping (default = True).
+    :param storage: How new datasets are chunked and compressed. Optional.
+    :type storage: :class:`StoragePolicy`
+    :param int buffersize: The number of data points to buffer for a signal
+                           dataset before appending them (default = 0, no buffering).
+    :param float flushtime: The maximum time, in seconds, that data points
+                            are buffered. Optional.
     """
     try:
       if fname.startswith('file:'):
@@ -383,17 +786,23 @@ class H5Recording(object):
         and h5.get('/recording/signal')
         and h5[h5['uris'].attrs.get(uri)] == h5[h5['recording'].ref]):
       raise TypeError("'{}' is not a BioSignalML file".format(fname))
-    return cls(uri, h5)
+    return cls(uri, h5, memmap, storage, buffersize, flushtime)
 
   @classmethod
-  def create(cls, uri, fname, replace=False, **kwds):
-  #--------------------------------------------------
+  def create(cls, uri, fname, replace=False, storage=None, buffersize=0, flushtime=None, **kwds):
+  #--------------------------------------------------------------------------------------------
     """
     Create a new HDF5 Recording file.
 
     :param uri: The URI of the Recording contained in the file.
     :param str fname: The name of the file to create.
     :param bool replace: If True replace any existing file (default = False).
+    :param storage: How datasets are chunked and compressed. Optional.
+    :type storage: :class:`StoragePolicy`
+    :param int buffersize: The number of data points to buffer for a signal
+                           dataset before appending them (default = 0, no buffering).
+    :param float flushtime: The maximum time, in seconds, that data points
+                            are buffered. Optional.
     """
     if fname.startswith('file://'): fname = fname[7:]
     try:
@@ -406,17 +815,54 @@ class H5Recording(object):
     h5.create_group('recording/signal')
     h5['recording'].attrs['uri'] = str(uri)
     h5['uris'].attrs[uri] = h5['recording'].ref
-    return cls(uri, h5)
+    return cls(uri, h5, storage=storage, buffersize=buffersize, flushtime=flushtime)
 
   def close(self):
   #---------------
     """
     Close a HDF5 Recording file.
     """
+    if self._h5:
+      self.flush()
+    with self._lock:
+      if self._timer is not None:
+        self._timer.cancel()
+        self._timer = None
+    self._memmaps = { }
+    self._signals = { }
+    self._dataset_signals = { }
+    self._clocks = { }
     if self._h5:
       self._h5.close()
       self._h5 = None
 
+  def _get_memmap(self, dset):
+  #---------------------------
+    """
+    Memory map a dataset's data if it is stored contiguously and uncompressed.
+
+    :param dset: A :class:`h5py.Dataset`.
+    :return: A read-only :class:`numpy.memmap`, or None if the dataset
+             can't be mapped.
+    """
+    if not self._memmap or self._h5 is None:
+      return None
+    if dset.name in self._memmaps:
+      return self._memmaps[dset.name]
+    mmap = None
+    if (dset.chunks is None and dset.compression is None
+     and self._h5.driver == 'sec2' and dset.dtype.kind in 'biuf'
+     and dset.size and dset.id.get_storage_size() == dset.nbytes):
+      offset = dset.id.get_offset()
+      if offset is not None:
+        try:
+          mmap = np.memmap(self._h5.filename, dtype=dset.dtype, mode='r',
+                           offset=offset, shape=dset.shape)
+        except (IOError, ValueError):
+          pass
+    self._memmaps[dset.name] = mmap
+    return mmap
+
   @staticmethod
   def _iterable(s):
     """Check if we have a non-string iterable."""
@@ -426,7 +872,7 @@ class H5Recording(object):
   def create_signal(self, uri, units, shape=None, data=None,
                           dtype=None, gain=None, offset=None,
                           rate=None, period=None, timeunits=None, clock=None,
-                          compression=COMPRESSION, **kwds):
+                          compression=None, storage=None, **kwds):
   #---------------------------------------------------------------------------
     """
     Create a dataset for a signal or group of signals in a HDF5 recording.
@@ -450,6 +896,10 @@ class H5Recording(object):
     :param timeunits: The units 'time' is measured in. Optional, default is seconds.
     :param clock: The URI of a clock dataset containing sample times. Optional.
                   Could this not also be a Clock (or HDF5Clock)????
+    :param str compression: Overrides the compression of the storage policy. Optional.
+    :param storage: How the dataset is chunked and compressed. Optional, defaults
+                    to the recording's :attr:`storage` policy.
+    :type storage: :class:`StoragePolicy`
     :return: The `H5Signal` created.
 
     Only one of ``rate``, ``period``, or ``clock`` can be given.
@@ -482,12 +932,12 @@ class H5Recording(object):
     if nsignals > 1:         # compound dataset
       if shape: raise TypeError("A compound dataset can only have scalar type")
       maxshape = (None, nsignals)
-      npoints = data.size/nsignals if data is not None else 0
+      npoints = data.size//nsignals if data is not None else 0
       shape = (npoints, nsignals)
     elif shape is not None:  # simple dataset, shape of data point given
       maxshape = (None,) + shape
       elsize = reduce((lambda x, y: x * y), shape) if (len(shape) and shape[0]) else 1
-      npoints = data.size/elsize if data is not None else 0
+      npoints = data.size//elsize if data is not None else 0
       shape = (npoints,) + shape
     elif data is not None:   # simple dataset, data determines shape
       npoints = len(data)
@@ -513,11 +963,15 @@ class H5Recording(object):
     else:
       raise ValueError("No timing information given")
 
+    if storage is None: storage = self.storage
+    if rate: samplerate = rate
+    elif period: samplerate = 1.0/float(period)
+    else: samplerate = None
     signo = len(self._h5['/recording/signal'])
     try:
       dset = self._h5['/recording/signal'].create_dataset(str(signo),
         data=data, shape=shape, maxshape=maxshape, dtype=dtype,
-        chunks=True, compression=compression)
+        **storage.dataset_options(maxshape[1:], samplerate, compression))
     except Exception as msg:
       raise RuntimeError("Cannot create signal dataset ({})".format(msg))
 
@@ -535,12 +989,18 @@ class H5Recording(object):
     elif period:             dset.attrs['period'] = float(period)
     elif clock is not None:  dset.attrs['clock'] = clocktimes.dataset.ref
     if timeunits: dset.attrs['timeunits'] = timeunits
-    return H5Signal(dset, None)
+    if npoints: self._update_statistics(dset, 0, data.reshape(dset.shape))
+    if nsignals == 1:
+      return self.get_signal(uri)
+    else:
+      sig = H5Signal(dset, None, clock=clocktimes if clock is not None else None)
+      self._dataset_signals.setdefault(dset.name, [ ]).append(sig)
+      return sig
 
   def create_clock(self, uri, units=None, shape=None, times=None, dtype=None,
                                                                   rate=None, period=None,
-                                                                  compression=COMPRESSION):
-  #----------------------------------------------------------------------------------------
+                                                                  compression=None, storage=None):
+  #-----------------------------------------------------------------------------------------------
     """
     Create a clock dataset in a HDF5 recording.
 
@@ -554,6 +1014,10 @@ class H5Recording(object):
     :type dtype: :class:`numpy.dtype`
     :param float rate: The sample rate of time points. Optional.
     :param float period: The interval, in time units, between time points. Optional.
+    :param str compression: Overrides the compression of the storage policy. Optional.
+    :param storage: How the dataset is chunked and compressed. Optional, defaults
+                    to the recording's :attr:`storage` policy.
+    :type storage: :class:`StoragePolicy`
     :return: The `H5Clock` created.
     """
     ## Not if readonly...
@@ -569,7 +1033,7 @@ class H5Recording(object):
     if shape is not None:
       maxshape = (None,) + shape
       elsize = reduce((lambda x, y: x * y), shape) if (len(shape) and shape[0]) else 1
-      shape = (times.size/elsize if times is not None else 0, ) + shape
+      shape = (times.size//elsize if times is not None else 0, ) + shape
     elif times is not None:
       maxshape = list(times.shape)
       maxshape[0] = None
@@ -578,12 +1042,13 @@ class H5Recording(object):
       shape = (0,)
       maxshape = (None,)
 
+    if storage is None: storage = self.storage
     self._h5['/recording'].require_group('clock')
     clockno = len(self._h5['/recording/clock'])
     try:
       dset = self._h5['/recording/clock'].create_dataset(str(clockno),
         data=times, shape=shape, maxshape=maxshape, dtype=dtype,
-        chunks=True, compression=compression)
+        **storage.dataset_options(maxshape[1:], compression=compression))
     except Exception as msg:
       raise RuntimeError("Cannot create clock dataset ({})".format(msg))
 
@@ -630,22 +1095,118 @@ class H5Recording(object):
     if not isinstance(data, np.ndarray): data = np.array(data)
 
     if nsignals > 1:         # compound dataset
-      npoints = data.size/nsignals
+      npoints = data.size//nsignals
     else:                    # simple dataset
       if len(dset.shape) == 1: npoints = data.size
-      else:                    npoints = data.size/reduce((lambda x, y: x * y), dset.shape[1:])
+      else:                    npoints = data.size//reduce((lambda x, y: x * y), dset.shape[1:])
+    with self._lock:
+      self._extend_dataset(uri, sig, dset, nsignals, npoints, data)
+
+  def _extend_dataset(self, uri, sig, dset, nsignals, npoints, data):
+  #------------------------------------------------------------------
     dpoints = dset.shape[0]
-    clockref = dset.attrs.get('clock')
-    if clockref and self._h5[clockref].len() < (npoints+dpoints):
+    buffer = self._buffers.get(dset.name)
+    if buffer is not None: dpoints += len(buffer)
+    if sig.clock is not None and len(sig.clock) < (npoints+dpoints):
       raise ValueError("Clock doesn't have sufficient times")
     try:
-      dset.resize(dpoints + npoints, 0)
       if nsignals > 1:         # compound dataset
-        dset[dpoints:] = data.reshape((npoints, dset.shape[1]))
+        data = data.reshape((npoints, dset.shape[1]))
       else:                    # simple dataset
-        dset[dpoints:] = data.reshape((npoints,) + dset.shape[1:])
+        data = data.reshape((npoints,) + dset.shape[1:])
+      if self.buffersize:
+        if buffer is None:
+          buffer = self._buffers[dset.name] = _WriteBuffer(dset)
+        buffer.add(data)
+        if self.flushtime is not None and buffer.age() >= self.flushtime:
+          written = buffer.write()
+        elif len(buffer) >= self.buffersize:
+          written = buffer.write(complete=False)
+        else:
+          written = None
+        if len(buffer): self._start_timer()
+      else:
+        dset.resize(dpoints + npoints, 0)
+        dset[dpoints:] = data
+        written = (dpoints, data)
+      if written is not None: self._update_statistics(dset, *written)
     except Exception as msg:
       raise RuntimeError("Cannot extend signal dataset '{}' ({})".format(uri, msg))
+    finally:
+      for s in self._dataset_signals.get(dset.name, [ ]): s._length = dset.shape[0]
+
+  def flush(self, uri=None, sync=False):
+  #-------------------------------------
+    """
+    Write any buffered data points to the HDF5 recording.
+
+    :param uri: The URI of the signal whose data points are to be written. Optional,
+                the default is to write all buffered data.
+    :param bool sync: If True then also have HDF5 flush the file's data
+                      to the operating system (default = False).
+    """
+    with self._lock:
+      if self._h5 is None:
+        return
+      if uri is None:
+        buffers = list(self._buffers.values())
+      else:
+        sig = self.get_signal(uri)
+        if sig is None: raise KeyError("Unknown signal '{}'".format(uri))
+        buffers = [ self._buffers[sig.dataset.name] ] if sig.dataset.name in self._buffers else [ ]
+      self._write_buffers(buffers)
+      if sync:
+        self._h5.flush()
+
+  def buffered(self, uri):
+  #-----------------------
+    """
+    Get the number of a signal's data points that are buffered and not yet written.
+
+    :param uri: The URI of the signal.
+    """
+    with self._lock:
+      sig = self.get_signal(uri)
+      buffer = self._buffers.get(sig.dataset.name) if sig is not None else None
+      return len(buffer) if buffer is not None else 0
+
+  def _start_timer(self):
+  #----------------------
+    """
+    Have a timer thread write data points once they have waited for ``flushtime``.
+    """
+    if self.flushtime is None or self._timer is not None:
+      return
+    waited = max([ b.age() for b in self._buffers.values() if len(b) ] + [ 0.0 ])
+    self._timer = threading.Timer(max(0.0, self.flushtime - waited), self._flush_expired)
+    self._timer.daemon = True
+    self._timer.start()
+
+  def _flush_expired(self):
+  #------------------------
+    with self._lock:
+      self._timer = None
+      if self._h5 is None:
+        return
+      try:
+        self._write_buffers([ b for b in self._buffers.values()
+                                if len(b) and b.age() >= self.flushtime ])
+      except RuntimeError as msg:
+        logging.error("Cannot flush buffered data points (%s)", msg)
+      if any(len(b) for b in self._buffers.values()):
+        self._start_timer()
+
+  def _write_buffers(self, buffers):
+  #---------------------------------
+    for buffer in buffers:
+      dset = buffer.dataset
+      try:
+        written = buffer.write()
+        if written is not None: self._update_statistics(dset, *written)
+      except Exception as msg:
+        raise RuntimeError("Cannot extend signal dataset '{}' ({})".format(dset.name, msg))
+      finally:
+        for s in self._dataset_signals.get(dset.name, [ ]): s._length = dset.shape[0]
 
   def extend_clock(self, uri, times):
   #----------------------------------
@@ -666,13 +1227,15 @@ class H5Recording(object):
     dset = clock.dataset
     if not isinstance(times, np.ndarray): times = np.array(times)
     if len(dset.shape) == 1: npoints = times.size
-    else:                    npoints = times.size/reduce((lambda x, y: x * y), dset.shape[1:])
+    else:                    npoints = times.size//reduce((lambda x, y: x * y), dset.shape[1:])
     dpoints = dset.shape[0]
     try:
       dset.resize(dpoints + npoints, 0)
       dset[dpoints:] = times.reshape((npoints,) + dset.shape[1:])
     except Exception as msg:
       raise RuntimeError("Cannot extend clock dataset '{}' ({})".format(uri, msg))
+    finally:
+      clock._length = dset.shape[0]
 
   def get_dataset_by_name(self, name):
   #-----------------------------------
@@ -729,17 +1292,24 @@ class H5Recording(object):
     :return: A :class:`H5Signal` containing the signal, or None if
              the URI is unknown or the dataset is not that for a signal.
     """
+    sig = self._signals.get(str(uri))
+    if sig is not None: return sig
     dset = self.get_dataset(uri)
     if dset and dset.name.startswith('/recording/signal/'):
       uris = dset.attrs['uri']
       if isinstance(uris, np.ndarray):
         try:
-          return H5Signal(dset, list(uris).index(uri))
+          index = list(uris).index(uri)
         except ValueError:
-          pass
+          raise KeyError("Cannot locate correct dataset for '{}'".format(uri))
       else:
-        return H5Signal(dset, None)
-      raise KeyError("Cannot locate correct dataset for '{}'".format(uri))
+        index = None
+      clockref = dset.attrs.get('clock')
+      clock = self.get_clock(self._h5[clockref].attrs['uri']) if clockref else None
+      sig = H5Signal(dset, index, self._get_memmap(dset), clock)
+      self._signals[str(uri)] = sig
+      self._dataset_signals.setdefault(dset.name, [ ]).append(sig)
+      return sig
 
   def signals(self):
   #-----------------
@@ -782,16 +1352,218 @@ class H5Recording(object):
         else: uris.append(uri)
     return [ self.get_clock(u) for u in uris ]
 
-  def store_metadata(self, metadata, mimetype):
-  #--------------------------------------------
+  @staticmethod
+  def _pyramid_name(signal):
+  #-------------------------
+    name = signal.name.rsplit('/', 1)[-1]
+    return name if signal.index is None else '{}.{}'.format(name, signal.index)
+
+  def store_pyramid(self, uri, length, levels, factor):
+  #----------------------------------------------------
+    """
+    Store a min/max/mean pyramid summarising a signal's data.
+
+    :param uri: The URI of the signal.
+    :param int length: The number of data points summarised.
+    :param list levels: A 2D array for each level of the pyramid, with a
+                        (min, max, mean) row for every block in the level.
+    :param int factor: The number of blocks of a level in a block of the next.
+
+    Nothing is stored if the file has been opened readonly.
+    """
+    if self._h5 is None or self._h5.mode == 'r':
+      return
+    sig = self.get_signal(uri)
+    if sig is None: raise KeyError("Unknown signal '{}'".format(uri))
+    pyramids = self._h5['/recording'].require_group('pyramid')
+    name = self._pyramid_name(sig)
+    if pyramids.get(name) is not None: del pyramids[name]
+    try:
+      grp = pyramids.create_group(name)
+      grp.attrs['uri'] = str(uri)
+      grp.attrs['length'] = length
+      grp.attrs['factor'] = factor
+      for n, level in enumerate(levels):
+        grp.create_dataset(str(n), data=level, compression=COMPRESSION)
+    except Exception as msg:
+      raise RuntimeError("Cannot store pyramid for signal '{}' ({})".format(uri, msg))
+
+  def get_pyramid(self, uri):
+  #--------------------------
+    """
+    Get the min/max/mean pyramid stored for a signal.
+
+    :param uri: The URI of the signal.
+    :return: A 3-tuple of the number of data points summarised, a list of
+             the pyramid's levels, and its factor, or None if the signal
+             has no stored pyramid.
+    """
+    sig = self.get_signal(uri)
+    if sig is None or self._h5.get('/recording/pyramid') is None:
+      return None
+    grp = self._h5['/recording/pyramid'].get(self._pyramid_name(sig))
+    if grp is not None:
+      levels = [ grp[str(n)][()] for n in range(len(grp)) ]
+      return (int(grp.attrs['length']), levels, int(grp.attrs['factor']))
+
+  @staticmethod
+  def _statistics_block(dset):
+  #---------------------------
+    return dset.chunks[0] if dset.chunks else STATISTICS_BLOCK
+
+  def _create_statistics(self, dset, stats, length):
+  #-------------------------------------------------
+    columns = stats.shape[1]
+    stats = self._h5['/recording'].require_group('statistics').create_dataset(
+      dset.name.rsplit('/', 1)[-1], data=stats, maxshape=(None, columns, len(STATISTICS)),
+      chunks=(256, columns, len(STATISTICS)))
+    stats.attrs['block'] = self._statistics_block(dset)
+    stats.attrs['length'] = length
+    return stats
+
+  def _update_statistics(self, dset, start, rows):
+  #-----------------------------------------------
+    """
+    Update the statistics of a signal dataset for data points written to it.
+
+    Statistics are only saved once a chunk has been completed, with data points
+    in a partial chunk being read back from the dataset when the chunk is
+    completed. Statistics that are missing or out-of-date are left for
+    :meth:`get_statistics` to recreate, and datasets that don't have numeric
+    data don't have statistics.
+    """
+    if self._h5.mode == 'r' or not np.issubdtype(dset.dtype, np.number):
+      return
+    if dset.name not in self._statistics:
+      group = self._h5['/recording'].get('statistics')
+      name = dset.name.rsplit('/', 1)[-1]
+      stats = group.get(name) if group is not None else None
+      if stats is not None: self._statistics[dset.name] = int(stats.attrs['length'])
+      else:                 self._statistics[dset.name] = 0 if start == 0 else None
+    length = self._statistics[dset.name]
+    block = self._statistics_block(dset)
+    if length is None or not (start - block < length <= start):
+      self._statistics[dset.name] = None
+      return
+    end = start + len(rows)
+    complete = (end//block)*block
+    if complete <= length:
+      return
+    parts = [ dset[length:min(start, complete)] ]
+    if complete > start: parts.append(np.asarray(rows)[:complete - start])
+    update = _chunk_statistics(np.concatenate(parts), length, block,
+                               isinstance(dset.attrs['uri'], np.ndarray))
+    group = self._h5['/recording'].require_group('statistics')
+    stats = group.get(dset.name.rsplit('/', 1)[-1])
+    if stats is None:
+      stats = self._create_statistics(dset, update, complete)
+    else:
+      first = length//block
+      if first < stats.shape[0]:
+        update[0] = _merge_statistics((stats[first], update[0]))
+      stats.resize(first + len(update), 0)
+      stats[first:] = update
+      stats.attrs['length'] = complete
+    self._statistics[dset.name] = complete
+
+  def get_statistics(self, uri):
+  #-----------------------------
+    """
+    Get the statistics of each chunk of a signal's data.
+
+    :param uri: The URI of the signal.
+    :return: A 2-tuple of the number of data points in a chunk and an array with
+             a row of :data:`STATISTICS` for each chunk, of data as stored.
+
+    Statistics of a final, partial, chunk are found by reading its data points.
+    Statistics are otherwise recreated, by reading all of the signal's data, if
+    they are missing or out-of-date, and saved unless the file has been opened
+    readonly, when they are instead kept in memory until the dataset's length
+    changes or its signals are invalidated.
+    """
+    sig = self.get_signal(uri)
+    if sig is None: raise KeyError("Unknown signal '{}'".format(uri))
+    dset = sig.dataset
+    if not np.issubdtype(dset.dtype, np.number):
+      raise TypeError("Signal '{}' doesn't have numeric data".format(uri))
+    column = 0 if sig.index is None else sig.index
+    name = dset.name.rsplit('/', 1)[-1]
+    group = self._h5['/recording'].get('statistics')
+    stats = group.get(name) if group is not None else None
+    block = self._statistics_block(dset)
+    if sig._statistics is not None and sig._statistics[:2] == (block, dset.shape[0]):
+      return (block, sig._statistics[2])
+    compound = isinstance(dset.attrs['uri'], np.ndarray)
+    if stats is not None and int(stats.attrs['block']) == block:
+      length = int(stats.attrs['length'])
+      if length == dset.shape[0]:
+        return (block, stats[:, column])
+      elif dset.shape[0] - block < length < dset.shape[0]:
+        first = length//block
+        update = _chunk_statistics(dset[length:], length, block, compound)
+        if first < stats.shape[0]:
+          update[0] = _merge_statistics((stats[first], update[0]))
+        return (block, np.concatenate((stats[:first], update))[:, column])
+    step = max(1, STATISTICS_READ//block)*block
+    parts = [ _chunk_statistics(dset[pos: pos+step], pos, block, compound)
+                for pos in range(0, dset.shape[0], step) ]
+    columns = dset.shape[1] if compound else 1
+    update = np.concatenate(parts) if parts else np.zeros((0, columns, len(STATISTICS)))
+    if self._h5.mode != 'r':
+      if stats is not None: del group[name]
+      self._create_statistics(dset, update, dset.shape[0])
+      self._statistics[dset.name] = dset.shape[0]
+    else:
+      for s in set(self._dataset_signals.get(dset.name, [ ]) + [ sig ]):
+        s._statistics = (block, dset.shape[0], update[:, 0 if s.index is None else s.index])
+    return (block, update[:, column])
+
+  def statistics(self, uri, start, end):
+  #-------------------------------------
+    """
+    Get statistics of a range of a signal's data.
+
+    :param uri: The URI of the signal.
+    :param int start: The index of the first data point in the range.
+    :param int end: The index of the data point immediately after the range.
+    :return: An array of :data:`STATISTICS`, of data as stored.
+
+    Chunks wholly within the range are summarised from their statistics, with
+    only partial chunks at the ends of the range being read.
+    """
+    (block, chunkstats) = self.get_statistics(uri)
+    sig = self.get_signal(uri)
+    first = -(-start//block)
+    last = end//block
+    if first < last: ends = [ (start, first*block), (last*block, end) ]
+    else:            ends = [ (start, end) ]
+    parts = [ chunkstats[first:last] ]
+    for (a, b) in ends:
+      if a < b: parts.append(_chunk_statistics(sig.raw(slice(a, b)), a, b - a)[:, 0])
+    return _merge_statistics(np.concatenate(parts))
+
+  @staticmethod
+  def _digest(metadata):
+  #---------------------
+    if isinstance(metadata, str): metadata = metadata.encode('utf-8')
+    return hashlib.sha1(metadata).hexdigest()
+
+  def store_metadata(self, metadata, mimetype, terms=None, triples=None):
+  #----------------------------------------------------------------------
     """
     Store metadata in the HDF5 recording.
 
     :param metadata: RDF serialised as a string.
     :type metadata: str
     :param mimetype: A mimetype string for the RDF format used.
-
-    Metadata is encoded as UTF-8 when stored.
+    :param terms: The distinct RDF terms of the metadata's statements, each
+                  encoded as a string. Optional.
+    :param triples: A (subject, predicate, object) row of indices into ``terms``
+                    for every statement. Optional.
+
+    Metadata is encoded as UTF-8 when stored. If ``terms`` and ``triples`` are
+    given they are stored as a cache of the metadata, otherwise any existing
+    cache is removed.
     """
 
     ## Not if readonly...
@@ -800,9 +1572,17 @@ class H5Recording(object):
       return
 
     if self._h5.get('/metadata'): del self._h5['/metadata']
+    if self._h5.get('/metadata_cache'): del self._h5['/metadata_cache']
     md = self._h5.create_dataset('/metadata',
                                  data=metadata if isinstance(metadata, bytes) else metadata)
     md.attrs['mimetype'] = mimetype
+    if terms is not None and triples is not None:
+      cache = self._h5.create_group('/metadata_cache')
+      cache.create_dataset('terms', data=np.array(terms, dtype=object),
+                                    shape=(len(terms),), dtype=DTYPE_STRING)
+      triples = np.asarray(triples, dtype='i4' if len(terms) < 2**31 else 'i8').reshape((-1, 3))
+      cache.create_dataset('triples', data=triples)
+      cache.attrs['digest'] = self._digest(md[()])
     ## Error if new_metadata???
     ## Store as new_metadata then delete metadata and rename
 
@@ -823,6 +1603,22 @@ class H5Recording(object):
     ## Error if no metadata???
     ## Error if new_metadata???
 
+  def get_metadata_cache(self):
+  #----------------------------
+    """
+    Get the binary encoding of metadata in the HDF5 recording.
+
+    :return: A 2-tuple of an array of encoded terms and an array of (subject,
+             predicate, object) index triples, or None if the recording has
+             no cache or the cache is not that of the current metadata.
+    """
+    if self._h5 is None or not self._h5.get('/metadata_cache') or not self._h5.get('/metadata'):
+      return None
+    cache = self._h5['/metadata_cache']
+    if cache.attrs.get('digest') != self._digest(self._h5['/metadata'][()]):
+      return None
+    return (cache['terms'].asstr()[()], cache['triples'][()])
+
 #===============================================================================
 
 if __name__ == '__main__':
@@ -0,0 +1,340 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+"""
+Write a BioSignalML HDF5 file from a dedicated process.
+
+An :class:`H5Writer` starts a process that owns a HDF5 recording file and
+performs all updates to it. Data points are handed to the process through
+a ring of fixed size slots in shared memory, so that any number of threads,
+or other processes, can append data without contending for the GIL of the
+writing process or for the HDF5 library's lock.
+"""
+
+import os
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ...utils import attach_shared_memory
+
+from .h5recording import H5Recording
+
+__all__ = [ 'H5Writer' ]
+
+#===============================================================================
+
+SLOTS    = 16          #: The default number of shared memory slots
+SLOTSIZE = 1 << 20     #: The default size, in bytes, of a slot
+WAITTIME = 1.0         #: How often, in seconds, to check the writer process while waiting
+
+#===============================================================================
+
+def _writer(uri, fname, create, options, shmname, slotsize, commands, free, replies):
+#===================================================================================
+  """
+  The main loop of a writer process.
+
+  Commands are tuples, with the first element naming a method of
+  :class:`~.h5recording.H5Recording`. Data for ``extend_signal`` and
+  ``extend_clock`` is in a shared memory slot, which is made free again once
+  its data has been written. Errors are reported back to the process that
+  started the writer, as is the completion of other commands.
+  """
+  shm = attach_shared_memory(shmname)
+  try:
+    if create: h5 = H5Recording.create(uri, fname, **options)
+    else:      h5 = H5Recording.open(fname, **options)
+  except Exception as msg:
+    replies.put(('error', str(msg)))
+    replies.put(('done', None))
+    shm.close()
+    return
+  replies.put(('done', h5.uri))
+  while True:
+    command = commands.get()
+    op = command[0]
+    if op == 'close':
+      break
+    try:
+      if op in ('extend_signal', 'extend_clock'):
+        (uri, slot, dtype, shape) = command[1:]
+        data = np.ndarray(shape, dtype, buffer=shm.buf, offset=slot*slotsize)
+        try:
+          if op == 'extend_signal' and h5.buffersize: data = data.copy()
+          getattr(h5, op)(uri, data)
+        finally:
+          del data
+          free.put(slot)
+      else:
+        getattr(h5, op)(*command[1], **command[2])
+    except Exception as msg:
+      replies.put(('error', str(msg)))
+    if op not in ('extend_signal', 'extend_clock'):
+      replies.put(('done', None))
+  try:
+    h5.close()
+  except Exception as msg:
+    replies.put(('error', str(msg)))
+  shm.close()
+  replies.put(('done', None))
+
+#===============================================================================
+
+class H5Writer(object):
+#======================
+  """
+  Update a HDF5 recording file from a separate process.
+
+  An :class:`H5Writer` has the same methods for creating and extending
+  signals and clocks, and for storing metadata, as :class:`~.h5recording.H5Recording`.
+  Extending a signal or clock returns once the data points have been passed to
+  the writing process, with any errors being raised by the next call that waits
+  for the writing process; other methods wait for the writing process to complete.
+
+  Data points are copied into a free shared memory slot, waiting for one if
+  necessary, and are written to the file directly from there. An array of data
+  points that is larger than a slot is sent in several parts.
+
+  An :class:`H5Writer` can be passed as an argument to a
+  :class:`multiprocessing.Process` to allow the new process to append data.
+  Only the process that created the writer can create signals and clocks, store
+  metadata, and :meth:`flush` or :meth:`close` the writer.
+
+  :param uri: The URI of the recording, if it is being created.
+  :param str fname: The name of the HDF5 file.
+  :param bool create: Create a new file, rather than open an existing one
+    (default = False).
+  :param int slots: The number of shared memory slots.
+  :param int slotsize: The size, in bytes, of a shared memory slot.
+  :param context: The :mod:`multiprocessing` context with which to start the
+    writing process; processes it is passed to must be started the same way.
+    Optional, defaults to the current start method.
+  :param options: Arguments for :meth:`~.h5recording.H5Recording.create`
+    or :meth:`~.h5recording.H5Recording.open`, for instance ``storage``,
+    ``buffersize``, or ``replace``.
+  """
+  def __init__(self, uri, fname, create=False, slots=SLOTS, slotsize=SLOTSIZE,
+                                               context=None, **options):
+  #---------------------------------------------------------------------------
+    if context is None: context = multiprocessing.get_context()
+    self.slotsize = slotsize
+    self._pid = os.getpid()
+    self._shm = shared_memory.SharedMemory(create=True, size=slots*slotsize)
+    self._commands = context.Queue()
+    self._free = context.Queue()
+    self._replies = context.Queue()
+    for slot in range(slots): self._free.put(slot)
+    self._process = context.Process(target=_writer,
+      args=(uri, fname, create, options, self._shm.name, slotsize,
+            self._commands, self._free, self._replies),
+      daemon=True)
+    self._process.start()
+    self._writerpid = self._process.pid
+    try:
+      self.uri = self._wait()
+    except Exception:
+      self._process.join()
+      self._release()
+      raise
+
+  def __getstate__(self):
+  #----------------------
+    state = self.__dict__.copy()
+    state['_shm'] = self._shm.name
+    state['_process'] = None
+    return state
+
+  def __setstate__(self, state):
+  #-----------------------------
+    self.__dict__.update(state)
+    self._shm = attach_shared_memory(state['_shm'])
+
+  def _wait(self):
+  #---------------
+    """
+    Wait for the writing process to complete a command.
+
+    :return: The value returned with the command's completion.
+    """
+    errors = [ ]
+    while True:
+      try:
+        (status, value) = self._replies.get(timeout=WAITTIME)
+      except queue.Empty:
+        if self._alive(): continue
+        errors.append("Writer process has exited")
+        break
+      if status == 'done': break
+      errors.append(value)
+    if errors:
+      raise RuntimeError("Cannot write HDF5 recording ({})".format('; '.join(errors)))
+    return value
+
+  def _send(self, op, uri, data):
+  #------------------------------
+    """
+    Pass data points to the writing process, via shared memory.
+    """
+    data = np.ascontiguousarray(data)
+    if len(data) == 0:
+      return
+    pointsize = data[:1].nbytes
+    if pointsize > self.slotsize:
+      raise ValueError("A data point is larger than a writer slot")
+    rows = self.slotsize//pointsize
+    for pos in range(0, len(data), rows):
+      part = data[pos: pos+rows]
+      slot = self._free_slot()
+      np.ndarray(part.shape, part.dtype, buffer=self._shm.buf, offset=slot*self.slotsize)[...] = part
+      self._commands.put((op, uri, slot, part.dtype.str, part.shape))
+
+  def _free_slot(self):
+  #--------------------
+    """
+    Wait for a shared memory slot to become free.
+    """
+    while True:
+      try:
+        return self._free.get(timeout=WAITTIME)
+      except queue.Empty:
+        if not self._alive():
+          raise RuntimeError("Cannot write HDF5 recording (Writer process has exited)")
+
+  def _alive(self):
+  #----------------
+    """
+    Check that the writing process is still running.
+    """
+    if self._owner():
+      return self._process.is_alive()
+    try:
+      os.kill(self._writerpid, 0)
+      return True
+    except OSError:
+      return False
+
+  def _owner(self):
+  #----------------
+    return self._process is not None and os.getpid() == self._pid
+
+  def _call(self, op, *args, **kwds):
+  #----------------------------------
+    """
+    Have the writing process call a method of its recording and wait for completion.
+    """
+    if not self._owner():
+      raise RuntimeError("Only the process that created a writer can call '{}'".format(op))
+    self._commands.put((op, args, kwds))
+    self._wait()
+
+  def _release(self):
+  #------------------
+    self._shm.close()
+    if self._owner():
+      self._shm.unlink()
+    self._shm = None
+
+  def create_signal(self, uri, units, **kwds):
+  #-------------------------------------------
+    """
+    Create a dataset for a signal or group of signals.
+
+    See :meth:`~.h5recording.H5Recording.create_signal`.
+
+    :return: None, as the signal's dataset is in another process.
+    """
+    self._call('create_signal', uri, units, **kwds)
+
+  def create_clock(self, uri, units=None, **kwds):
+  #-----------------------------------------------
+    """
+    Create a clock dataset.
+
+    See :meth:`~.h5recording.H5Recording.create_clock`.
+
+    :return: None, as the clock's dataset is in another process.
+    """
+    self._call('create_clock', uri, units, **kwds)
+
+  def extend_signal(self, uri, data):
+  #----------------------------------
+    """
+    Extend a signal dataset.
+
+    :param uri: The URI of the signal for a simple dataset, or of any
+                signal in a compound dataset.
+    :param data: Data points for the signal(s), with the first axis indexing
+                 data points.
+    :type data: :class:`numpy.ndarray` or an iterable.
+    """
+    self._send('extend_signal', uri, data)
+
+  def extend_clock(self, uri, times):
+  #----------------------------------
+    """
+    Extend a clock dataset.
+
+    :param uri: The URI of the clock dataset.
+    :param times: Time points with which to extend the clock.
+    :type times: :class:`numpy.ndarray` or an iterable.
+    """
+    self._send('extend_clock', uri, times)
+
+  def store_metadata(self, metadata, mimetype, terms=None, triples=None):
+  #----------------------------------------------------------------------
+    """
+    Store metadata in the HDF5 recording.
+
+    See :meth:`~.h5recording.H5Recording.store_metadata`.
+    """
+    self._call('store_metadata', metadata, mimetype, terms, triples)
+
+  def flush(self, uri=None, sync=False):
+  #-------------------------------------
+    """
+    Wait until all data sent to the writing process has been written.
+
+    :param uri: Only write data buffered for this signal. Optional.
+    :param bool sync: If True then also have HDF5 flush the file's data
+                      to the operating system (default = False).
+    """
+    self._call('flush', uri, sync)
+
+  def close(self):
+  #---------------
+    """
+    Write all outstanding data and close the HDF5 recording.
+    """
+    if self._shm is None:
+      return
+    if self._owner():
+      self._commands.put(('close',))
+      try:
+        self._wait()
+      finally:
+        self._process.join()
+        self._release()
+    else:
+      self._release()
+
+#===============================================================================
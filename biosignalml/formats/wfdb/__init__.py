@@ -21,38 +21,38 @@
 """
 Access PhyiosBank recordings.
 
-.. warning::
+.. note::
 
-   The ``wfdb`` library is not thread safe nor does it support concurrent access to multiple
-   recordings from within a thread. The library only allows concurrent access to the same record
-   if the recording is repositioned before each read, using a lock to ensure position/read
-   operations are atomic.
+   Each recording is opened by a worker process of a :class:`~.pool.WFDBReaderPool`,
+   which decodes blocks of frames with the ``wfdb`` package, so different recordings
+   can be read concurrently.
 """
 
 
 import os
-import wfdb
+import glob
 import math
-import threading
 import numpy as np
-import dateutil.parser
 import logging
+import urllib.parse, urllib.request
 
 
-from biosignalml import BSML
+from biosignalml import BSML, Event
 from biosignalml.data import DataSegment, UniformTimeSeries
 from biosignalml.utils import file_uri
 
 from biosignalml.formats import BSMLRecording, BSMLSignal, MIMETYPES
 
+from .pool import reader_pool, FrameCache
+from .annotation import read_annotations
+
 __all__ = [ 'WFDBSignal', 'WFDBRecording', 'PHYSIOBANK' ]
 
 
 PHYSIOBANK = 'http://physionet.org/physiobank/database/'
 
-_WFDBLock      = threading.Lock()
-_CurrentRecord = None
-_RecordCount   = 0
+EVENTTYPE = 'http://physionet.org/physiobank/annotations.shtml#'
+'''The prefix of the URI of an event's type, which is followed by its WFDB type code.'''
 
 
 class WFDBSignal(BSMLSignal):
@@ -60,7 +60,8 @@ class WFDBSignal(BSMLSignal):
 
   def __init__(self, signum, rec, units, metadata=None):  ## Hmm, URI should be a parameter...
   #-----------------------------------------------------
-    BSMLSignal.__init__(self, str(rec.uri) + '/signal/%d' % signum, units, metadata = metadata)
+    BSMLSignal.__init__(self, str(rec.uri) + '/signal/%d' % signum, units,
+                        **(metadata if metadata is not None else { }))
 ##      metadata = { 'label': edf._edffile.label[signum],
 ##                   'units': edf._edffile.units[signum],
 ##                   'transducer': edf._edffile.transducer[signum],
@@ -81,7 +82,7 @@ class WFDBSignal(BSMLSignal):
     self._signum = signum
     info = rec._siginfo[signum]
     self._length = info.spf*info.nsamp
-    self._gain = info.gain if info.gain != 0 else wfdb.WFDB_DEFGAIN
+    self._gain = info.gain
     self._baseline = info.baseline
     # physical = (ADC - baseline)/gain
     self._samplesperframe = info.spf
@@ -140,33 +141,15 @@ class WFDBSignal(BSMLSignal):
       startpos = max(0, int(math.floor(seg[0])))
       length = min(len(self), int(math.ceil(seg[1])) - startpos)
 
-    # Setup offsets into frame for each signal
-    siginfo = self._record._siginfo
-    offsets = [ (0, siginfo[0].spf) ]    ## This is record wide data...
-    samplesperframe = siginfo[0].spf
-    for s in range(1, self._record._nsignals):
-      offsets.append((samplesperframe, siginfo[s].spf))
-      samplesperframe += siginfo[s].spf
-
-    v = wfdb.WFDB_SampleArray(samplesperframe)
-    s = self._signum
+    # The signal's samples are at an offset in each frame
+    spf = self._samplesperframe
+    offset = self._record._offsets[self._signum][0]
     while length > 0:
       if maxpoints > length: maxpoints = length
-      d = []
-      i = maxpoints
-      rpos = startpos
-      while i > 0:
-        global _WFDBLock
-        with _WFDBLock:
-          wfdb.tnextvec(s, rpos)
-          r = wfdb.getframe(v.cast())
-        if r <= 0: i = 0
-        else:
-          for n in range(offsets[s][0], offsets[s][0]+offsets[s][1]):
-            d.append(v[n])
-            i -= 1
-            rpos += 1
-      data = (np.array(d)-self._baseline)/self._gain
+      first = startpos//spf
+      frames = self._record._read_frames(first, (startpos + maxpoints - 1)//spf + 1 - first)
+      samples = frames[:, offset: offset+spf].reshape(-1)[startpos - first*spf:][:maxpoints]
+      data = (samples - self._baseline)/float(self._gain)
       if len(data) <= 0: break
       yield DataSegment(float(startpos)/self.rate, UniformTimeSeries(data, self.rate))
       startpos += len(data)
@@ -179,30 +162,38 @@ class WFDBRecording(BSMLRecording):
   MIMETYPE = MIMETYPES.WFDB
   EXTENSIONS = [ 'hea' ]
   SignalClass = WFDBSignal
+  ANNOTATOR = 'atr'       #: The annotator whose events are used by default
+  NONANNOTATORS = [ 'hea', 'dat', 'mat', 'edf', 'wav', 'part' ]  #: Extensions of files that aren't annotations
 
   def __init__(self, uri, fname=None, **kwds):
   #-------------------------------------------
-    BSMLRecording.__init__(self, uri=uri, fname=fname, **kwds)
+    BSMLRecording.__init__(self, uri=uri, dataset=fname, **kwds)
+    self._session = None
+    self._frames = None
     self._siginfo = None
+    self._eventtables = { }
+
+  @staticmethod
+  def _record_name(dataset):
+  #-------------------------
+    """
+    Get the WFDB name of the record held in a dataset.
+    """
+    fname = str(dataset)
+    if fname.startswith(PHYSIOBANK):
+      fname = fname[len(PHYSIOBANK):]
+    elif fname.startswith('file:'):
+      fname = urllib.request.url2pathname(urllib.parse.urlparse(fname).path)
+    return fname[:-4] if fname.endswith('.hea') else fname
 
   def initialise(self, **kwds):
   #----------------------------
-    fname = str(self.dataset)
-    global _WFDBLock, _CurrentRecord, _RecordCount
-    with _WFDBLock:
-      if _CurrentRecord and _CurrentRecord != fname:
-        raise IOError("WFDB does not allow concurrent access to different recordings")
-      _CurrentRecord = fname
-      _RecordCount += 1
-    wfdb.setgvmode(wfdb.WFDB_HIGHRES)
     ## http: url needs .hea extension??
     #logging.debug('Opening: %s (%s)', fname, uri)
-    if fname.startswith(PHYSIOBANK):
-      fname = fname[len(PHYSIOBANK):]
-    self._siginfo = wfdb.isigopen(fname)
-    if self._siginfo is None:
-      raise IOError("Cannot open header for '%s'" % fname)
-    self._nsignals = self._siginfo.nsig
+    self._session = reader_pool().open(self._record_name(self.dataset))
+    self._frames = FrameCache(self._session)
+    self._siginfo = self._session.signals
+    self._nsignals = len(self._siginfo)
     for s in self.signals():
       WFDBSignal.initialise_class(s)
 
@@ -219,11 +210,10 @@ class WFDBRecording(BSMLRecording):
 #    if not uri: uri = recname
     ##logging.debug('rec: %s, source: %s', recname, source)
 
-    self._framerate = wfdb.sampfreq(None)/wfdb.getspf()
+    self._framerate = self._session.framerate
 
-    start = wfdb.mstimstr(0)
-    if start[0] == '[':
-      self.starttime = dateutil.parser.parse(start[1:-1], dayfirst=True)
+    if self._session.start is not None:
+      self.starttime = self._session.start
     if self._siginfo[0].nsamp > 0:
       self.duration = self._siginfo[0].nsamp/float(self._framerate)
 
@@ -264,7 +254,7 @@ class WFDBRecording(BSMLRecording):
   def open(cls, fname, uri=None):
   #------------------------------
     self = cls(uri, fname=fname)
-    self.initialise(fname)
+    self.initialise()
     self._set_attributes()
     return self
 
@@ -274,20 +264,94 @@ class WFDBRecording(BSMLRecording):
 
   def close(self):
   #---------------
-    global _WFDBLock, _CurrentRecord, _RecordCount
-    with _WFDBLock:
-      _RecordCount -= 1
-      if _RecordCount <= 0:
-        _CurrentRecord = None
-    wfdb.wfdbquit()
-
-  def _read_frame(self, signo = -1):
-  #---------------------------------
-    if signo < 0 or signo in self.data_signals:
-      v = wfdb.WFDB_SampleArray(self._framesize)
-      while wfdb.getframe(v.cast()) == self._nsignals:
-        if signo < 0: yield [v[i] for i in range(self._framesize) if self._sigpoints[i]]
-        else:         yield [v[i] for i in range(*self._offsets[n])]
+    if getattr(self, '_session', None) is not None:
+      self._frames = None
+      self._session.close()
+      self._session = None
+
+  def annotators(self):
+  #--------------------
+    """
+    Find the annotators of a recording that has local files.
+
+    :return: A sorted list of the extensions of the record's files that
+      aren't in :attr:`NONANNOTATORS`.
+    """
+    record = self._record_name(self.dataset)
+    return sorted(set(f[len(record)+1:] for f in glob.glob(glob.escape(record) + '.*')
+                        if f[len(record)+1:] not in self.NONANNOTATORS))
+
+  def _default_annotator(self):
+  #----------------------------
+    annotators = self.annotators()
+    if annotators and self.ANNOTATOR not in annotators: return annotators[0]
+    return self.ANNOTATOR
+
+  def event_table(self, annotator=None):
+  #-------------------------------------
+    """
+    The annotations of an annotator, read when first needed.
+
+    :param str annotator: The annotator. Optional, defaults to :attr:`ANNOTATOR`,
+      or the first of :meth:`annotators` if there is no such file.
+    :rtype: :class:`~.annotation.AnnotationTable`
+    """
+    if annotator is None: annotator = self._default_annotator()
+    table = self._eventtables.get(annotator)
+    if table is None:
+      table = read_annotations(self._record_name(self.dataset), annotator,
+                               getattr(self, '_framerate', None))
+      self._eventtables[annotator] = table
+    return table
+
+  def annotation_events(self, annotator=None, interval=None, types=None):
+  #----------------------------------------------------------------------
+    """
+    Get the annotations of an annotation file as events.
+
+    An :class:`~biosignalml.Event` is created the first time an annotation is
+    retrieved, with the annotation's symbol as its label, the description
+    of its type as its description, and any auxiliary text as its comment.
+    Once created, events are also given by :meth:`events`.
+
+    :param str annotator: The annotator. Optional, defaults as for :meth:`event_table`.
+    :param interval: The portion of the recording. Optional, defaults to
+      the entire recording.
+    :type interval: :class:`~biosignaml.time.Interval`
+    :param types: A list of annotation type symbols or codes. Optional,
+      defaults to annotations of any type.
+    :return: A list of :class:`~biosignalml.Event`\\ s, in time order.
+    """
+    if annotator is None: annotator = self._default_annotator()
+    table = self.event_table(annotator)
+    if interval is None: rows = table.select(types=types)
+    else:                rows = table.select(interval.start, interval.end, types)
+    events = [ ]
+    for n in rows:
+      uri = str(self.uri) + '/event/%s_%d' % (annotator, n)
+      event = self.get_resource(uri)
+      if event is None:
+        code = table.typecodes[n]
+        event = self.add_event(Event(uri, EVENTTYPE + str(code),
+                                     time=self.instant(table.onsets[n]),
+                                     label=table.texts[code],
+                                     description=table.descriptions[code] or None,
+                                     comment=table.aux(n) or None))
+      events.append(event)
+    return events
+
+  def _read_frames(self, start, count):
+  #------------------------------------
+    """
+    Read consecutive frames of the recording.
+
+    Decoded frames are kept in a cache shared by all of the recording's signals,
+    so reading several signals, or overlapping intervals, decodes frames once.
+
+    :return: A read-only 2D :class:`numpy.ndarray` of samples with a row for
+      each frame read.
+    """
+    return self._frames.read_frames(start, count)
 
 
 #===============================================================================
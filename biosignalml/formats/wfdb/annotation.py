@@ -0,0 +1,300 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+"""
+Read WFDB annotation files into columnar tables.
+
+An annotation file in MIT format is a sequence of 16-bit words, each with a
+6-bit code and a 10-bit value. Codes below :data:`SKIP` give the type of an
+annotation, with the value being its time from the previous annotation, while
+the remaining codes add a time skip, or the subtype, channel, number or
+auxiliary text, to an annotation. Files are decoded as a whole with ``numpy``,
+with only the words holding a time skip or auxiliary text, which have data words
+following them, being looked at individually.
+"""
+
+import os
+import re
+
+import numpy as np
+
+#===============================================================================
+
+from biosignalml.data.events import EventTable
+
+__all__ = [ 'AnnotationTable', 'read_annotations' ]
+
+#===============================================================================
+
+NOTQRS = 0      #: The code of a word that isn't an annotation
+NOTE   = 22     #: The code of a comment annotation
+SKIP   = 59     #: The code of a word followed by a 32-bit time skip
+NUM    = 60     #: The code of a word setting an annotation's number
+SUB    = 61     #: The code of a word setting an annotation's subtype
+CHN    = 62     #: The code of a word setting an annotation's channel
+AUX    = 63     #: The code of a word followed by an annotation's auxiliary text
+
+TIME_RESOLUTION = re.compile(r'## time resolution: (\d+\.?\d*)')
+LABEL_DEFINITION = re.compile(r'(\d+) (\S+) (.+)')
+
+#===============================================================================
+
+class AnnotationTable(EventTable):
+#=================================
+  """
+  A columnar table of the annotations in a WFDB annotation file.
+
+  An annotation's type code is its index into the lists of type symbols
+  and descriptions, and its auxiliary text is held as an index into a list
+  of distinct texts, with index 0 being an empty text.
+
+  :param samples: The sample number (time in frames) of each annotation.
+  :param float rate: The frame rate, used to give times in seconds.
+  :param typecodes: The type code of each annotation.
+  :param subtypes: The subtype of each annotation.
+  :param chans: The channel of each annotation.
+  :param nums: The number of each annotation.
+  :param auxids: Each annotation's index into ``auxtexts``.
+  :param list auxtexts: The distinct auxiliary texts.
+  :param list symbols: The symbol of each type code.
+  :param list descriptions: The description of each type code.
+  """
+
+  def __init__(self, samples, rate, typecodes, subtypes, chans, nums, auxids, auxtexts,
+                     symbols, descriptions):
+  #-------------------------------------------------------------------------------------
+    self.samples = np.asarray(samples, dtype=np.int64)
+    self.rate = float(rate)
+    EventTable.__init__(self, self.samples/self.rate, np.zeros(len(self.samples)),
+                        typecodes, symbols)
+    self.subtypes = np.asarray(subtypes, dtype=np.int8)
+    self.chans = np.asarray(chans, dtype=np.uint8)
+    self.nums = np.asarray(nums, dtype=np.int8)
+    self.auxids = np.asarray(auxids, dtype=np.int32)
+    self.auxtexts = list(auxtexts)
+    self.descriptions = list(descriptions)
+
+  @property
+  def typecodes(self):
+  #-------------------
+    """The type code of each annotation."""
+    return self.textids
+
+  def aux(self, n):
+  #----------------
+    """
+    Get the auxiliary text of an annotation.
+    """
+    return self.auxtexts[self.auxids[n]]
+
+  def type_codes(self, types):
+  #---------------------------
+    """
+    Get the codes of annotation types.
+
+    :param types: A list of type symbols or integer codes.
+    :rtype: :class:`numpy.ndarray`
+    """
+    codes = [ ]
+    for t in types:
+      if isinstance(t, str):
+        codes.extend(n for (n, s) in enumerate(self.texts) if s == t)
+      else:
+        codes.append(int(t))
+    return np.array(codes, dtype=np.int32)
+
+  def select(self, start=None, end=None, types=None):
+  #--------------------------------------------------
+    """
+    Find the annotations in a period of time that are of given types.
+
+    :param float start: The start of the period, in seconds. Optional,
+      defaults to the start of the table.
+    :param float end: The end of the period, in seconds, not itself included
+      unless equal to ``start``. Optional, defaults to the end of the table.
+    :param types: A list of type symbols or codes. Optional, defaults to
+      annotations of any type.
+    :return: The indices of the annotations, in time order.
+    :rtype: :class:`numpy.ndarray`
+    """
+    if start is None and end is None:
+      rows = np.argsort(self.onsets, kind='stable')
+    else:
+      if start is None: start = min(end, self.onsets.min()) if len(self) else 0.0
+      if end is None: end = max(start, self.onsets.max()) + 1.0 if len(self) else start
+      rows = self.overlapping(start, end)
+    if types is not None:
+      rows = rows[np.isin(self.textids[rows], self.type_codes(types))]
+    return rows
+
+#===============================================================================
+
+def _standard_labels():
+#======================
+  """
+  Get the symbols and descriptions of the standard WFDB annotation codes.
+  """
+  from wfdb.io.annotation import ann_labels
+  symbols = [ '[%d]' % n for n in range(SKIP) ]
+  descriptions = SKIP*[ '' ]
+  for label in ann_labels:
+    symbols[label.label_store] = label.symbol
+    descriptions[label.label_store] = label.description
+  return (symbols, descriptions)
+
+def _read_words(record, annotator):
+#==================================
+  """
+  Read an annotation file as 16-bit words, from a PhysioNet database if
+  the record isn't a local file.
+  """
+  fname = record + '.' + annotator
+  if os.path.exists(fname):
+    return np.fromfile(fname, dtype='<u2')
+  from .pool import _location
+  (name, pn_dir) = _location(record)
+  if pn_dir is None:
+    raise IOError("Cannot find annotation file '%s'" % fname)
+  from wfdb.io import download
+  from wfdb.io.annotation import load_byte_pairs
+  if '.' not in pn_dir:
+    dirs = pn_dir.split('/')
+    pn_dir = '/'.join([ dirs[0], download.get_version(dirs[0]) ] + dirs[1:])
+  return np.ascontiguousarray(load_byte_pairs(name, annotator, pn_dir)).view('<u2').reshape(-1)
+
+def _carried(rows, settings, count):
+#===================================
+  """
+  Set a column from settings for some rows, with other rows taking the setting
+  of the closest preceding row with one, or zero.
+  """
+  column = np.zeros(count, dtype=np.int64)
+  latest = np.full(count, -1, dtype=np.int64)
+  column[rows] = settings
+  latest[rows] = rows
+  if count: latest = np.maximum.accumulate(latest)
+  return np.where(latest >= 0, column[np.maximum(latest, 0)], 0)
+
+def _decode(words):
+#==================
+  """
+  Decode the words of an annotation file into columns.
+  """
+  codes = words >> 10
+  values = (words & 0x3FF).astype(np.int64)
+  increments = np.where(codes < SKIP, values, 0)
+  # Data words following SKIP and AUX words aren't structural, so words with
+  # these codes are checked in order, skipping any that are themselves data
+  candidates = np.flatnonzero((codes == SKIP) | (codes == AUX))
+  skips = [ ]
+  datawords = np.zeros(len(words) + 1, dtype=np.int64)
+  following = 0
+  for (p, code, value) in zip(candidates.tolist(), codes[candidates].tolist(),
+                              values[candidates].tolist()):
+    if p < following: continue
+    if code == SKIP:
+      skips.append(p)
+      following = p + 3
+    else:
+      following = p + 1 + ((value & 0xFF) + 1)//2
+    datawords[p+1] += 1
+    datawords[min(following, len(words))] -= 1
+  structural = np.cumsum(datawords[:-1]) == 0
+  skips = np.array([ p for p in skips if p + 2 < len(words) ], dtype=np.int64)
+  skip = (words[skips+1].astype(np.int64) << 16) | words[skips+2]
+  increments[skips] = np.where(skip & 0x80000000, skip - (1 << 32), skip)
+  # Annotations end at the first zero word
+  ends = np.flatnonzero(structural & (words == 0))
+  if len(ends): structural[ends[0]:] = False
+  positions = np.flatnonzero(structural)
+  times = np.cumsum(np.where(structural, increments, 0))
+  codes = codes[positions]
+  values = values[positions] & 0xFF
+  isannotation = codes < SKIP
+  count = int(np.count_nonzero(isannotation))
+  # Other words belong to the preceding annotation
+  owner = np.cumsum(isannotation) - 1
+  def extra(code):
+    found = (codes == code) & (owner >= 0)
+    return (owner[found], values[found])
+  subtypes = np.zeros(count, dtype=np.int64)
+  (rows, settings) = extra(SUB)
+  subtypes[rows] = settings
+  texts = { '': 0 }
+  auxids = np.zeros(count, dtype=np.int32)
+  (rows, lengths) = extra(AUX)
+  data = words.astype('<u2').tobytes()
+  starts = 2*(positions[(codes == AUX) & (owner >= 0)] + 1)
+  for (row, start, length) in zip(rows.tolist(), starts.tolist(), lengths.tolist()):
+    text = data[start: start+length].decode('latin-1').rstrip('\x00')
+    auxids[row] = texts.setdefault(text, len(texts))
+  return { 'samples': times[positions[isannotation]],
+           'typecodes': codes[isannotation].astype(np.int32),
+           'subtypes': subtypes.astype(np.uint8).view(np.int8),
+           'chans': _carried(*extra(CHN), count=count).astype(np.uint8),
+           'nums': _carried(*extra(NUM), count=count).astype(np.uint8).view(np.int8),
+           'auxids': auxids,
+           'auxtexts': sorted(texts, key=texts.get) }
+
+def read_annotations(record, annotator, rate=None):
+#==================================================
+  """
+  Read a WFDB annotation file.
+
+  Comment annotations at time zero that hold the time resolution of the file,
+  or definitions of annotation types, are used and then removed, as are words
+  that aren't annotations.
+
+  :param str record: The name of the WFDB record.
+  :param str annotator: The name of the annotator, which is the file's extension.
+  :param float rate: The frame rate of the record, used when the file doesn't
+    give its time resolution.
+  :rtype: :class:`AnnotationTable`
+  """
+  columns = _decode(_read_words(record, annotator))
+  (symbols, descriptions) = _standard_labels()
+  auxtexts = columns['auxtexts']
+  codes = columns['typecodes']
+  definitions = (columns['samples'] == 0) & (codes == NOTE)
+  defining = False
+  for n in np.flatnonzero(definitions):
+    text = auxtexts[columns['auxids'][n]]
+    resolution = TIME_RESOLUTION.match(text)
+    if resolution:
+      rate = float(resolution.group(1))
+    elif text == '## annotation type definitions':
+      defining = True
+    elif text == '## end of definitions':
+      defining = False
+    elif defining:
+      label = LABEL_DEFINITION.match(text)
+      if label and int(label.group(1)) < SKIP:
+        symbols[int(label.group(1))] = label.group(2)
+        descriptions[int(label.group(1))] = label.group(3)
+  if rate is None:
+    raise ValueError("Annotation file '%s.%s' doesn't give its time resolution"
+                     % (record, annotator))
+  keep = ~definitions & (codes != NOTQRS)
+  return AnnotationTable(columns['samples'][keep], rate, codes[keep],
+                         columns['subtypes'][keep], columns['chans'][keep],
+                         columns['nums'][keep], columns['auxids'][keep], auxtexts,
+                         symbols, descriptions)
+
+#===============================================================================
@@ -0,0 +1,450 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+"""
+Read WFDB records from a pool of worker processes.
+
+Each record is opened by a worker process that it has to itself for as long as
+the record is open. A worker decodes blocks of frames with the ``wfdb`` package
+and passes them back through a block of shared memory owned by the worker.
+Records held by different workers are read and decoded concurrently; reads of
+the same record are serialised.
+"""
+
+import os
+import threading
+import multiprocessing
+import multiprocessing.util
+from multiprocessing import shared_memory
+from collections import namedtuple, OrderedDict
+
+import numpy as np
+
+from ...utils import attach_shared_memory
+
+__all__ = [ 'SignalInfo', 'WFDBReaderPool', 'WFDBSession', 'FrameCache', 'reader_pool' ]
+
+#===============================================================================
+
+POOLSIZE = 8            #: The default maximum number of worker processes
+SLOTSIZE = 1 << 22      #: The default size, in bytes, of a worker's shared memory
+TIMEOUT  = 30.0         #: The default time, in seconds, to wait for a worker to become free
+DEFGAIN  = 200.0        #: The gain of a signal whose header doesn't give one
+BLOCKSIZE = 1 << 20     #: The default size, in bytes, of a block of cached frames
+CACHESIZE = 1 << 26     #: The default maximum size, in bytes, of a frame cache
+
+SignalInfo = namedtuple('SignalInfo', 'desc, units, gain, baseline, spf, nsamp')
+'''A tuple describing a signal of a WFDB record.'''
+
+#===============================================================================
+
+def _location(record):
+#=====================
+  """
+  Get the name and PhysioNet directory for reading a record with ``wfdb``.
+
+  A record that isn't a local file is assumed to be in a PhysioNet database.
+  """
+  if os.path.exists(record + '.hea') or '/' not in record:
+    return (record, None)
+  (pn_dir, name) = record.rsplit('/', 1)
+  return (name, pn_dir)
+
+def _open_record(record):
+#========================
+  """
+  Read the header of a record in a worker process.
+
+  :return: A dictionary with the record's frame rate, its start time as a
+    :class:`~datetime.datetime` or None, the number of frames, and a
+    :class:`SignalInfo` field dictionary for each signal.
+  """
+  import wfdb
+  (name, pn_dir) = _location(record)
+  try:
+    header = wfdb.rdheader(name, pn_dir=pn_dir)
+  except Exception as msg:
+    raise IOError("Cannot open header for '%s' (%s)" % (record, msg))
+  signals = [ ]
+  nframes = header.sig_len if header.sig_len else 0
+  for n in range(header.n_sig):
+    gain = header.adc_gain[n]
+    signals.append({ 'desc': header.sig_name[n], 'units': header.units[n],
+                     'gain': gain if gain else DEFGAIN,
+                     'baseline': header.baseline[n], 'spf': header.samps_per_frame[n],
+                     'nsamp': nframes })
+  return { 'framerate': float(header.fs),
+           'start': header.base_datetime,
+           'frames': nframes,
+           'signals': signals }
+
+def _read_frames(frames, record, start, nframes):
+#===============================================
+  """
+  Read a block of consecutive frames into an array, decoding all of them
+  with a single ``rdrecord()`` call.
+
+  :return: The number of frames read.
+  """
+  import wfdb
+  count = min(len(frames), nframes - start)
+  if start < 0 or count <= 0:
+    return 0
+  (name, pn_dir) = _location(record)
+  data = wfdb.rdrecord(name, sampfrom=start, sampto=start + count, physical=False,
+                       smooth_frames=False, pn_dir=pn_dir)
+  offset = 0
+  for (samples, spf) in zip(data.e_d_signal, data.samps_per_frame):
+    frames[:count, offset: offset+spf] = samples.reshape(count, spf)
+    offset += spf
+  return count
+
+def _worker(connection, shmname):
+#================================
+  """
+  The main loop of a worker process.
+
+  Requests are (operation, arguments) tuples and each is answered with a
+  (status, value) tuple.
+  """
+  shm = attach_shared_memory(shmname)
+  session = None
+  try:
+    while True:
+      try:
+        (op, args) = connection.recv()
+      except EOFError:
+        break
+      if op == 'stop':
+        break
+      try:
+        if op == 'open':
+          result = _open_record(*args)
+          session = (args[0], result['frames'])
+        elif op == 'read':
+          (framesize, start, count) = args
+          result = _read_frames(np.ndarray((count, framesize), dtype=np.int32, buffer=shm.buf),
+                                session[0], start, session[1])
+        elif op == 'close':
+          result = session = None
+        else:
+          raise ValueError("Unknown request '%s'" % op)
+        connection.send(('done', result))
+      except Exception as msg:
+        connection.send(('error', str(msg)))
+  finally:
+    shm.close()
+
+#===============================================================================
+
+class _Worker(object):
+#=====================
+  """
+  A worker process, with its shared memory and connection.
+  """
+  def __init__(self, slotsize):
+  #----------------------------
+    self.slotsize = slotsize
+    self.shm = shared_memory.SharedMemory(create=True, size=slotsize)
+    (self.connection, child) = multiprocessing.Pipe()
+    self.process = multiprocessing.Process(target=_worker, args=(child, self.shm.name), daemon=True)
+    self.process.start()
+    child.close()
+
+  def call(self, op, *args):
+  #-------------------------
+    try:
+      self.connection.send((op, args))
+      (status, value) = self.connection.recv()
+    except (EOFError, OSError):
+      raise RuntimeError("Cannot read WFDB record (Reader process has exited)")
+    if status == 'error':
+      raise RuntimeError("Cannot read WFDB record ({})".format(value))
+    return value
+
+  def stop(self):
+  #--------------
+    try:
+      self.connection.send(('stop', ()))
+    except (EOFError, OSError):
+      pass
+    self.process.join()
+    self.connection.close()
+    self.shm.close()
+    self.shm.unlink()
+
+#===============================================================================
+
+class WFDBSession(object):
+#=========================
+  """
+  A WFDB record opened by a worker process of a :class:`WFDBReaderPool`.
+
+  :param pool: The pool the worker belongs to.
+  :param record: The name of the WFDB record.
+  """
+  def __init__(self, pool, record):
+  #--------------------------------
+    self.record = record
+    self._pool = pool
+    self._lock = threading.Lock()
+    self._worker = pool._acquire()
+    try:
+      header = self._worker.call('open', record)
+    except Exception:
+      pool._release(self._worker)
+      self._worker = None
+      raise
+    self.framerate = header['framerate']         #: Frames per second
+    self.start = header['start']                 #: When the record started, or None
+    self.frames = header['frames']               #: The number of frames in the record
+    self.signals = [ SignalInfo(**s) for s in header['signals'] ]  #: :class:`SignalInfo` for each signal
+    self.framesize = sum(s.spf for s in self.signals)  #: The number of samples in a frame
+
+  def read_frames(self, start, count):
+  #-----------------------------------
+    """
+    Read consecutive frames of the record.
+
+    :param int start: The index of the first frame.
+    :param int count: The number of frames to read.
+    :return: A 2D :class:`numpy.ndarray` of samples with a row for each frame read.
+    """
+    if self._worker is None:
+      raise RuntimeError("WFDB record '%s' is closed" % self.record)
+    perread = max(1, self._worker.slotsize//(4*self.framesize))
+    frames = np.empty((max(0, count), self.framesize), dtype=np.int32)
+    pos = 0
+    with self._lock:
+      buffer = self._worker.shm.buf
+      while pos < count:
+        n = self._worker.call('read', self.framesize, start + pos, min(perread, count - pos))
+        if n <= 0: break
+        frames[pos: pos+n] = np.ndarray((n, self.framesize), dtype=np.int32, buffer=buffer)
+        pos += n
+    return frames[:pos]
+
+  def close(self):
+  #---------------
+    """
+    Close the record, returning its worker process to the pool.
+    """
+    with self._lock:
+      if self._worker is None:
+        return
+      try:
+        self._worker.call('close')
+      except RuntimeError:
+        pass                # The worker process has already exited
+      finally:
+        self._pool._release(self._worker)
+        self._worker = None
+
+#===============================================================================
+
+class FrameCache(object):
+#========================
+  """
+  A cache of decoded frames of a :class:`WFDBSession`.
+
+  Frames are read and cached in aligned blocks, keyed by their range of frames,
+  with the least recently used blocks discarded once the cache is full. Runs
+  of blocks that are not in the cache are read from the session at once.
+
+  :param session: The :class:`WFDBSession` to read frames from.
+  :param int blocksize: The size, in bytes, of a block of frames.
+  :param int maxsize: The maximum size, in bytes, of the cached blocks.
+  """
+  def __init__(self, session, blocksize=BLOCKSIZE, maxsize=CACHESIZE):
+  #-------------------------------------------------------------------
+    self.session = session
+    self.blockframes = max(1, blocksize//(4*session.framesize))  #: Frames in a block
+    self.maxsize = maxsize
+    self.size = 0                #: The size, in bytes, of the cached blocks
+    self.hits = 0                #: The number of blocks found in the cache
+    self.misses = 0              #: The number of blocks read from the session
+    self._blocks = OrderedDict()
+    self._lock = threading.Lock()
+
+  def _add(self, key, block):
+  #--------------------------
+    block.flags.writeable = False
+    self._blocks[key] = block
+    self.size += block.nbytes
+    while self.size > self.maxsize and len(self._blocks) > 1:
+      self.size -= self._blocks.popitem(last=False)[1].nbytes
+
+  def _fetch(self, first, last):
+  #-----------------------------
+    """
+    Get blocks ``first`` to ``last`` inclusive, stopping at the end of the record.
+    """
+    size = self.blockframes
+    blocks = [ ]
+    n = first
+    while n <= last:
+      key = (n*size, (n + 1)*size)
+      block = self._blocks.get(key)
+      if block is not None:
+        self._blocks.move_to_end(key)
+        self.hits += 1
+        blocks.append(block)
+        n += 1
+        continue
+      end = n + 1
+      while end <= last and (end*size, (end + 1)*size) not in self._blocks:
+        end += 1
+      frames = self.session.read_frames(n*size, (end - n)*size)
+      for m in range(n, end):
+        block = frames[(m - n)*size: (m - n + 1)*size]
+        if len(block) == 0: return blocks
+        self.misses += 1
+        block = block.copy() if end - n > 1 else block
+        self._add((m*size, (m + 1)*size), block)
+        blocks.append(block)
+        if len(block) < size: return blocks
+      n = end
+    return blocks
+
+  def read_frames(self, start, count):
+  #-----------------------------------
+    """
+    Read consecutive frames, from the cache where possible.
+
+    :param int start: The index of the first frame.
+    :param int count: The number of frames to read.
+    :return: A read-only 2D :class:`numpy.ndarray` of samples with a row for
+      each frame read.
+    """
+    size = self.blockframes
+    if count <= 0 or start < 0:
+      return np.empty((0, self.session.framesize), dtype=np.int32)
+    with self._lock:
+      blocks = self._fetch(start//size, (start + count - 1)//size)
+    if not blocks:
+      return np.empty((0, self.session.framesize), dtype=np.int32)
+    offset = start - (start//size)*size
+    frames = blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+    return frames[offset: offset + count]
+
+  def clear(self):
+  #---------------
+    """
+    Discard all cached frames.
+    """
+    with self._lock:
+      self._blocks.clear()
+      self.size = 0
+
+#===============================================================================
+
+class WFDBReaderPool(object):
+#============================
+  """
+  A pool of worker processes for reading WFDB records.
+
+  Worker processes are started as needed, up to the size of the pool, and are
+  reused once the record they had open has been closed. Opening a record waits
+  for a worker to become available when all are in use.
+
+  :param int size: The maximum number of worker processes.
+  :param int slotsize: The size, in bytes, of the shared memory used to pass
+    samples back from a worker.
+  :param float timeout: How long, in seconds, to wait for a worker before
+    failing to open a record. None means wait indefinitely.
+  """
+  def __init__(self, size=POOLSIZE, slotsize=SLOTSIZE, timeout=TIMEOUT):
+  #---------------------------------------------------------------------
+    self.size = size
+    self.slotsize = slotsize
+    self.timeout = timeout
+    self._idle = [ ]
+    self._count = 0
+    self._available = threading.Condition()
+
+  def _acquire(self):
+  #------------------
+    with self._available:
+      if not self._available.wait_for(lambda: self._idle or self._count < self.size,
+                                      self.timeout):
+        raise RuntimeError("Cannot open WFDB record (All reader processes are in use)")
+      if self._idle:
+        return self._idle.pop()
+      self._count += 1
+    try:
+      return _Worker(self.slotsize)
+    except Exception:
+      with self._available:
+        self._count -= 1
+        self._available.notify()
+      raise
+
+  def _release(self, worker):
+  #--------------------------
+    with self._available:
+      if worker.process.is_alive():
+        self._idle.append(worker)
+      else:
+        worker.stop()
+        self._count -= 1
+      self._available.notify()
+
+  def open(self, record):
+  #----------------------
+    """
+    Open a WFDB record.
+
+    :param str record: The name of the record.
+    :rtype: :class:`WFDBSession`
+    """
+    return WFDBSession(self, record)
+
+  def close(self):
+  #---------------
+    """
+    Stop all idle worker processes.
+    """
+    with self._available:
+      while self._idle:
+        self._idle.pop().stop()
+        self._count -= 1
+
+#===============================================================================
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def reader_pool():
+#=================
+  """
+  Get the pool of worker processes shared by WFDB recordings, creating it
+  when first needed.
+
+  :rtype: :class:`WFDBReaderPool`
+  """
+  global _pool
+  with _pool_lock:
+    if _pool is None:
+      _pool = WFDBReaderPool()
+      # Unlike atexit, finalizers also run when a multiprocessing child exits
+      multiprocessing.util.Finalize(_pool, _pool.close, exitpriority=10)
+    return _pool
+
+#===============================================================================
@@ -159,6 +159,35 @@ Resource = rdflib.term.URIRef
 
 #===============================================================================
 
+_TERM_SEPARATOR = '\x1f'
+
+def _encode_term(term):
+#======================
+  """
+  Encode a node as a string, with a leading character giving its kind.
+  A literal's datatype and language precede its lexical form.
+  """
+  if isinstance(term, rdflib.term.Literal):
+    return 'L' + _TERM_SEPARATOR.join((str(term.datatype or ''), term.language or '', str(term)))
+  elif isinstance(term, rdflib.term.BNode):
+    return 'B' + str(term)
+  else:
+    return 'U' + str(term)
+
+def _decode_term(code):
+#======================
+  """Get the node of a string encoded by :func:`_encode_term`."""
+  if code[0] == 'L':
+    (datatype, language, lexical) = code[1:].split(_TERM_SEPARATOR, 2)
+    return rdflib.term.Literal(lexical, lang=language or None,
+                               datatype=rdflib.term.URIRef(datatype) if datatype else None)
+  elif code[0] == 'B':
+    return rdflib.term.BNode(code[1:])
+  else:
+    return rdflib.term.URIRef(code[1:])
+
+#===============================================================================
+
 class Statement(tuple[Node, Node, Node]):
 #=========================================
   """
@@ -245,10 +274,47 @@ class Graph(rdflib.Graph):
     self.parse(data=string, format=Format.name(format), publicID=str(uri))
     return self
 
+  @classmethod
+  def create_from_encoding(cls, uri, terms, triples):
+  #--------------------------------------------------
+    """
+    Create a new Graph from a term table and triples of indices into it,
+    as returned by :meth:`encode`.
+
+    :param uri: The URI of the resulting graph.
+    :param terms: A sequence of encoded terms.
+    :param triples: A sequence of (subject, predicate, object) index triples.
+    :rtype: A :class:`Graph`
+    """
+    self = cls(uri)
+    nodes = [ _decode_term(t) for t in terms ]
+    self.addN((nodes[s], nodes[p], nodes[o], self) for s, p, o in triples)
+    return self
+
   def __str__(self):
   #-----------------
     return str(self.uri)
 
+  def encode(self):
+  #----------------
+    """
+    Encode the graph's statements as a table of distinct terms, with each
+    statement given as (subject, predicate, object) indices into the table.
+
+    :return: A 2-tuple of a list of encoded terms (as strings) and a list
+      of index triples.
+    """
+    index = { }
+    terms = [ ]
+    def term_index(term):
+      n = index.get(term)
+      if n is None:
+        n = index[term] = len(terms)
+        terms.append(_encode_term(term))
+      return n
+    triples = [ (term_index(s), term_index(p), term_index(o)) for s, p, o in self ]
+    return (terms, triples)
+
   def parse_resource(self, uri, format=Format.TURTLE, base=None):
   #--------------------------------------------------------------
     """
@@ -84,6 +84,14 @@ class RecordingGraph(rdf.Graph):
     self.__init__(uri, rec_class, True)
     return self
 
+  @classmethod
+  def create_from_encoding(cls, uri, terms, triples, rec_class=None):
+  #------------------------------------------------------------------
+    self = rdf.Graph.create_from_encoding(uri, terms, triples)
+    self.__class__ = cls
+    self.__init__(uri, rec_class, True)
+    return self
+
   def get_recording(self, signals=True, **kwds):
   #---------------------------------------------
     """
@@ -33,7 +33,7 @@ from dateutil.tz import tzutc
 __all__ = [ 'datetime_to_isoformat', 'isoformat_to_datetime', 'seconds_to_isoduration',
             'isoduration_to_seconds', 'utctime', 'utctime_as_string', 'expired', 'chop',
             'trimdecimal', 'maketime', 'nbspescape', 'xmlescape', 'xml', 'num',
-            'file_uri', 'hexdump', 'unescape' ]
+            'file_uri', 'attach_shared_memory', 'hexdump', 'unescape' ]
 
 #===============================================================================
 
@@ -194,6 +194,33 @@ def file_uri(f):
 
 #===============================================================================
 
+def attach_shared_memory(name):
+#==============================
+  """
+  Attach to an existing shared memory block.
+
+  The block is owned by the process that created it, so it mustn't be tracked,
+  and hence removed, when the attaching process exits. Before Python 3.13
+  attaching always registers the block with the resource tracker, so
+  registration is then skipped. (Unregistering afterwards would instead
+  remove the owner's registration when the tracker process is shared.)
+
+  :param str name: The name of the shared memory block.
+  :rtype: :class:`multiprocessing.shared_memory.SharedMemory`
+  """
+  from multiprocessing import shared_memory, resource_tracker
+  try:
+    return shared_memory.SharedMemory(name=name, track=False)
+  except TypeError:
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+      return shared_memory.SharedMemory(name=name)
+    finally:
+      resource_tracker.register = register
+
+#===============================================================================
+
 def hexdump(s, prompt='', offset=0):
 #==================================
   import string
@@ -257,7 +284,7 @@ def unescape(text):
       except KeyError:
         pass
     return text           # leave as is
-  return re.sub("&#?\w+;", fixup, text)
+  return re.sub(r"&#?\w+;", fixup, text)
 
 ##
 #############################################################
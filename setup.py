@@ -44,4 +44,7 @@ setup(name='BioSignalML',
                         'numpy >= 1.8.1',
                         'h5py >= 2.7.0',
                        ],
+      entry_points = {
+        'console_scripts': [ 'bsml-convert = biosignalml.formats.convert:main' ],
+        },
       )
@@ -0,0 +1,97 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+import numpy as np
+
+from biosignalml.data.events import EventTable, IntervalTree
+
+#===============================================================================
+
+def _brute_force(starts, ends, start, end):
+#==========================================
+  """
+  The intervals overlapping a period, found by checking every interval.
+  """
+  if end > start:
+    found = (starts < end) & ((ends > start) | (starts >= start))
+  else:
+    found = (starts <= end) & ((ends > start) | (starts >= start))
+  return set(np.flatnonzero(found).tolist())
+
+
+def _check_tree(starts, ends, factor, queries, rng):
+#===================================================
+  tree = IntervalTree(starts, ends, factor)
+  assert len(tree) == len(starts)
+  mismatches = 0
+  for _ in range(queries):
+    start = rng.uniform(-10.0, 1010.0)
+    end = start + (0.0 if rng.random() < 0.2 else rng.exponential(20.0))
+    rows = tree.overlapping(start, end)
+    order = starts[rows]
+    assert np.all(order[:-1] <= order[1:])
+    if set(rows.tolist()) != _brute_force(starts, ends, start, end): mismatches += 1
+  return mismatches
+
+
+def test_interval_tree():
+#========================
+  rng = np.random.default_rng(0)
+  for count in (0, 1, 15, 16, 17, 1000, 5000):
+    starts = rng.uniform(0.0, 1000.0, count)
+    durations = np.where(rng.random(count) < 0.3, 0.0, rng.exponential(5.0, count))
+    durations[:count//100] = rng.uniform(100.0, 500.0, count//100)   # Some long intervals
+    for factor in (2, 16):
+      assert _check_tree(starts, starts + durations, factor, 200, rng) == 0
+
+
+def test_instants():
+#===================
+  tree = IntervalTree([ 1.0, 2.0, 2.0, 3.0 ], [ 1.0, 2.0, 2.5, 3.0 ])
+  assert tree.overlapping(2.0, 2.0).tolist() == [ 1, 2 ]
+  assert tree.overlapping(1.0, 2.0).tolist() == [ 0 ]
+  assert tree.overlapping(2.2, 3.0).tolist() == [ 2 ]
+  assert tree.overlapping(3.5, 4.0).tolist() == [ ]
+
+
+def test_event_table():
+#======================
+  events = [ (5.0, 1.0, 'b'), (1.0, None, 'a'), (3.0, 4.0, 'b'), (9.0, 0.5, 'c') ]
+  table = EventTable.from_events(events)
+  assert len(table) == 4
+  assert table.texts == [ 'b', 'a', 'c' ]
+  assert table[1] == (1.0, 0.0, 'a')
+  assert table.overlapping(4.0, 6.0).tolist() == [ 2, 0 ]
+  assert table.overlapping(1.0, 1.0).tolist() == [ 1 ]
+  assert table.keys is None
+  keyed = EventTable([ 0.0, 1.0 ], [ 0.0, 0.0 ], [ 0, 0 ], [ 'x' ], [ (3, 1), (4, 0) ])
+  assert keyed.keys.tolist() == [ [ 3, 1 ], [ 4, 0 ] ]
+
+#===============================================================================
+
+if __name__ == '__main__':
+#=========================
+
+  test_interval_tree()
+  test_instants()
+  test_event_table()
+  print('OK')
+
+#===============================================================================
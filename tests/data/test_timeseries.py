@@ -0,0 +1,112 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+import tracemalloc
+
+import numpy as np
+
+from biosignalml.data import DataSegment, TimeSeries, UniformTimeSeries
+
+#===============================================================================
+
+def _allocated(access, count=10):
+#================================
+  """
+  The peak number of bytes allocated by repeatedly calling ``access``.
+  """
+  access()
+  tracemalloc.start()
+  try:
+    for _ in range(count): access()
+    return tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+
+
+def test_uniform_times():
+#========================
+  series = UniformTimeSeries(np.arange(100000.0), rate=250.0)
+  times = series.times
+  assert isinstance(times, np.ndarray)
+  assert np.array_equal(times, np.arange(100000)/250.0)
+  assert series.times is times
+  assert _allocated(lambda: series.times) < 10000
+  series.extend(np.arange(10.0))
+  assert len(series.times) == 100010 and series.times[-1] == 100009/250.0
+  series.rate = 500.0
+  assert series.times[-1] == 100009/500.0
+
+
+def test_segment_times():
+#========================
+  segment = DataSegment(10.0, UniformTimeSeries(np.arange(100000.0), rate=100.0))
+  times = segment.times
+  assert times[0] == 10.0 and times[-1] == 10.0 + 99999/100.0
+  assert segment.times is times
+  assert _allocated(lambda: segment.times) < 10000
+
+
+def test_points():
+#=================
+  series = UniformTimeSeries(np.arange(20.0).reshape((10, 2)), rate=10.0)
+  points = series.points
+  assert points.shape == (10, 3)
+  assert series.points is points
+  assert _allocated(lambda: series.points) < 10000
+  series.extend(np.ones((1, 2)))
+  assert series.points is not points and len(series.points) == 11
+  series.data = np.zeros((5, 2))
+  assert len(series.points) == 5
+
+
+def test_reserve():
+#==================
+  # Reserved capacity is kept when the first values are multi-dimensional
+  series = UniformTimeSeries(np.empty(0), rate=10.0)
+  series.reserve(1000)
+  store = series._data._store
+  assert len(store) == 1000
+  series.extend(np.ones((10, 3)))
+  store = series._data._store
+  assert store.shape == (1000, 3)
+  for _ in range(99): series.extend(np.ones((10, 3)))
+  assert series._data._store is store and series.data.shape == (1000, 3)
+  # As it is for the sample times of a clocked series, in seconds
+  series = TimeSeries(np.zeros(1), np.zeros(1))
+  series.reserve(1000)
+  (times, seconds) = (series.time._times._store, series.time._seconds._store)
+  assert len(times) == 1000 and len(seconds) == 1000
+  for n in range(99):
+    series.extend(np.arange(10*n + 1, 10*n + 11)/10.0, np.ones(10))
+  assert series.time._times._store is times and series.time._seconds._store is seconds
+  assert series.time.index(50.05) == 500
+
+#===============================================================================
+
+if __name__ == '__main__':
+#=========================
+
+  test_uniform_times()
+  test_segment_times()
+  test_points()
+  test_reserve()
+  print('OK')
+
+#===============================================================================
@@ -0,0 +1,105 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+
+from biosignalml.formats.edf.edffile import EDFFile, TimeStampedAnnotation, FormatError
+from biosignalml.formats.edf.annotate import annotate, Annotation
+
+#===============================================================================
+
+HYPNOGRAM = os.path.join(os.path.dirname(__file__), '..', '..', '..',
+                         'physionet.org', 'sleep-edfx', 'ST7011JP-Hypnogram.edf')
+
+#===============================================================================
+
+def test_hypnogram():
+#====================
+  # An annotation-only EDF+ file, with data records of zero duration
+  if not os.path.exists(HYPNOGRAM):
+    pytest.skip('PhysioNet test data not present')
+  edf = EDFFile.open(HYPNOGRAM)
+  try:
+    assert edf.data_signals == [ ] and edf.errors == [ ]
+    table = edf.annotation_table()
+    expected = [ (a.onset, a.duration, text) for a in edf.annotations()
+                                               for text in a.annotations if text ]
+    assert len(table) == len(expected) > 0
+    assert [ table[n] for n in range(len(table)) ] == expected
+    assert table[0] == (0.0, 1560.0, 'Sleep stage W')
+    assert set(table.texts) <= set([ 'Sleep stage W', 'Sleep stage 1', 'Sleep stage 2',
+                                     'Sleep stage 3', 'Sleep stage 4', 'Sleep stage R',
+                                     'Sleep stage ?', 'Movement time' ])
+    assert table.overlapping(1600.0, 1600.0).tolist() == [ 1 ]
+  finally:
+    edf.close()
+
+
+def test_padding_records():
+#==========================
+  # Adding a second annotation signal pads records that have no annotations
+  # with NULs
+  tmpdir = tempfile.mkdtemp()
+  try:
+    source = os.path.join(tmpdir, 'source.edf')
+    output = os.path.join(tmpdir, 'annotated.edf')
+    edf = EDFFile.create(source)
+    edf.add_signal('EEG', 100, -100.0, 100.0, 'uV')
+    edf.append_signal(0, np.zeros(1000))
+    edf.close()
+    annotate(source, output, [ Annotation('one', 0.5), Annotation('two', 2.5, 1.0) ])
+    edf = EDFFile.open(output)
+    try:
+      assert len(edf.annotation_signals) == 2
+      tals = list(edf.annotations())
+      assert edf.errors == [ ]
+      expected = [ ((n, m), (a.onset, a.duration, text)) for (n, a) in enumerate(tals)
+                                                          for (m, text) in enumerate(a.annotations)
+                                                            if text ]
+      assert [ e[1] for e in expected ] == [ (0.5, 0.0, 'one'), (2.5, 1.0, 'two') ]
+      table = edf.annotation_table()
+      assert [ (tuple(table.keys[n]), table[n]) for n in range(len(table)) ] == expected
+    finally:
+      edf.close()
+  finally:
+    shutil.rmtree(tmpdir)
+
+
+def test_empty_TAL():
+#====================
+  with pytest.raises(FormatError):
+    TimeStampedAnnotation('')
+
+#===============================================================================
+
+if __name__ == '__main__':
+#=========================
+
+  test_hypnogram()
+  test_padding_records()
+  test_empty_TAL()
+  print('OK')
+
+#===============================================================================
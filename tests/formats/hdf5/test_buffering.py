@@ -0,0 +1,67 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+
+from biosignalml.formats.hdf5.h5recording import H5Recording
+
+#===============================================================================
+
+URI = 'http://example.org/recording'
+SIGNALS = [ URI + '/signal/{}'.format(n) for n in range(2) ]
+
+#===============================================================================
+
+def test_flush():
+#================
+  tmpdir = tempfile.mkdtemp()
+  try:
+    h5 = H5Recording.create(URI, os.path.join(tmpdir, 'buffered.h5'), buffersize=1000)
+    try:
+      for uri in SIGNALS:
+        h5.create_signal(uri, 'mV', dtype='f8', rate=100.0)
+        h5.extend_signal(uri, np.arange(10.0))
+      assert [ h5.buffered(uri) for uri in SIGNALS ] == [ 10, 10 ]
+      h5.flush(SIGNALS[0])
+      assert [ h5.buffered(uri) for uri in SIGNALS ] == [ 0, 10 ]
+      assert np.array_equal(h5.get_signal(SIGNALS[0]).dataset[:], np.arange(10.0))
+      with pytest.raises(KeyError, match='Unknown signal'):
+        h5.flush(URI + '/unknown')
+      h5.flush()
+      assert h5.buffered(SIGNALS[1]) == 0
+    finally:
+      h5.close()
+  finally:
+    shutil.rmtree(tmpdir)
+
+#===============================================================================
+
+if __name__ == '__main__':
+#=========================
+
+  test_flush()
+  print('OK')
+
+#===============================================================================
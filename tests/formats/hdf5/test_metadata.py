@@ -0,0 +1,154 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+import os
+import shutil
+import tempfile
+
+import h5py
+import numpy as np
+import rdflib
+from rdflib.compare import isomorphic
+
+from biosignalml import rdf
+from biosignalml.formats.hdf5 import HDF5Recording
+from biosignalml.formats.hdf5.h5recording import H5Recording
+from biosignalml.repository import RecordingGraph
+
+#===============================================================================
+
+URI = 'http://example.org/recording'
+
+#===============================================================================
+
+def _graph():
+#============
+  graph = rdf.Graph(URI)
+  subject = rdflib.URIRef(URI)
+  node = rdflib.BNode()
+  graph.add((subject, rdflib.RDFS.label, rdflib.Literal('séance "quoted"\x1f\n')))
+  graph.add((subject, rdflib.RDFS.comment, rdflib.Literal('commentaire', lang='fr')))
+  graph.add((subject, rdflib.URIRef('http://example.org/count'),
+             rdflib.Literal('42', datatype=rdflib.XSD.integer)))
+  graph.add((subject, rdflib.URIRef('http://example.org/part'), node))
+  graph.add((node, rdflib.RDFS.label, rdflib.Literal('')))
+  return graph
+
+
+def _tmpfile(name):
+#==================
+  return os.path.join(tempfile.mkdtemp(), name)
+
+
+def test_encoding():
+#===================
+  graph = _graph()
+  (terms, triples) = graph.encode()
+  assert len(triples) == len(graph) and len(set(terms)) == len(terms)
+  decoded = rdf.Graph.create_from_encoding(URI, terms, triples)
+  assert isomorphic(graph, decoded)
+
+
+def test_stored_cache():
+#=======================
+  fname = _tmpfile('cache.h5')
+  try:
+    graph = _graph()
+    (terms, triples) = graph.encode()
+    turtle = graph.serialise()
+    h5 = H5Recording.create(URI, fname, replace=True)
+    h5.store_metadata(turtle, rdf.Format.mimetype(rdf.Format.TURTLE), terms, triples)
+    h5.close()
+    h5 = H5Recording.open(fname, readonly=True)
+    (cachedterms, cachedtriples) = h5.get_metadata_cache()
+    assert list(cachedterms) == list(terms)
+    assert np.array_equal(cachedtriples, np.asarray(triples).reshape((-1, 3)))
+    assert isomorphic(graph, rdf.Graph.create_from_encoding(URI, cachedterms, cachedtriples))
+    h5.close()
+    # Metadata stored without an encoding removes the cache
+    h5 = H5Recording.open(fname)
+    h5.store_metadata(turtle, rdf.Format.mimetype(rdf.Format.TURTLE))
+    assert h5.get_metadata_cache() is None and '/metadata_cache' not in h5._h5
+    h5.close()
+  finally:
+    shutil.rmtree(os.path.dirname(fname))
+
+
+def test_digest():
+#=================
+  fname = _tmpfile('digest.h5')
+  try:
+    graph = _graph()
+    h5 = H5Recording.create(URI, fname, replace=True)
+    h5.store_metadata(graph.serialise(), rdf.Format.mimetype(rdf.Format.TURTLE), *graph.encode())
+    h5.close()
+    # Metadata changed by something that doesn't update the cache
+    with h5py.File(fname, 'r+') as f:
+      del f['/metadata']
+      f.create_dataset('/metadata', data='<%s> a <http://example.org/Other> .' % URI)
+    h5 = H5Recording.open(fname, readonly=True)
+    assert h5.get_metadata_cache() is None
+    h5.close()
+  finally:
+    shutil.rmtree(os.path.dirname(fname))
+
+
+def _open(fname, monkeypatch):
+#=============================
+  """
+  Open a recording, noting how its metadata was read.
+  """
+  used = [ ]
+  for method in ('create_from_encoding', 'create_from_string'):
+    original = getattr(RecordingGraph, method).__func__
+    def wrapped(cls, *args, _method=method, _original=original, **kwds):
+      used.append(_method)
+      return _original(cls, *args, **kwds)
+    monkeypatch.setattr(RecordingGraph, method, classmethod(wrapped))
+  recording = HDF5Recording.open(fname, readonly=True)
+  result = (used, recording.description, recording.comment,
+            recording.get_signal(URI + '/signal/0').label, len(recording.graph))
+  recording.close()
+  monkeypatch.undo()
+  return result
+
+
+def test_fallback(monkeypatch):
+#==============================
+  fname = _tmpfile('fallback.h5')
+  try:
+    recording = HDF5Recording.create(URI, fname, replace=True,
+                                     description='rec "desc"\x1f x', comment='séance')
+    signal = recording.new_signal(URI + '/signal/0', 'http://example.org/units/mV',
+                                  rate=100, label='sig 0')
+    signal.extend(np.arange(10.0))
+    recording.close()
+    (used, *cached) = _open(fname, monkeypatch)
+    assert used == [ 'create_from_encoding' ]
+    assert cached[:3] == [ 'rec "desc"\x1f x', 'séance', 'sig 0' ]
+    with h5py.File(fname, 'r+') as f:
+      f['/metadata_cache'].attrs['digest'] = 'stale'
+    (used, *parsed) = _open(fname, monkeypatch)
+    assert used == [ 'create_from_string' ]
+    assert parsed == cached
+  finally:
+    shutil.rmtree(os.path.dirname(fname))
+
+#===============================================================================
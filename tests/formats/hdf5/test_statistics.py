@@ -0,0 +1,167 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+import os
+import shutil
+import tempfile
+
+import h5py
+import numpy as np
+import pytest
+
+import biosignalml.formats.hdf5.h5recording as h5recording
+from biosignalml.formats.hdf5 import StoragePolicy
+from biosignalml.formats.hdf5.h5recording import H5Recording
+
+#===============================================================================
+
+URI = 'http://example.org/recording'
+SIGNAL = URI + '/signal/0'
+CHUNK = 1000
+
+#===============================================================================
+
+def _data(count=5500):
+#=====================
+  data = np.random.default_rng(2).normal(size=count)
+  data[777] = np.nan
+  return data
+
+
+def _create(fname, data, step=77, statistics=True):
+#=================================================
+  h5 = H5Recording.create(URI, fname, replace=True, storage=StoragePolicy(chunk_samples=CHUNK))
+  h5.create_signal(SIGNAL, 'mV', data=data[:300], rate=1.0)
+  for pos in range(300, len(data), step):
+    h5.extend_signal(SIGNAL, data[pos:pos+step])
+  h5.close()
+  if not statistics:
+    with h5py.File(fname, 'r+') as f:
+      del f['/recording/statistics']
+
+
+def _check(h5, data, start=0, end=None):
+#=======================================
+  if end is None: end = len(data)
+  (count, nans, lo, hi, total, sumsq) = h5.statistics(SIGNAL, start, end)
+  values = data[start:end]
+  assert count == np.count_nonzero(~np.isnan(values))
+  assert nans == np.count_nonzero(np.isnan(values))
+  assert np.isclose(lo, np.nanmin(values)) and np.isclose(hi, np.nanmax(values))
+  assert np.isclose(total, np.nansum(values)) and np.isclose(sumsq, np.nansum(values**2))
+
+
+class _Counter(object):
+#======================
+  """
+  Count the data points summarised by :func:`h5recording._chunk_statistics`.
+  """
+  def __init__(self, monkeypatch):
+  #-------------------------------
+    self.points = 0
+    original = h5recording._chunk_statistics
+    def counted(rows, *args, **kwds):
+      self.points += len(rows)
+      return original(rows, *args, **kwds)
+    monkeypatch.setattr(h5recording, '_chunk_statistics', counted)
+
+
+@pytest.fixture
+def tmpdir():
+#============
+  path = tempfile.mkdtemp()
+  yield path
+  shutil.rmtree(path)
+
+#===============================================================================
+
+def test_stored(tmpdir, monkeypatch):
+#====================================
+  fname = os.path.join(tmpdir, 'stored.h5')
+  data = _data(5000)
+  _create(fname, data)
+  with h5py.File(fname, 'r') as f:
+    stats = f['/recording/statistics/0']
+    assert stats.shape == (5, 1, 6) and stats.attrs['length'] == 5000
+  h5 = H5Recording.open(fname, readonly=True)
+  try:
+    counter = _Counter(monkeypatch)
+    (block, chunks) = h5.get_statistics(SIGNAL)
+    assert block == CHUNK and chunks.shape == (5, 6) and counter.points == 0
+    assert chunks[:, 0].sum() + chunks[:, 1].sum() == len(data)
+    _check(h5, data, 123, 4321)
+  finally:
+    h5.close()
+
+
+def test_partial_chunk(tmpdir, monkeypatch):
+#===========================================
+  fname = os.path.join(tmpdir, 'partial.h5')
+  data = _data(5500)
+  _create(fname, data)
+  with h5py.File(fname, 'r') as f:
+    assert f['/recording/statistics/0'].attrs['length'] == 5000
+  h5 = H5Recording.open(fname)
+  try:
+    counter = _Counter(monkeypatch)
+    (block, chunks) = h5.get_statistics(SIGNAL)
+    assert chunks.shape == (6, 6) and counter.points == 500
+    assert np.isclose(chunks[:, 4].sum(), np.nansum(data))
+    _check(h5, data)
+    _check(h5, data, 4999, 5432)
+  finally:
+    h5.close()
+
+
+def test_readonly(tmpdir, monkeypatch):
+#======================================
+  fname = os.path.join(tmpdir, 'readonly.h5')
+  data = _data(5500)
+  _create(fname, data, statistics=False)
+  h5 = H5Recording.open(fname, readonly=True)
+  try:
+    counter = _Counter(monkeypatch)
+    (block, chunks) = h5.get_statistics(SIGNAL)
+    assert counter.points == len(data)
+    assert np.array_equal(h5.get_statistics(SIGNAL)[1], chunks) and counter.points == len(data)
+    _check(h5, data, 2000, 3000)
+    assert counter.points == len(data)
+    h5.get_signal(SIGNAL).invalidate()
+    h5.get_statistics(SIGNAL)
+    assert counter.points == 2*len(data)
+  finally:
+    h5.close()
+  with h5py.File(fname, 'r') as f:
+    assert 'statistics' not in f['/recording']
+
+
+def test_non_numeric(tmpdir):
+#============================
+  h5 = H5Recording.create(URI, os.path.join(tmpdir, 'text.h5'), replace=True)
+  try:
+    h5.create_signal(SIGNAL, None, data=np.array([ b'ab', b'cd' ]), rate=1.0)
+    h5.extend_signal(SIGNAL, np.array([ b'ef' ]))
+    assert 'statistics' not in h5._h5['/recording']
+    with pytest.raises(TypeError):
+      h5.get_statistics(SIGNAL)
+  finally:
+    h5.close()
+
+#===============================================================================
@@ -0,0 +1,152 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+import os
+import shutil
+import signal
+import tempfile
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from biosignalml.formats.hdf5.h5recording import H5Recording
+from biosignalml.formats.hdf5.h5writer import H5Writer
+
+#===============================================================================
+
+URI = 'http://example.org/recording'
+SIGNALS = [ URI + '/signal/{}'.format(n) for n in range(3) ]
+POINTS = 5000
+
+#===============================================================================
+
+def _producer(writer, uri, offset, results):
+#===========================================
+  """
+  Append data points, in blocks of varying size, to a signal.
+  """
+  try:
+    data = np.arange(POINTS, dtype='f8') + offset
+    rng = np.random.default_rng(int(offset))
+    pos = 0
+    while pos < POINTS:
+      step = int(rng.integers(1, 300))
+      writer.extend_signal(uri, data[pos:pos+step])
+      pos += step
+    results.put((uri, None))
+  except Exception as msg:
+    results.put((uri, str(msg)))
+  finally:
+    writer.close()
+
+
+def _unlinked(name):
+#===================
+  try:
+    shared_memory.SharedMemory(name=name).close()
+  except FileNotFoundError:
+    return True
+  return False
+
+
+def test_producers():
+#====================
+  tmpdir = tempfile.mkdtemp()
+  try:
+    fname = os.path.join(tmpdir, 'writer.h5')
+    # Small slots, so that producers wait for slots and blocks are split,
+    # and spawned processes, so that the writer is pickled
+    context = multiprocessing.get_context('spawn')
+    writer = H5Writer(URI, fname, create=True, replace=True, slots=2, slotsize=800,
+                      context=context)
+    for uri in SIGNALS: writer.create_signal(uri, 'mV', dtype='f8', rate=100.0)
+    results = context.Queue()
+    producers = [ context.Process(target=_producer, args=(writer, uri, 10000*n, results))
+                    for (n, uri) in enumerate(SIGNALS) ]
+    for p in producers: p.start()
+    outcomes = dict(results.get(timeout=60) for p in producers)
+    for p in producers: p.join()
+    assert outcomes == { uri: None for uri in SIGNALS }
+    writer.flush()
+    writer.close()
+    h5 = H5Recording.open(fname, readonly=True)
+    try:
+      for (n, uri) in enumerate(SIGNALS):
+        data = h5.get_signal(uri).dataset[:]
+        assert np.array_equal(data, np.arange(POINTS, dtype='f8') + 10000*n)
+    finally:
+      h5.close()
+  finally:
+    shutil.rmtree(tmpdir)
+
+
+def test_writer_failure():
+#=========================
+  tmpdir = tempfile.mkdtemp()
+  try:
+    fname = os.path.join(tmpdir, 'writer.h5')
+    writer = H5Writer(URI, fname, create=True, replace=True, slots=2, slotsize=800)
+    writer.create_signal(SIGNALS[0], 'mV', dtype='f8', rate=100.0)
+    # An error in the writing process is raised by the next call that waits
+    writer.extend_signal(URI + '/unknown', np.arange(10.0))
+    with pytest.raises(RuntimeError, match='Cannot write HDF5 recording'):
+      writer.flush()
+    writer.extend_signal(SIGNALS[0], np.arange(10.0))
+    writer.flush()
+    # As is the writing process exiting
+    name = writer._shm.name
+    os.kill(writer._process.pid, signal.SIGKILL)
+    writer._process.join()
+    with pytest.raises(RuntimeError, match='Writer process has exited'):
+      writer.extend_signal(SIGNALS[0], np.arange(1000.0))
+    with pytest.raises(RuntimeError, match='Writer process has exited'):
+      writer.close()
+    assert _unlinked(name)
+    writer.close()
+  finally:
+    shutil.rmtree(tmpdir)
+
+
+def test_open_failure():
+#=======================
+  tmpdir = tempfile.mkdtemp()
+  try:
+    fname = os.path.join(tmpdir, 'missing.h5')
+    names = set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else None
+    with pytest.raises(RuntimeError, match='Cannot write HDF5 recording'):
+      H5Writer(URI, fname)
+    if names is not None:
+      assert set(os.listdir('/dev/shm')) <= names
+  finally:
+    shutil.rmtree(tmpdir)
+
+#===============================================================================
+
+if __name__ == '__main__':
+#=========================
+
+  test_producers()
+  test_writer_failure()
+  test_open_failure()
+  print('OK')
+
+#===============================================================================
@@ -0,0 +1,121 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+
+wfdb = pytest.importorskip('wfdb')
+
+from biosignalml.formats.wfdb import WFDBRecording
+from biosignalml.formats.wfdb.annotation import read_annotations
+
+#===============================================================================
+
+MGHDB = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'physionet.org', 'mghdb')
+
+#===============================================================================
+
+def _compare(record, annotator):
+#===============================
+  """
+  Check that annotations are read as ``wfdb.rdann`` reads them, field by field.
+  """
+  ref = wfdb.rdann(record, annotator, return_label_elements=[ 'label_store', 'symbol' ])
+  table = read_annotations(record, annotator, ref.fs)
+  assert np.array_equal(table.samples, ref.sample)
+  assert np.array_equal(table.typecodes, ref.label_store)
+  assert np.array_equal(table.subtypes, ref.subtype)
+  assert np.array_equal(table.chans, ref.chan)
+  assert np.array_equal(table.nums, ref.num)
+  assert [ table.aux(n) for n in range(len(table)) ] == list(ref.aux_note)
+  symbols = [ table.texts[c] for c in table.typecodes ]
+  assert all(s == r for (s, r) in zip(symbols, ref.symbol) if isinstance(r, str))
+  return table
+
+
+def test_physionet():
+#====================
+  record = os.path.join(MGHDB, 'mgh002')
+  if not os.path.exists(record + '.ari'):
+    pytest.skip('PhysioNet test data not present')
+  table = _compare(record, 'ari')
+  assert len(table) > 0 and table.rate == 360.0
+
+
+def test_synthetic():
+#====================
+  # Large gaps need time skips, and each annotation has a channel, number,
+  # subtype, and maybe auxiliary text
+  rng = np.random.default_rng(1)
+  count = 20000
+  samples = np.cumsum(rng.integers(200, 400, count))
+  samples[5000:] += 3000000
+  symbols = list(rng.choice([ 'N', 'V', 'A', '+', '~' ], count))
+  aux = [ '(AFIB' if s == '+' else ('x'*int(rng.integers(1, 6)) if s == '~' else '')
+            for s in symbols ]
+  tmpdir = tempfile.mkdtemp()
+  try:
+    wfdb.wrann('test', 'atr', samples, symbol=symbols, aux_note=aux, fs=250,
+               chan=rng.integers(0, 3, count), num=rng.integers(0, 5, count),
+               subtype=rng.integers(0, 4, count), write_dir=tmpdir)
+    table = _compare(os.path.join(tmpdir, 'test'), 'atr')
+    assert table.rate == 250.0
+    rows = table.select(100.0, 200.0, types=[ 'V', 'A' ])
+    expected = np.flatnonzero((table.onsets >= 100.0) & (table.onsets < 200.0)
+                             & np.isin(np.array(symbols), [ 'V', 'A' ]))
+    assert np.array_equal(rows, expected)
+  finally:
+    shutil.rmtree(tmpdir)
+
+
+def test_events():
+#=================
+  record = os.path.join(MGHDB, 'mgh002')
+  if not os.path.exists(record + '.ari'):
+    pytest.skip('PhysioNet test data not present')
+  recording = WFDBRecording.open(record + '.hea', uri='http://example.org/mgh002')
+  try:
+    assert recording.annotators() == [ 'ari' ]
+    added = recording.new_event('http://example.org/mgh002/event/added',
+                                'http://example.org/event', 1.0)
+    annotations = recording.annotation_events(interval=recording.interval(0.0, 60.0))
+    assert annotations
+    assert annotations == recording.annotation_events(interval=recording.interval(0.0, 60.0))
+    events = recording.events()
+    assert added in events
+    assert all(e in events for e in annotations)
+  finally:
+    recording.close()
+
+#===============================================================================
+
+if __name__ == '__main__':
+#=========================
+
+  test_physionet()
+  test_synthetic()
+  test_events()
+  print('OK')
+
+#===============================================================================
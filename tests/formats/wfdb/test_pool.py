@@ -0,0 +1,122 @@
+######################################################
+#
+#  BioSignalML Management in Python
+#
+#  Copyright (c) 2010-2013  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+######################################################
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+
+wfdb = pytest.importorskip('wfdb')
+
+from biosignalml.formats.wfdb.pool import WFDBReaderPool, FrameCache
+
+#===============================================================================
+
+FRAMES = 5000
+SPF = [ 1, 2, 4 ]
+
+#===============================================================================
+
+def _write_record(tmpdir):
+#=========================
+  """
+  Write a record whose signals have different numbers of samples per frame.
+  """
+  signals = [ (np.arange(FRAMES*spf) % (100*(n + 3)) - 150).astype(np.int64)
+                for (n, spf) in enumerate(SPF) ]
+  wfdb.wrsamp('multi', fs=100, units=[ 'mV', 'mV', 'uV' ], sig_name=[ 'a', 'b', 'c' ],
+              e_d_signal=signals, samps_per_frame=SPF, fmt=[ '16', '212', '16' ],
+              adc_gain=[ 200.0, 100.0, 0.5 ], baseline=[ 0, 10, -3 ], write_dir=tmpdir)
+  return os.path.join(tmpdir, 'multi')
+
+
+def _reference(record):
+#======================
+  """
+  The frames of a record, as read by ``wfdb.rdrecord``.
+  """
+  ref = wfdb.rdrecord(record, physical=False, smooth_frames=False)
+  return np.hstack([ samples.reshape(-1, spf)
+                       for (samples, spf) in zip(ref.e_d_signal, ref.samps_per_frame) ])
+
+
+def test_session():
+#==================
+  tmpdir = tempfile.mkdtemp()
+  pool = WFDBReaderPool(size=2, slotsize=4*7*333)    # Several worker reads per call
+  try:
+    record = _write_record(tmpdir)
+    expected = _reference(record)
+    session = pool.open(record)
+    try:
+      assert session.frames == FRAMES and session.framerate == 100.0
+      assert [ s.spf for s in session.signals ] == SPF and session.framesize == sum(SPF)
+      assert np.array_equal(session.read_frames(0, FRAMES), expected)
+      assert np.array_equal(session.read_frames(1234, 2000), expected[1234:3234])
+      assert np.array_equal(session.read_frames(FRAMES - 10, 100), expected[-10:])
+      assert len(session.read_frames(FRAMES, 10)) == 0
+    finally:
+      session.close()
+  finally:
+    pool.close()
+    shutil.rmtree(tmpdir)
+
+
+def test_frame_cache():
+#======================
+  tmpdir = tempfile.mkdtemp()
+  pool = WFDBReaderPool(size=1)
+  try:
+    record = _write_record(tmpdir)
+    expected = _reference(record)
+    session = pool.open(record)
+    try:
+      cache = FrameCache(session, blocksize=4*7*100, maxsize=4*7*1000)   # 100 frames a block
+      assert np.array_equal(cache.read_frames(150, 300), expected[150:450])
+      assert (cache.hits, cache.misses) == (0, 4)
+      # Blocks in the cache are reused, with only missing ones read
+      assert np.array_equal(cache.read_frames(220, 400), expected[220:620])
+      assert (cache.hits, cache.misses) == (3, 6)
+      # Reading past the cache's size discards the least recently used blocks
+      assert np.array_equal(cache.read_frames(1000, 1000), expected[1000:2000])
+      assert cache.size <= cache.maxsize
+      assert (100, 200) not in cache._blocks and (1900, 2000) in cache._blocks
+      misses = cache.misses
+      assert np.array_equal(cache.read_frames(1950, 30), expected[1950:1980])
+      assert cache.misses == misses and cache.hits == 4
+      assert np.array_equal(cache.read_frames(FRAMES - 50, 100), expected[-50:])
+    finally:
+      session.close()
+  finally:
+    pool.close()
+    shutil.rmtree(tmpdir)
+
+#===============================================================================
+
+if __name__ == '__main__':
+#=========================
+
+  test_session()
+  test_frame_cache()
+  print('OK')
+
+#===============================================================================